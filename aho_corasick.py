@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Aho-Corasick multi-pattern matcher (pure Python, no dependencies).
+
+Finds all occurrences of many patterns in one pass over the text, so the
+cost per text no longer grows with the number of patterns.
+
+Usage:
+    ac = AhoCorasick()
+    ac.add('tesla', company)
+    ac.add('$TSLA', company)
+    ac.build()
+    for start, end, value in ac.iter(text):
+        ...
+"""
+
+
+class AhoCorasick:
+    def __init__(self):
+        self._goto = [{}]    # state -> {char: next_state}
+        self._fail = [0]
+        self._out = [()]     # state -> ((pattern_length, value), ...)
+        self._built = False
+        self.patterns = 0
+
+    def add(self, pattern: str, value) -> None:
+        """Add a pattern; value is returned with every occurrence."""
+        if not pattern:
+            return
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] = self._out[state] + ((len(pattern), value),)
+        self.patterns += 1
+        self._built = False
+
+    def build(self) -> None:
+        """Compute failure links (breadth-first). Called by iter() if needed."""
+        queue = list(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        i = 0
+        while i < len(queue):
+            state = queue[i]
+            i += 1
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                fallback = self._goto[f].get(ch, 0)
+                self._fail[nxt] = fallback if fallback != nxt else 0
+                # Inherit matches of the longest proper suffix
+                if self._out[self._fail[nxt]]:
+                    self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+
+    def iter(self, text: str):
+        """Yield (start, end, value) for every pattern occurrence in text."""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                end = i + 1
+                for length, value in out[state]:
+                    yield end - length, end, value
@@ -29,6 +29,7 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(os.path.join(SCRIPT_DIR, '.env'))
 
 import supabase_helper
+from news_stats import companies_with_news_in_company_news, companies_with_news_since
 
 ALERT_TYPES = [
     'price_jump', 'ipo_announced', 'earnings_surprise', 'score_change',
@@ -527,17 +528,11 @@ def detect_stale_watchlist(client, watchlist_ids: set, existing: dict) -> list:
     wl_list = list(watchlist_ids)
 
     try:
-        # Find companies with recent news
-        companies_with_news = set()
+        # Find companies with recent news (aggregate, else company_news)
         batch_size = 50
-        for i in range(0, len(wl_list), batch_size):
-            batch = wl_list[i:i + batch_size]
-            resp = client.table('company_news') \
-                .select('company_id') \
-                .in_('company_id', batch) \
-                .gte('published_at', cutoff_90d) \
-                .execute()
-            companies_with_news.update(r['company_id'] for r in resp.data)
+        companies_with_news = companies_with_news_since(client, cutoff_90d, wl_list)
+        if companies_with_news is None:
+            companies_with_news = companies_with_news_in_company_news(client, cutoff_90d, wl_list)
 
         # Find companies with recent score changes
         companies_with_scores = set()
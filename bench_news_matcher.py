@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark: news → company matching (news_collector.match_article_to_companies).
+
+Generates synthetic companies and articles, runs the Aho-Corasick matcher
+and the previous per-company regex loop, and checks that both return the
+same companies in the same order.
+
+Usage:
+  python3 bench_news_matcher.py                          # 10k companies × 5k articles
+  python3 bench_news_matcher.py --companies 2000 --articles 500
+  python3 bench_news_matcher.py --skip-reference         # only time the automaton
+
+The regex loop is slow (~0.4 s/article at 10k companies), so by default it
+only runs on the first 500 articles; --reference-sample 0 runs all.
+"""
+
+import argparse
+import random
+import re
+import string
+import time
+
+from news_collector import (
+    build_company_index, match_article_to_companies, _is_meaningful_name,
+)
+
+WORDS = [
+    'quantum', 'robotics', 'nova', 'helix', 'orbit', 'vector', 'atlas', 'nimbus',
+    'photon', 'lumen', 'cobalt', 'zenith', 'apex', 'vertex', 'terra', 'aero',
+    'fusion', 'cipher', 'pulse', 'stellar', 'titan', 'echo', 'delta', 'sigma',
+]
+SUFFIXES = ['Inc', 'Corp', 'AG', 'SE', 'Holdings', 'Technologies', 'Systems', 'Group', '']
+FILLER = (
+    'shares rose after the company reported quarterly results above estimates '
+    'while analysts raised their price targets and the market closed higher on '
+    'strong demand for chips cloud software and energy storage products'
+).split()
+
+
+def make_companies(n: int, rng: random.Random) -> list:
+    companies = []
+    for i in range(n):
+        name = ' '.join(rng.sample(WORDS, rng.randint(1, 2))).title()
+        name = f"{name} {rng.choice(SUFFIXES)}".strip()
+        if rng.random() < 0.3:
+            name = f"{name} {i}"
+        symbol = ''.join(rng.choices(string.ascii_uppercase, k=rng.randint(2, 5)))
+        if rng.random() < 0.2:
+            symbol += '.DE'
+        companies.append({'id': f"c{i}", 'name': name, 'symbol': symbol})
+    return companies
+
+
+def make_articles(n: int, companies: list, rng: random.Random) -> list:
+    articles = []
+    for _ in range(n):
+        words = rng.choices(FILLER, k=rng.randint(25, 60))
+        for _ in range(rng.randint(0, 3)):
+            c = rng.choice(companies)
+            mention = rng.choice([c['name'], f"${c['symbol'].split('.')[0]}", c['symbol'].split('.')[0]])
+            words.insert(rng.randrange(len(words)), mention)
+        text = ' '.join(words)
+        articles.append({'title': text[:90], 'summary': text[90:]})
+    return articles
+
+
+def reference_match(title: str, summary: str, index: dict) -> list:
+    """Previous implementation: one regex/substring check per company."""
+    text = f"{title} {summary or ''}".upper()
+    text_lower = text.lower()
+    matched = []
+    matched_ids = set()
+
+    for symbol, company in index['by_symbol'].items():
+        if len(symbol) < 2:
+            continue
+        cid = company['id']
+        if cid in matched_ids:
+            continue
+        if f"${symbol}" in text:
+            matched.append(company)
+            matched_ids.add(cid)
+            continue
+        if len(symbol) >= 3:
+            pattern = r'\b' + re.escape(symbol) + r'\b'
+            if re.search(pattern, text):
+                matched.append(company)
+                matched_ids.add(cid)
+
+    for name_lower, company in index['by_name']:
+        cid = company['id']
+        if cid in matched_ids:
+            continue
+        if not _is_meaningful_name(name_lower):
+            continue
+        if len(name_lower) < 6:
+            pattern = r'\b' + re.escape(name_lower) + r'\b'
+            if re.search(pattern, text_lower):
+                matched.append(company)
+                matched_ids.add(cid)
+        else:
+            if name_lower in text_lower:
+                matched.append(company)
+                matched_ids.add(cid)
+
+    return matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark news → company matching')
+    parser.add_argument('--companies', type=int, default=10000)
+    parser.add_argument('--articles', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--skip-reference', action='store_true', help='Do not run the old regex loop')
+    parser.add_argument('--reference-sample', type=int, default=500,
+                        help='Articles checked against the regex loop (0 = all)')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    companies = make_companies(args.companies, rng)
+    articles = make_articles(args.articles, companies, rng)
+
+    print(f"\n  {len(companies)} companies × {len(articles)} articles")
+
+    t0 = time.perf_counter()
+    index = build_company_index(companies)
+    t_build = time.perf_counter() - t0
+    print(f"  Index build (incl. automatons): {t_build:.2f}s")
+
+    t0 = time.perf_counter()
+    results = [match_article_to_companies(a['title'], a['summary'], index) for a in articles]
+    t_new = time.perf_counter() - t0
+    total_matches = sum(len(r) for r in results)
+    print(f"  Aho-Corasick: {t_new:.2f}s ({t_new / len(articles) * 1000:.2f} ms/article, {total_matches} matches)")
+
+    if args.skip_reference:
+        return
+
+    sample = articles[:args.reference_sample] if args.reference_sample else articles
+    t0 = time.perf_counter()
+    expected = [reference_match(a['title'], a['summary'], index) for a in sample]
+    t_old = time.perf_counter() - t0
+    per_old = t_old / len(sample)
+    per_new = t_new / len(articles)
+    print(f"  Regex loop:   {t_old:.2f}s on {len(sample)} articles ({per_old * 1000:.2f} ms/article, "
+          f"~{per_old * len(articles):.0f}s extrapolated)")
+    print(f"  Speedup: {per_old / max(per_new, 1e-9):.0f}x")
+
+    mismatches = sum(
+        1 for got, exp in zip(results, expected)
+        if [c['id'] for c in got] != [c['id'] for c in exp]
+    )
+    print(f"  Identical results: {'yes' if not mismatches else f'NO ({mismatches} articles differ)'}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Benchmark: company scoring (scoring_engine.score_companies).
+
+Generates synthetic companies (extra_data in the formats found in the
+sheet: comma decimals, "%" suffixes, missing/invalid fields), news counts
+and upcoming events, scores them with the vectorized score_companies and
+with the per-company score_* functions, and checks that every component,
+the overall score and the label are identical.
+
+Usage:
+  python3 bench_scoring.py                      # 10k and 100k companies
+  python3 bench_scoring.py --companies 2000
+  python3 bench_scoring.py --skip-reference     # only time the vectorized path
+"""
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from scoring_engine import (
+    WEIGHTS, THIER_GROUP_MAP, VIP_MAP, get_score_label, score_companies,
+    score_valuation_gap, score_conviction_signal, score_price_momentum,
+    score_news_sentiment, score_catalyst_proximity,
+)
+
+EVENT_TYPES = ['ipo', 'earnings', 'Earnings_Report', 'lockup_expiry', 'dividend', None]
+
+
+def _number(rng: random.Random, low: float, high: float):
+    """A value as it may come out of extra_data."""
+    value = round(rng.uniform(low, high), rng.choice([0, 1, 2, 4]))
+    form = rng.random()
+    if form < 0.5:
+        return value
+    if form < 0.75:
+        return str(value)
+    if form < 0.9:
+        return str(value).replace('.', ',')
+    return rng.choice(['', 'n/a', '-', None, 0, '0'])
+
+
+def make_companies(n: int, rng: random.Random) -> list:
+    groups = list(THIER_GROUP_MAP) + ['', ' 2026** ', '2024']
+    vips = list(VIP_MAP) + ['', 'Defcon 4']
+    companies = []
+    for i in range(n):
+        extra = {}
+        price = rng.choice([round(rng.uniform(0.5, 500), 2), None, 0])
+        if price is None and rng.random() < 0.5:
+            extra['Current_Price'] = _number(rng, 0.5, 500)
+        for key, low, high, share in (
+            ('Analyst_Target_Mean', 0, 800, 0.5), ('Purchase_$', 0, 600, 0.4),
+            ('Forward_PE', -5, 60, 0.4), ('Revenue_Growth', -0.5, 1.5, 0.4),
+        ):
+            if rng.random() < share:
+                extra[key] = _number(rng, low, high)
+        if rng.random() < 0.6:
+            low = rng.uniform(0, 300)
+            extra[rng.choice(['52W_Low', '52_Week_Low'])] = _number(rng, low * 0.8, low)
+            extra[rng.choice(['52W_High', '52_Week_High'])] = _number(rng, low, low * 2.5)
+        if rng.random() < 0.5:
+            change = _number(rng, -30, 30)
+            extra[rng.choice(['Change_%', 'Change_Percent'])] = \
+                f"{change}%" if isinstance(change, float) and rng.random() < 0.5 else change
+        if rng.random() < 0.3:
+            extra['Thier_Group'] = rng.choice(groups)
+        if rng.random() < 0.3:
+            extra['VIP'] = rng.choice(vips)
+        if rng.random() < 0.3:
+            extra['Prio_Buy'] = rng.choice(['1', '2.0', '3', 5, '7', 'x', ''])
+        companies.append({
+            'id': f"c{i}",
+            'name': f"Company {i}",
+            'current_price': price,
+            'thier_group': rng.choice(groups) if rng.random() < 0.4 else None,
+            'vip': rng.choice(vips) if rng.random() < 0.3 else None,
+            'prio_buy': rng.choice([1, 2, 3, 4, 5, 0, 9]) if rng.random() < 0.3 else None,
+            'extra_data': extra if rng.random() < 0.95 else None,
+        })
+    return companies
+
+
+def make_news(companies: list, rng: random.Random) -> dict:
+    cache = {}
+    for c in companies:
+        if rng.random() < 0.4:
+            pos, neg = rng.randint(0, 12), rng.randint(0, 12)
+            cache[c['id']] = {'positive': pos, 'negative': neg, 'total': pos + neg + rng.randint(0, 5)}
+    return cache
+
+
+def make_events(companies: list, rng: random.Random) -> dict:
+    today = date.today()
+    cache = {}
+    for c in companies:
+        for _ in range(rng.choice([0, 0, 0, 1, 1, 2, 4])):
+            day = today + timedelta(days=rng.randint(0, 60))
+            cache.setdefault(c['id'], []).append({
+                'company_id': c['id'],
+                'event_type': rng.choice(EVENT_TYPES),
+                'event_date': day.isoformat() if rng.random() < 0.9 else rng.choice([day, None, 'TBD']),
+            })
+    return cache
+
+
+def reference_scores(companies: list, news_cache: dict, events_cache: dict) -> list:
+    """Previous scoring_engine.main loop: five score_* calls per company."""
+    results = []
+    for company in companies:
+        cid = company['id']
+        components = {
+            'valuation_gap': score_valuation_gap(company),
+            'conviction_signal': score_conviction_signal(company),
+            'price_momentum': score_price_momentum(company),
+            'news_sentiment': score_news_sentiment(cid, news_cache),
+            'catalyst_proximity': score_catalyst_proximity(cid, events_cache),
+        }
+        overall = round(sum(components[k] * WEIGHTS[k] for k in WEIGHTS), 1)
+        results.append((cid, components, overall, get_score_label(overall)))
+    return results
+
+
+def run(n: int, seed: int, skip_reference: bool) -> int:
+    rng = random.Random(seed)
+    companies = make_companies(n, rng)
+    news_cache = make_news(companies, rng)
+    events_cache = make_events(companies, rng)
+    print(f"\n  {n} companies, {len(news_cache)} with news, "
+          f"{sum(len(v) for v in events_cache.values())} events")
+
+    t0 = time.perf_counter()
+    scores = score_companies(companies, news_cache, events_cache)
+    t_new = time.perf_counter() - t0
+    print(f"  Vectorized:   {t_new:.2f}s")
+
+    if skip_reference:
+        return 0
+
+    t0 = time.perf_counter()
+    expected = reference_scores(companies, news_cache, events_cache)
+    t_old = time.perf_counter() - t0
+    print(f"  Per company:  {t_old:.2f}s")
+    print(f"  Speedup: {t_old / max(t_new, 1e-9):.1f}x")
+
+    columns = {name: scores[name].tolist() for name in ('company_id', 'overall', 'label', *WEIGHTS)}
+    mismatches = 0
+    for i, (cid, components, overall, label) in enumerate(expected):
+        got = (columns['company_id'][i], {k: columns[k][i] for k in WEIGHTS},
+               columns['overall'][i], columns['label'][i])
+        if got != (cid, components, overall, label):
+            mismatches += 1
+            if mismatches <= 3:
+                print(f"    {cid}: expected {components} {overall} {label}, got {got[1]} {got[2]} {got[3]}")
+    print(f"  Identical results: {'yes' if not mismatches else f'NO ({mismatches} companies differ)'}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark company scoring')
+    parser.add_argument('--companies', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--skip-reference', action='store_true', help='Do not run the per-company loop')
+    args = parser.parse_args()
+
+    mismatches = sum(run(n, args.seed, args.skip_reference) for n in args.companies)
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Brave search prioritization from news velocity.
+
+Keeps per-company search outcomes in .brave_company_stats.json and ranks
+companies outside the watchlist/high-value set by expected yield (new,
+not yet stored URLs per search):
+
+  - smoothed mean of the last HISTORY_SEARCHES outcomes (unknown companies
+    start at PRIOR_YIELD)
+  - boosted if the last hit is recent
+  - boosted by an upcoming catalyst in company_events (earnings, lock-up
+    expiry, ...) within CATALYST_WINDOW_DAYS, more the closer it is
+
+Every company is searched at least every MIN_REVISIT_DAYS ("due");
+between visits a company only gets a search if its expected yield is at
+least MIN_EXPECTED_YIELD and there is budget left.
+
+State:
+  {
+    "<company_id>": {
+      "history": [0, 2, 0, 1],        # new URLs per search, newest last
+      "last_searched": "2026-04-14",
+      "last_hit": "2026-04-12",
+      "new_urls_total": 3
+    }
+  }
+"""
+
+import os
+from datetime import date, timedelta
+
+import local_store
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATS_FILE = os.path.join(SCRIPT_DIR, '.brave_company_stats.json')
+
+HISTORY_SEARCHES = 10        # outcomes kept per company
+MIN_REVISIT_DAYS = 7         # every company is searched at least this often
+MIN_EXPECTED_YIELD = 0.3     # new URLs per search needed for an extra visit
+PRIOR_YIELD = 0.5            # assumed yield of a company never searched
+RECENT_HIT_DAYS = 3
+RECENT_HIT_FACTOR = 1.5
+CATALYST_WINDOW_DAYS = 14
+CATALYST_BOOST = 2.0         # added yield for a catalyst today, fading to 0 at the window end
+
+
+def load_upcoming_catalysts(client, days: int = CATALYST_WINDOW_DAYS) -> dict:
+    """{company_id: days until the next company_events entry} within the window."""
+    today = date.today()
+    upcoming = {}
+    page_size = 1000
+    offset = 0
+    while True:
+        try:
+            response = client.table('company_events') \
+                .select('company_id, event_date') \
+                .gte('event_date', today.isoformat()) \
+                .lte('event_date', (today + timedelta(days=days)).isoformat()) \
+                .range(offset, offset + page_size - 1) \
+                .execute()
+        except Exception as e:
+            print(f"  Warning: could not load upcoming events: {e}")
+            break
+        batch = response.data or []
+        for row in batch:
+            cid = row.get('company_id')
+            try:
+                days_until = (date.fromisoformat(str(row['event_date'])[:10]) - today).days
+            except (KeyError, TypeError, ValueError):
+                continue
+            if cid and (cid not in upcoming or days_until < upcoming[cid]):
+                upcoming[cid] = days_until
+        if len(batch) < page_size:
+            break
+        offset += page_size
+    return upcoming
+
+
+class BraveCompanyStats:
+    def __init__(self, path: str = STATS_FILE):
+        self.path = path
+        self.stats = local_store.load_json(path)
+
+    def days_since_search(self, company_id: str, today: date) -> int | None:
+        last = self.stats.get(company_id, {}).get('last_searched')
+        return (today - date.fromisoformat(last)).days if last else None
+
+    def expected_yield(self, company_id: str, today: date, catalyst_days: int = None) -> float:
+        entry = self.stats.get(company_id, {})
+        history = entry.get('history', [])
+        value = (sum(history) + PRIOR_YIELD) / (len(history) + 1)
+        last_hit = entry.get('last_hit')
+        if last_hit and (today - date.fromisoformat(last_hit)).days <= RECENT_HIT_DAYS:
+            value *= RECENT_HIT_FACTOR
+        if catalyst_days is not None and 0 <= catalyst_days <= CATALYST_WINDOW_DAYS:
+            value += CATALYST_BOOST * (1 - catalyst_days / (CATALYST_WINDOW_DAYS + 1))
+        return value
+
+    def record(self, company_id: str, new_urls: int, today: date) -> None:
+        entry = self.stats.setdefault(company_id, {'history': [], 'new_urls_total': 0})
+        entry['history'] = (entry.get('history', []) + [new_urls])[-HISTORY_SEARCHES:]
+        entry['last_searched'] = today.isoformat()
+        entry['new_urls_total'] = entry.get('new_urls_total', 0) + new_urls
+        if new_urls:
+            entry['last_hit'] = today.isoformat()
+
+    def save(self) -> None:
+        try:
+            local_store.save_json(self.path, self.stats)
+        except Exception as e:
+            print(f"  Warning: could not save Brave company stats: {e}")
+
+
+def prioritize(companies: list, stats: BraveCompanyStats, catalysts: dict, budget: int,
+               today: date = None) -> tuple:
+    """Pick and order companies for this run.
+
+    Returns (selected, info): due companies first (most overdue first, then
+    by expected yield), then the highest expected yields above
+    MIN_EXPECTED_YIELD until the budget is used. Due companies beyond the
+    budget stay due for the next run.
+    """
+    today = today or date.today()
+    due = []
+    extra = []
+    for company in companies:
+        cid = company['id']
+        expected = stats.expected_yield(cid, today, catalysts.get(cid))
+        since = stats.days_since_search(cid, today)
+        if since is None or since >= MIN_REVISIT_DAYS:
+            overdue = (since - MIN_REVISIT_DAYS) if since is not None else 10 ** 6
+            due.append((overdue, expected, company))
+        elif expected >= MIN_EXPECTED_YIELD:
+            extra.append((expected, company))
+
+    due.sort(key=lambda x: (-x[0], -x[1]))
+    extra.sort(key=lambda x: -x[0])
+
+    selected = [c for _, _, c in due[:budget]]
+    room = max(0, budget - len(selected))
+    selected += [c for _, c in extra[:room]]
+
+    info = {
+        'due': len(due),
+        'due_selected': min(len(due), budget),
+        'extra_candidates': len(extra),
+        'extra_selected': min(len(extra), room),
+        'skipped_low_yield': len(companies) - len(due) - len(extra),
+        'with_catalyst': sum(1 for c in selected if c['id'] in catalysts),
+    }
+    return selected, info
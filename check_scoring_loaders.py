@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Check: scoring_engine input loaders read complete data past the row limit.
+
+Runs load_news_cache (company_news_stats, the company_news fallback, a
+created but not yet rebuilt stats table and one rebuilt from the same
+articles) and load_events_cache against an in-memory stand-in for
+Supabase that, like PostgREST, returns at most 1,000 rows per request.
+Each loader's result is compared with the counts / events computed
+directly from the generated rows (news: both paths against one
+expectation), and the scores from the loaded events (next 30 days only)
+with the scores from all upcoming events.
+
+Usage:
+  python3 check_scoring_loaders.py                    # 1,500 and 100,000 rows
+  python3 check_scoring_loaders.py --rows 5000 250000
+"""
+
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from news_stats import rebuild_news_stats
+from scoring_engine import load_events_cache, load_news_cache, score_companies
+
+MAX_ROWS = 1000
+EVENT_TYPES = ['ipo', 'earnings', 'earnings_report', 'lockup_expiry', 'dividend', None]
+SENTIMENTS = ['positive', 'negative', 'neutral', None]
+
+
+class FakeQuery:
+    OPS = {
+        'eq': lambda x, v: x == v,
+        'gte': lambda x, v: x is not None and x >= v,
+        'lte': lambda x, v: x is not None and x <= v,
+        'lt': lambda x, v: x is not None and x < v,
+        'is_': lambda x, v: x is None if v == 'null' else x == v,
+        'in_': lambda x, v: x in v,
+    }
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.fields = None
+        self.filters = []
+        self.orders = []
+        self.start, self.end = 0, None
+        self.negate = False
+        self.upserted = None
+
+    @property
+    def not_(self):
+        self.negate = True
+        return self
+
+    def select(self, fields, **kwargs):
+        self.fields = [f.strip() for f in fields.split(',')]
+        return self
+
+    def __getattr__(self, op):
+        if op not in self.OPS:
+            raise AttributeError(op)
+
+        def add(column, value):
+            self.filters.append((op, column, tuple(value) if isinstance(value, list) else value, self.negate))
+            self.negate = False
+            return self
+        return add
+
+    def upsert(self, rows, on_conflict):
+        self.upserted = (rows, on_conflict)
+        return self
+
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def range(self, start, end):
+        self.start, self.end = start, end
+        return self
+
+    def limit(self, n):
+        return self.range(0, n - 1)
+
+    def execute(self):
+        self.client.requests += 1
+        if self.table not in self.client.tables:
+            raise Exception(f'relation "{self.table}" does not exist')
+        if self.upserted:
+            rows, column = self.upserted
+            table = {r[column]: r for r in self.client.tables[self.table]}
+            table.update({r[column]: r for r in rows})
+            self.client.tables[self.table] = list(table.values())
+            self.client.results.clear()
+            return type('Response', (), {'data': rows})()
+        key = (self.table, tuple(self.filters), tuple(self.orders))
+        if key not in self.client.results:
+            rows = [r for r in self.client.tables[self.table]
+                    if all(self.OPS[op](r.get(c), v) != negate for op, c, v, negate in self.filters)]
+            for column, desc in reversed(self.orders):
+                rows.sort(key=lambda r: r[column], reverse=desc)
+            self.client.results[key] = rows
+        rows = self.client.results[key]
+        end = self.end + 1 if self.end is not None else len(rows)
+        page = rows[self.start:min(end, self.start + MAX_ROWS)]
+        return type('Response', (), {'data': [{f: r.get(f) for f in self.fields} for r in page]})()
+
+
+class FakeClient:
+    """Supabase stand-in with PostgREST's per-request row limit."""
+
+    def __init__(self, tables: dict):
+        self.tables = tables
+        self.results = {}
+        self.requests = 0
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+def make_news(n: int, companies: int, rng: random.Random) -> list:
+    """Articles over 45 days; some without published_at, dated after their fetch, industry-only or lexicon-only."""
+    now = datetime.now(timezone.utc)
+    rows = []
+    for i in range(n):
+        fetched = now - timedelta(hours=rng.uniform(0, 24 * 45))
+        published = fetched - timedelta(hours=rng.uniform(-6 if rng.random() < 0.05 else 0, 48))
+        rows.append({
+            'id': i,
+            'company_id': f"c{rng.randrange(companies)}" if rng.random() < 0.95 else None,
+            'sentiment': rng.choice(SENTIMENTS),
+            'sentiment_source': 'lexicon' if rng.random() < 0.1 else None,
+            'relevance': rng.choice([None, 1, 2, 3, 4, 5]),
+            'published_at': published.isoformat() if rng.random() < 0.7 else None,
+            'fetched_at': fetched.isoformat(),
+        })
+    return rows
+
+
+def make_stats(n: int, rng: random.Random) -> list:
+    today = datetime.now(timezone.utc).date()
+    rows = []
+    for i in range(n):
+        daily = {}
+        for _ in range(rng.randint(1, 4)):
+            day = (today - timedelta(days=rng.randint(0, 29))).isoformat()
+            bucket = daily.setdefault(day, {})
+            sentiment = rng.choice(['positive', 'negative', 'neutral', 'unknown'])
+            bucket[sentiment] = bucket.get(sentiment, 0) + rng.randint(1, 3)
+        rows.append({'company_id': f"c{i:06d}", 'daily': daily, 'last_published_at': None})
+    return rows
+
+
+def make_events(n: int, companies: int, rng: random.Random) -> list:
+    """n events within the next 30 days plus n // 4 past or later ones."""
+    today = date.today()
+    days = [rng.randint(0, 30) for _ in range(n)] + \
+        [rng.choice([rng.randint(-10, -1), rng.randint(31, 120)]) for _ in range(n // 4)]
+    rng.shuffle(days)
+    return [
+        {
+            'id': i,
+            'company_id': f"c{rng.randrange(companies)}",
+            'event_type': rng.choice(EVENT_TYPES),
+            'event_date': (today + timedelta(days=d)).isoformat(),
+        }
+        for i, d in enumerate(days)
+    ]
+
+
+def expected_news(rows: list) -> dict:
+    """30-day counts by the aggregate's rule: day of published_at, or of fetched_at if missing or later."""
+    first_day = (datetime.now(timezone.utc) - timedelta(days=29)).date().isoformat()
+    cache = {}
+    for row in rows:
+        if not row['company_id']:
+            continue
+        ts = row['fetched_at']
+        if row['published_at'] and datetime.fromisoformat(row['published_at']) <= datetime.fromisoformat(ts):
+            ts = row['published_at']
+        if datetime.fromisoformat(ts).astimezone(timezone.utc).date().isoformat() < first_day:
+            continue
+        counts = cache.setdefault(row['company_id'], {'positive': 0, 'negative': 0, 'total': 0})
+        if row['sentiment'] in ('positive', 'negative') and not row['sentiment_source']:
+            counts[row['sentiment']] += 1
+        counts['total'] += 1
+    return cache
+
+
+def expected_stats(rows: list) -> dict:
+    cache = {}
+    for row in rows:
+        counts = {'positive': 0, 'negative': 0, 'total': 0}
+        for bucket in row['daily'].values():
+            for key, value in bucket.items():
+                counts['total'] += value
+                if key in ('positive', 'negative'):
+                    counts[key] += value
+        cache[row['company_id']] = counts
+    return cache
+
+
+def report(name: str, ok: bool, rows: int, client: FakeClient, seconds: float) -> bool:
+    print(f"  {name:32s} {rows:>8d} rows  {client.requests:4d} requests  {seconds:5.2f}s  "
+          f"{'OK' if ok else 'MISMATCH'}")
+    return ok
+
+
+def run(n: int, seed: int) -> bool:
+    rng = random.Random(seed)
+    companies = max(50, n // 20)
+    print(f"\n  {n} rows ({companies} companies, at most {MAX_ROWS} rows per request)")
+    ok = True
+
+    news = make_news(n, companies, rng)
+    client = FakeClient({'company_news': news})
+    t0 = time.perf_counter()
+    got = load_news_cache(client)
+    ok &= report('company_news (fallback)', got == expected_news(news), n, client, time.perf_counter() - t0)
+
+    # Created but not rebuilt yet: still counted from company_news
+    client = FakeClient({'company_news': news, 'company_news_stats': []})
+    t0 = time.perf_counter()
+    got = load_news_cache(client)
+    ok &= report('company_news_stats (empty)', got == expected_news(news), n, client, time.perf_counter() - t0)
+
+    # Rebuilt from the same articles: the same counts as the fallback
+    client = FakeClient({'company_news': news, 'company_news_stats': []})
+    rebuild_news_stats(client)
+    client.requests = 0
+    t0 = time.perf_counter()
+    got = load_news_cache(client)
+    ok &= report('company_news_stats (rebuilt)', got == expected_news(news), n, client, time.perf_counter() - t0)
+
+    stats = make_stats(n, rng)
+    client = FakeClient({'company_news_stats': stats})
+    t0 = time.perf_counter()
+    got = load_news_cache(client)
+    ok &= report('company_news_stats', got == expected_stats(stats), n, client, time.perf_counter() - t0)
+
+    events = make_events(n, companies, rng)
+    client = FakeClient({'company_events': events})
+    t0 = time.perf_counter()
+    got = load_events_cache(client)
+    elapsed = time.perf_counter() - t0
+    window = (date.today().isoformat(), (date.today() + timedelta(days=30)).isoformat())
+    in_window = sorted(e['id'] for e in events if window[0] <= e['event_date'] <= window[1])
+    loaded = sorted(e['id'] for rows in got.values() for e in rows)
+    ok &= report('company_events', loaded == in_window, len(events), client, elapsed)
+
+    # Leaving out events beyond 30 days must not change any score
+    upcoming = {}
+    for e in events:
+        if e['event_date'] >= window[0]:
+            upcoming.setdefault(e['company_id'], []).append(e)
+    rows = [{'id': f"c{i}", 'name': f"c{i}"} for i in range(companies)]
+    same = score_companies(rows, {}, got)['catalyst_proximity'].tolist() == \
+        score_companies(rows, {}, upcoming)['catalyst_proximity'].tolist()
+    print(f"  {'catalyst scores (30d vs all)':32s} {'identical' if same else 'DIFFERENT'}")
+    return ok and same
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check scoring input loaders past the row limit')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1500, 100000])
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    results = [run(n, args.seed) for n in args.rows]
+    print(f"\n  Complete results: {'yes' if all(results) else 'NO'}")
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
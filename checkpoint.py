@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Resumable progress checkpoints for long-running loops.
+
+A run records which items it finished (plus any extra state it needs to
+resume) in a local JSON file. If the process is killed, the next run picks
+up where it stopped instead of starting from item #1. Checkpoints last
+saved more than max_age_seconds ago (normally one cron interval) are
+discarded, since their data would be stale by then. A completed run clears its checkpoint.
+
+Usage:
+    cp = RunCheckpoint('stock_price_updater', max_age_seconds=3600)
+    if cp.resumed:
+        print(f"Resuming: {len(cp.processed)} already done")
+    for item in items:
+        if cp.is_done(item['id']):
+            continue
+        ...
+        cp.mark_done(item['id'])   # saves every save_every items
+    cp.clear()
+"""
+
+import os
+from datetime import datetime
+
+import local_store
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class RunCheckpoint:
+    def __init__(self, name: str, max_age_seconds: float, save_every: int = 25, path: str = None):
+        self.name = name
+        self.path = path or os.path.join(SCRIPT_DIR, f'.checkpoint_{name}.json')
+        self.max_age_seconds = max_age_seconds
+        self.save_every = save_every
+        self.started_at = datetime.now().timestamp()
+        self.processed = set()
+        self.data = {}  # free-form state for the caller (e.g. resolved tickers)
+        self.resumed = False
+        self._unsaved = 0
+        self._load()
+
+    def _load(self):
+        state = local_store.load_json(self.path)
+        if not state:
+            return
+
+        # Age since the last save: a run killed mid-interval is resumed by the
+        # next scheduled run however long it had been running
+        updated_at = state.get('updated_at') or state.get('started_at', 0)
+        age = datetime.now().timestamp() - updated_at
+        if age > self.max_age_seconds:
+            print(f"   Discarding stale checkpoint '{self.name}' (last saved {age / 60:.0f} min ago)")
+            self.clear()
+            return
+
+        self.started_at = state.get('started_at', updated_at)
+        self.processed = set(state.get('processed', []))
+        self.data = state.get('data', {})
+        self.resumed = True
+
+    def is_done(self, key: str) -> bool:
+        return key in self.processed
+
+    def mark_done(self, key: str) -> bool:
+        """Record a finished item. Saves every save_every items, returns True if it did."""
+        self.processed.add(key)
+        self._unsaved += 1
+        if self._unsaved >= self.save_every:
+            self.save()
+            return True
+        return False
+
+    def save(self) -> None:
+        """Write the checkpoint to disk (atomic)."""
+        local_store.save_json(self.path, {
+            'name': self.name,
+            'started_at': self.started_at,
+            'updated_at': datetime.now().timestamp(),
+            'processed': sorted(self.processed),
+            'data': self.data,
+        })
+        self._unsaved = 0
+
+    def clear(self) -> None:
+        """Remove the checkpoint file (run completed or checkpoint discarded)."""
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
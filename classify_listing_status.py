@@ -18,7 +18,6 @@ Usage:
 """
 
 import argparse
-import json
 import os
 import sys
 from collections import Counter
@@ -29,6 +28,7 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(os.path.join(SCRIPT_DIR, '.env'))
 
 import supabase_helper
+import ticker_blacklist
 
 # Keywords in extra_data.Status that indicate listing status.
 # Check order: more-specific first (PRIVATE before PUBLIC so "not listed" → private, not public via "listed").
@@ -37,17 +37,10 @@ PRE_IPO_KEYWORDS = ['pre-ipo', 'pre ipo', 'ipo planned', 'ipo expected', 'ipo ge
 PRIVATE_KEYWORDS = ['private', 'privat', 'not listed', 'nicht gelistet', 'unlisted']
 PUBLIC_KEYWORDS = ['public', 'öffentlich', 'listed', 'gelistet', 'börsennotiert', 'börse', 'ipo done', 'ipo completed']
 
-BLACKLIST_FILE = os.path.join(SCRIPT_DIR, 'invalid_companies.json')
-
-
 def load_blacklist() -> set:
     """Load company IDs from invalid_companies.json (ticker validation failures)."""
-    if not os.path.exists(BLACKLIST_FILE):
-        return set()
     try:
-        with open(BLACKLIST_FILE, 'r') as f:
-            data = json.load(f)
-        return set(data.keys())
+        return ticker_blacklist.load_blacklisted_ids()
     except Exception as e:
         print(f"  Warning: Could not load blacklist: {e}")
         return set()
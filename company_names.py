@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+Company name normalization shared by the Excel sync and the caches.
+
+Kept free of pandas/Supabase imports so lightweight modules (e.g.
+llm_answer_cache.py) can use it without pulling in the sync script.
+"""
+
+import re
+
+# --- Fuzzy Name Matching ---
+_LEGAL_SUFFIXES = re.compile(
+    r',?\s*\b(inc\.?|incorporated|corp\.?|corporation|ltd\.?|limited|'
+    r'llc\.?|plc\.?|co\.?|company|group|holdings?|s\.?a\.?|ag|se|n\.?v\.?|'
+    r'gmbh|& co\.?\s*(kg|kgaa)?)\s*\.?\s*$',
+    re.IGNORECASE
+)
+
+
+def normalize_company_name(name: str) -> str:
+    """Normalize for fuzzy matching: lowercase, strip legal suffixes, collapse whitespace."""
+    n = name.lower().strip()
+    n = _LEGAL_SUFFIXES.sub('', n)
+    n = _LEGAL_SUFFIXES.sub('', n)  # zweimal fuer gestapelte Suffixe
+    n = re.sub(r'\s+', ' ', n).strip()
+    n = n.rstrip('., ')
+    return n
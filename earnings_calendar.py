@@ -14,9 +14,7 @@ Data flow:
     → Supabase (company_events, event_type='earnings')
 """
 
-import os
 import sys
-import json
 import time
 from datetime import datetime, timezone
 from dotenv import load_dotenv
@@ -25,9 +23,7 @@ import yfinance as yf
 load_dotenv()
 
 import supabase_helper
-
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-BLACKLIST_FILE = os.path.join(SCRIPT_DIR, 'invalid_companies.json')
+import ticker_blacklist
 
 # Processing config
 BATCH_SIZE = 50          # Companies per batch before a longer pause
@@ -37,14 +33,8 @@ MAX_ERRORS_IN_ROW = 10   # Stop if too many consecutive errors (likely rate-limi
 
 
 def load_blacklist() -> set:
-    """Load company IDs from the shared invalid_companies.json blacklist."""
-    try:
-        with open(BLACKLIST_FILE, 'r') as f:
-            data = json.load(f)
-            cutoff = datetime.now().timestamp() - (30 * 86400)
-            return {k for k, v in data.items() if v > cutoff}
-    except (FileNotFoundError, json.JSONDecodeError):
-        return set()
+    """Load company IDs from the shared invalid_companies.json blacklist (inside retry window)."""
+    return ticker_blacklist.load_blacklisted_ids(active_only=True)
 
 
 def get_public_companies_with_symbols() -> list:
@@ -2,7 +2,11 @@
 """
 Fix missing/broken tickers using Claude Haiku + yfinance validation.
 Claude suggests likely ticker symbols (20 companies per batch),
-then yfinance validates each suggestion.
+then yfinance validates all suggestions in bulk.
+
+Answers are cached per ISIN / normalized name in .llm_answer_cache.json
+(accepted and rejected, with TTLs) — only companies without a fresh
+cached answer are sent to Claude.
 
 Valid tickers → update symbol field.
 Companies confirmed private → set listing_status = 'private'.
@@ -27,6 +31,11 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(os.path.join(SCRIPT_DIR, '.env'))
 
 import supabase_helper
+from llm_answer_cache import (
+    LLMAnswerCache, cache_key,
+    STATUS_ACCEPTED, STATUS_REJECTED, STATUS_PRIVATE, STATUS_UNKNOWN,
+)
+from isin_ticker_mapper import validate_tickers_bulk
 
 try:
     from anthropic import Anthropic
@@ -34,12 +43,6 @@ except ImportError:
     os.system(f"{sys.executable} -m pip install anthropic")
     from anthropic import Anthropic
 
-try:
-    import yfinance as yf
-except ImportError:
-    os.system(f"{sys.executable} -m pip install yfinance")
-    import yfinance as yf
-
 BATCH_SIZE = 20  # Companies per AI call
 RATE_LIMIT_DELAY = 1.5
 
@@ -111,16 +114,6 @@ Example:
 Return ONLY the JSON array."""
 
 
-def validate_ticker(ticker: str) -> bool:
-    """Validate a ticker symbol using yfinance."""
-    try:
-        info = yf.Ticker(ticker).info
-        # Check if we got real data (not just an empty/error response)
-        return info.get('regularMarketPrice') is not None or info.get('currentPrice') is not None
-    except Exception:
-        return False
-
-
 def suggest_tickers(client: Anthropic, batch: list) -> list:
     """Call Claude Haiku to suggest tickers for a batch."""
     prompt = build_prompt(batch)
@@ -181,8 +174,26 @@ def main():
     candidates = get_candidates(companies)
     print(f"  Candidates (no symbol, not private/acquired): {len(candidates)}")
 
+    if args.limit:
+        candidates = candidates[:args.limit]
+
+    # Split into cached answers and companies that still need the model
+    cache = LLMAnswerCache('fix_tickers')
+    cached = []   # (company, suggestion)
+    to_ask = []
+    cached_skipped = 0
+    for c in candidates:
+        entry = cache.get(cache_key(c.get('isin'), c.get('name')))
+        if not entry:
+            to_ask.append(c)
+        elif entry['status'] == STATUS_ACCEPTED:
+            cached.append((c, {'ticker': entry['answer'], 'confidence': 'high', 'cached': True}))
+        else:
+            cached_skipped += 1
+    print(f"  Cached answers: {len(cached)} accepted, {cached_skipped} rejected/private/unknown → {len(to_ask)} to ask")
+
     if not args.apply:
-        batches = (len(candidates) + BATCH_SIZE - 1) // BATCH_SIZE
+        batches = (len(to_ask) + BATCH_SIZE - 1) // BATCH_SIZE
         est_cost = batches * 0.015
         print(f"\n  Estimated cost: ~${est_cost:.2f} ({batches} batches × ~$0.015)")
         print(f"\n  Sample candidates (first 20):")
@@ -203,16 +214,15 @@ def main():
             existing_symbols.add(s.strip().upper())
     print(f"  Existing symbols in DB: {len(existing_symbols)}")
 
-    if args.limit:
-        candidates = candidates[:args.limit]
-
-    batches = [candidates[i:i + BATCH_SIZE] for i in range(0, len(candidates), BATCH_SIZE)]
+    batches = [to_ask[i:i + BATCH_SIZE] for i in range(0, len(to_ask), BATCH_SIZE)]
     stats = {'ticker_fixed': 0, 'marked_private': 0, 'validation_failed': 0, 'skipped': 0}
 
-    print(f"\n  Processing {len(candidates)} candidates in {len(batches)} batches...")
+    print(f"\n  Asking Claude for {len(to_ask)} companies in {len(batches)} batches...")
 
+    # 1. Collect suggestions of all batches
+    planned = list(cached)
     for batch_idx, batch in enumerate(batches):
-        print(f"\n  Batch {batch_idx + 1}/{len(batches)} ({len(batch)} companies)...")
+        print(f"  Batch {batch_idx + 1}/{len(batches)} ({len(batch)} companies)...")
 
         suggestions = suggest_tickers(client, batch)
 
@@ -221,74 +231,100 @@ def main():
             time.sleep(RATE_LIMIT_DELAY)
             continue
 
+        answered = set()
         for suggestion in suggestions:
             idx = suggestion.get('index', 0) - 1
-            if idx < 0 or idx >= len(batch):
+            if idx < 0 or idx >= len(batch) or idx in answered:
                 continue
+            answered.add(idx)
+            planned.append((batch[idx], suggestion))
 
-            company = batch[idx]
-            ticker = suggestion.get('ticker', '').strip()
-            confidence = suggestion.get('confidence', 'low')
-
-            if not ticker:
-                stats['skipped'] += 1
-                continue
+        # No answer for a company is an answer too — don't ask again right away
+        for idx, company in enumerate(batch):
+            if idx not in answered:
+                cache.record(cache_key(company.get('isin'), company.get('name')), None, STATUS_UNKNOWN)
 
-            # Handle PRIVATE classification
-            if ticker.upper() == 'PRIVATE':
-                if confidence in ('high', 'medium'):
-                    if supabase_helper.update_company(company['id'], {'listing_status': 'private'}):
-                        stats['marked_private'] += 1
-                        print(f"    {company.get('name', '?')[:35]:35s} → PRIVATE")
-                continue
+        time.sleep(RATE_LIMIT_DELAY)
 
-            # Check if ticker already exists in DB (avoid unique constraint violation)
-            if ticker.upper() in existing_symbols:
-                stats['skipped'] += 1
-                print(f"    {ticker:12s} for {company.get('name', '?')[:30]:30s} → skipped (symbol already taken)")
-                continue
+    # 2. Validate all new suggestions in bulk (then .DE variants of the misses)
+    to_validate = set()
+    for company, suggestion in planned:
+        ticker = suggestion.get('ticker', '').strip()
+        if ticker and ticker.upper() != 'PRIVATE' and not suggestion.get('cached') \
+                and ticker.upper() not in existing_symbols:
+            to_validate.add(ticker)
+    print(f"\n  Validating {len(to_validate)} suggested tickers via yfinance (bulk)...")
+    valid = validate_tickers_bulk(to_validate)
+    de_variants = {f"{t}.DE" for t in to_validate - valid if not t.endswith('.DE')}
+    de_variants = {t for t in de_variants if t.upper() not in existing_symbols}
+    valid |= validate_tickers_bulk(de_variants)
+
+    # 3. Apply
+    for company, suggestion in planned:
+        key = cache_key(company.get('isin'), company.get('name'))
+        ticker = suggestion.get('ticker', '').strip()
+        confidence = suggestion.get('confidence', 'low')
+
+        if not ticker:
+            stats['skipped'] += 1
+            cache.record(key, None, STATUS_UNKNOWN)
+            continue
 
-            # Validate ticker via yfinance
-            print(f"    Validating {ticker:12s} for {company.get('name', '?')[:30]}...", end=' ')
-            if validate_ticker(ticker):
-                updates = {
-                    'symbol': ticker,
-                    'listing_status': 'public'
-                }
-                if supabase_helper.update_company(company['id'], updates):
-                    stats['ticker_fixed'] += 1
-                    existing_symbols.add(ticker.upper())
-                    print(f"✓ VALID")
-                else:
-                    print(f"✗ update failed")
+        # Handle PRIVATE classification
+        if ticker.upper() == 'PRIVATE':
+            if confidence in ('high', 'medium'):
+                cache.record(key, 'PRIVATE', STATUS_PRIVATE)
+                if supabase_helper.update_company(company['id'], {'listing_status': 'private'}):
+                    stats['marked_private'] += 1
+                    print(f"    {company.get('name', '?')[:35]:35s} → PRIVATE")
             else:
-                # Try with .DE suffix for German stocks
-                de_ticker = f"{ticker}.DE" if not ticker.endswith('.DE') else None
-                if de_ticker and de_ticker.upper() in existing_symbols:
-                    stats['skipped'] += 1
-                    print(f"✗ skipped ({de_ticker} already taken)")
-                elif de_ticker and validate_ticker(de_ticker):
-                    updates = {
-                        'symbol': de_ticker,
-                        'listing_status': 'public'
-                    }
-                    if supabase_helper.update_company(company['id'], updates):
-                        stats['ticker_fixed'] += 1
-                        existing_symbols.add(de_ticker.upper())
-                        print(f"✓ VALID ({de_ticker})")
-                    else:
-                        print(f"✗ update failed")
-                else:
-                    stats['validation_failed'] += 1
-                    print(f"✗ invalid")
+                cache.record(key, 'PRIVATE', STATUS_UNKNOWN)
+            continue
 
-        time.sleep(RATE_LIMIT_DELAY)
+        # Check if ticker already exists in DB (avoid unique constraint violation)
+        if ticker.upper() in existing_symbols:
+            stats['skipped'] += 1
+            cache.record(key, ticker, STATUS_REJECTED)
+            print(f"    {ticker:12s} for {company.get('name', '?')[:30]:30s} → skipped (symbol already taken)")
+            continue
+
+        de_ticker = f"{ticker}.DE" if not ticker.endswith('.DE') else None
+        if suggestion.get('cached') or ticker in valid:
+            chosen = ticker
+        elif de_ticker and de_ticker.upper() in existing_symbols:
+            stats['skipped'] += 1
+            cache.record(key, de_ticker, STATUS_REJECTED)
+            print(f"    {ticker:12s} for {company.get('name', '?')[:30]:30s} → skipped ({de_ticker} already taken)")
+            continue
+        elif de_ticker and de_ticker in valid:
+            chosen = de_ticker
+        else:
+            stats['validation_failed'] += 1
+            cache.record(key, ticker, STATUS_REJECTED)
+            print(f"    {ticker:12s} for {company.get('name', '?')[:30]:30s} ✗ invalid")
+            continue
+
+        updates = {
+            'symbol': chosen,
+            'listing_status': 'public'
+        }
+        label = 'cached' if suggestion.get('cached') else 'VALID'
+        if supabase_helper.update_company(company['id'], updates):
+            stats['ticker_fixed'] += 1
+            existing_symbols.add(chosen.upper())
+            cache.record(key, chosen, STATUS_ACCEPTED)
+            print(f"    {chosen:12s} for {company.get('name', '?')[:30]:30s} ✓ {label}")
+        else:
+            print(f"    {chosen:12s} for {company.get('name', '?')[:30]:30s} ✗ update failed")
+
+    cache.save()
 
     print(f"\n  RESULTS:")
     print(f"    Tickers fixed:      {stats['ticker_fixed']}")
     print(f"    Marked private:     {stats['marked_private']}")
     print(f"    Validation failed:  {stats['validation_failed']}")
     print(f"    Skipped:            {stats['skipped']}")
+    print(f"    Cached answers:     {len(cached)} reused, {cached_skipped} skipped, {len(to_ask)} asked")
 
 
 if __name__ == '__main__':
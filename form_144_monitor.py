@@ -36,6 +36,7 @@ load_dotenv(os.path.join(SCRIPT_DIR, '.env'))
 
 import requests
 import supabase_helper
+from identifier_xref import IdentifierXref, index_companies, sec_ticker_map
 
 SEC_USER_AGENT = os.getenv('SEC_USER_AGENT', 'Blackfire Research (rseckler@gmail.com)')
 
@@ -130,14 +131,57 @@ def fetch_form144_details(cik: str, accession: str) -> dict | None:
     return {'accession': accession, 'cik': cik, 'url': idx_url}
 
 
-def match_company(client, cik: str, company_name: str | None) -> dict | None:
+LEGAL_SUFFIXES = re.compile(r'\b(inc|corp|ltd|llc|plc|sa|ag|nv|se|gmbh|co)\b\.?', re.IGNORECASE)
+
+
+def normalize_name(name: str) -> str:
+    """Firmenname ohne Rechtsform, Satzzeichen und Groß-/Kleinschreibung."""
+    n = LEGAL_SUFFIXES.sub(' ', name or '').lower()
+    return ' '.join(re.sub(r'[^\w]+', ' ', n).split())
+
+
+def index_company_ciks(xref: IdentifierXref, companies: list) -> int:
+    """Verknüpfe companies mit ihrer CIK über die SEC Ticker-Map (Symbol-Lookup).
+
+    Die Map kommt aus dem Xref-Snapshot (max. 1 Download pro Tag). Ein
+    gleiches Symbol allein reicht nicht (Auslandslistings mit kollidierendem
+    Kürzel): verknüpft wird nur bei US-ISIN oder wenn der SEC-Titel dem
+    normalisierten Firmennamen entspricht. Frühere Links ohne diese
+    Bestätigung werden entfernt.
+    """
+    try:
+        ticker_map = sec_ticker_map(xref, {'User-Agent': SEC_USER_AGENT, 'Accept': 'application/json'})
+    except Exception as e:
+        print(f"  ⚠ SEC ticker map unavailable: {e}")
+        return 0
+    linked = 0
+    for c in companies:
+        entry = ticker_map.get((c.get('symbol') or '').strip().upper())
+        confirmed = entry and (
+            (c.get('isin') or '').strip().upper().startswith('US')
+            or normalize_name(entry['title']) == normalize_name(c.get('name'))
+        )
+        # cik=None bei replace=True entfernt einen früheren Symbol-Link
+        xref.link_company(c['id'], 'sec_company_tickers', replace=True,
+                          cik=entry['cik'] if confirmed else None)
+        if confirmed:
+            linked += 1
+    return linked
+
+
+def match_company(client, cik: str, company_name: str | None,
+                  xref: IdentifierXref = None, companies_by_id: dict = None) -> dict | None:
     """Versuche Firma in DB zu finden via CIK oder Fuzzy-Name."""
-    # CIK first (wenn wir sie gespeichert haben) — aktuell nicht in companies, skippen
+    # CIK first (Identifier-Xref: SEC Ticker-Map + frühere exakte Name-Matches)
+    if xref and companies_by_id is not None:
+        company_id = xref.lookup_company('cik', cik)
+        if company_id in companies_by_id:
+            return companies_by_id[company_id]
     # → Name-Fuzzy
     if not company_name:
         return None
     # Normalize
-    short = re.sub(r'\b(inc|corp|ltd|llc|plc|sa|ag|nv|se|gmbh|co)\b\.?', '', company_name, flags=re.IGNORECASE).strip().strip(',.')
+    short = LEGAL_SUFFIXES.sub('', company_name).strip().strip(',.')
     short = short[:25]  # Top 25 chars for ILIKE
     if not short:
         return None
@@ -147,6 +191,9 @@ def match_company(client, cik: str, company_name: str | None) -> dict | None:
         # Exact name match prefer
         for r in rows:
             if r['name'].upper() == company_name.upper():
+                # Nur exakte Matches merken — Fuzzy-Treffer nicht festschreiben
+                if xref:
+                    xref.link_company(r['id'], 'form144_name_match', cik=cik)
                 return r
         if rows:
             return rows[0]
@@ -223,6 +270,14 @@ def main():
 
     print(f"  → {len(entries)} raw entries")
 
+    # CIK → Company ohne Netzwerk: Identifier-Xref aus Supabase + SEC Ticker-Map
+    xref = IdentifierXref()
+    companies = supabase_helper.get_all_companies('id, name, symbol, isin, wkn')
+    companies_by_id = {c['id']: {'id': c['id'], 'name': c['name'], 'symbol': c.get('symbol')} for c in companies}
+    index_companies(xref, companies)
+    linked = index_company_ciks(xref, companies)
+    print(f"  → {len(companies)} companies, {linked} with CIK via SEC ticker map")
+
     stats = Counter()
     to_insert = []
     to_alert = []
@@ -232,7 +287,7 @@ def main():
             stats['no_cik'] += 1
             continue
 
-        company = match_company(client, e['cik'], e['company_name'])
+        company = match_company(client, e['cik'], e['company_name'], xref, companies_by_id)
         if not company:
             stats['company_not_in_db'] += 1
             continue
@@ -281,6 +336,8 @@ def main():
             flag = '⚠ WATCHLIST' if relevant else ''
             print(f"    {company['name'][:40]:40s} ({company.get('symbol', '—')})  {flag}")
 
+    xref.save()
+
     print(f"\n  Stats:")
     for k, v in sorted(stats.items(), key=lambda x: -x[1]):
         print(f"    {k:30s}: {v:5d}")
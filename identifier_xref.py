@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Identifier cross-reference — persisted graph of company_id ↔ ISIN ↔ WKN ↔
+ticker ↔ CIK ↔ FIGI.
+
+Every script that resolves identifiers over the network (yfinance, OpenFIGI,
+SEC ticker map) records what it learned here, with provenance and a
+timestamp, and checks here first on the next run.
+
+Storage: .identifier_xref.json next to the scripts
+  {
+    "edges":     {"isin:US0378331005": {"ticker:AAPL": {"source": "openfigi", "seen_at": 1773481333.6}}},
+    "misses":    {"ticker:XYZ": {"isin": {"source": "yfinance", "seen_at": 1773481333.6}}},
+    "snapshots": {"sec_company_tickers": {"fetched_at": 1773481333.6, "data": {...}}}
+  }
+
+Edges are stored in both directions, so every lookup is a dict access.
+Lookups that find no direct edge follow the company node one hop
+(e.g. CIK → company → ISIN).
+
+Usage:
+    xref = IdentifierXref()
+    isin = xref.lookup('ticker', 'AAPL', 'isin')
+    if not isin and not xref.is_known_miss('ticker', 'AAPL', 'isin'):
+        isin = ...network lookup...
+        xref.link('ticker', 'AAPL', 'isin', isin, source='yfinance')
+    xref.save()
+"""
+
+import os
+from datetime import datetime
+
+import requests
+
+import local_store
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+XREF_FILE = os.path.join(SCRIPT_DIR, '.identifier_xref.json')
+
+KINDS = ('company', 'isin', 'wkn', 'ticker', 'cik', 'figi')
+
+# Facts older than this are ignored by lookup() (re-resolved on demand)
+XREF_MAX_AGE_DAYS = 30
+# Negative results ("yfinance has no ISIN for this ticker") expire sooner
+XREF_MISS_MAX_AGE_DAYS = 7
+
+SEC_TICKERS_URL = 'https://www.sec.gov/files/company_tickers.json'
+SEC_TICKERS_SNAPSHOT = 'sec_company_tickers'
+SEC_TICKERS_MAX_AGE_DAYS = 1
+
+
+def normalize(kind: str, value) -> str | None:
+    """Canonical form of an identifier value."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    if not value:
+        return None
+    if kind == 'company':
+        return value
+    if kind == 'cik':
+        try:
+            return str(int(value))  # strip leading zeros
+        except ValueError:
+            return None
+    value = value.upper()
+    if kind == 'isin' and value.startswith('BBG'):
+        return None  # a FIGI (older OpenFIGI results stored in companies.isin)
+    return value
+
+
+def _key(kind: str, value) -> str | None:
+    value = normalize(kind, value)
+    return f"{kind}:{value}" if value else None
+
+
+class IdentifierXref:
+    def __init__(self, path: str = XREF_FILE):
+        self.path = path
+        state = local_store.load_json(path)
+        self.edges = state.get('edges', {})
+        self.misses = state.get('misses', {})
+        self.snapshots = state.get('snapshots', {})
+        self._dirty_edges = set()     # (key_a, key_b) pairs to merge on save
+        self._removed_edges = set()
+        self._dirty_misses = set()    # (key, target_kind)
+        self._dirty_snapshots = set()
+
+    # ── Writes ──
+
+    def link(self, kind_a: str, value_a, kind_b: str, value_b, source: str) -> None:
+        """Record that two identifiers refer to the same security/company."""
+        key_a, key_b = _key(kind_a, value_a), _key(kind_b, value_b)
+        if not key_a or not key_b or key_a == key_b:
+            return
+        fact = {'source': source, 'seen_at': datetime.now().timestamp()}
+        for a, b in ((key_a, key_b), (key_b, key_a)):
+            self.edges.setdefault(a, {})[b] = fact
+            self._dirty_edges.add((a, b))
+            self._removed_edges.discard((a, b))
+        # A positive fact supersedes a cached miss
+        self._clear_miss(key_a, kind_b)
+        self._clear_miss(key_b, kind_a)
+
+    def link_company(self, company_id: str, source: str, replace: bool = False, **identifiers) -> None:
+        """Link a company to its identifiers (isin=, wkn=, ticker=, cik=, figi=).
+
+        replace=True drops earlier edges from the same source for the given
+        kinds first (e.g. a symbol changed in Supabase).
+        """
+        company_key = _key('company', company_id)
+        if not company_key:
+            return
+        if replace:
+            for neighbor, fact in list(self.edges.get(company_key, {}).items()):
+                kind = neighbor.split(':', 1)[0]
+                if kind in identifiers and fact.get('source') == source:
+                    self._unlink(company_key, neighbor)
+        for kind, value in identifiers.items():
+            if value:
+                self.link('company', company_id, kind, value, source)
+
+    def mark_miss(self, kind: str, value, target_kind: str, source: str) -> None:
+        """Remember that a lookup kind:value → target_kind found nothing."""
+        key = _key(kind, value)
+        if not key:
+            return
+        self.misses.setdefault(key, {})[target_kind] = {
+            'source': source, 'seen_at': datetime.now().timestamp(),
+        }
+        self._dirty_misses.add((key, target_kind))
+
+    def store_snapshot(self, name: str, data) -> None:
+        """Keep a bulk dataset (e.g. the SEC ticker map) with its fetch time."""
+        self.snapshots[name] = {'fetched_at': datetime.now().timestamp(), 'data': data}
+        self._dirty_snapshots.add(name)
+
+    def _unlink(self, key_a: str, key_b: str) -> None:
+        for a, b in ((key_a, key_b), (key_b, key_a)):
+            self.edges.get(a, {}).pop(b, None)
+            self._dirty_edges.discard((a, b))
+            self._removed_edges.add((a, b))
+
+    def _clear_miss(self, key: str, target_kind: str) -> None:
+        if target_kind in self.misses.get(key, {}):
+            self.misses[key].pop(target_kind)
+            self._dirty_misses.add((key, target_kind))
+
+    # ── Reads (O(1) dict lookups) ──
+
+    def _fresh(self, fact: dict, max_age_days: float) -> bool:
+        return datetime.now().timestamp() - fact.get('seen_at', 0) <= max_age_days * 86400
+
+    def lookup_all(self, kind: str, value, target_kind: str,
+                   max_age_days: float = XREF_MAX_AGE_DAYS, sources: tuple = None) -> list:
+        """All fresh target_kind values linked to kind:value, newest first.
+
+        sources restricts the result to facts from those sources and
+        disables the company hop (direct edges only).
+        """
+        key = _key(kind, value)
+        if not key:
+            return []
+        prefix = f"{target_kind}:"
+
+        def collect(node_key):
+            return [
+                (fact['seen_at'], neighbor[len(prefix):])
+                for neighbor, fact in self.edges.get(node_key, {}).items()
+                if neighbor.startswith(prefix) and self._fresh(fact, max_age_days)
+                and (sources is None or fact.get('source') in sources)
+            ]
+
+        found = collect(key)
+        if not found and sources is None and kind != 'company' and target_kind != 'company':
+            # One hop through the company node
+            for neighbor, fact in self.edges.get(key, {}).items():
+                if neighbor.startswith('company:') and self._fresh(fact, max_age_days):
+                    found.extend(collect(neighbor))
+
+        found.sort(reverse=True)
+        values = []
+        for _, v in found:
+            # normalize() drops values stored before it rejected them
+            if v not in values and normalize(target_kind, v):
+                values.append(v)
+        return values
+
+    def lookup(self, kind: str, value, target_kind: str,
+               max_age_days: float = XREF_MAX_AGE_DAYS, sources: tuple = None) -> str | None:
+        """Newest fresh target_kind value linked to kind:value, or None."""
+        values = self.lookup_all(kind, value, target_kind, max_age_days, sources)
+        return values[0] if values else None
+
+    def lookup_company(self, kind: str, value, max_age_days: float = XREF_MAX_AGE_DAYS) -> str | None:
+        """company_id for an identifier, or None."""
+        return self.lookup(kind, value, 'company', max_age_days)
+
+    def is_known_miss(self, kind: str, value, target_kind: str,
+                      max_age_days: float = XREF_MISS_MAX_AGE_DAYS) -> bool:
+        """True if a recent lookup kind:value → target_kind found nothing."""
+        key = _key(kind, value)
+        fact = self.misses.get(key, {}).get(target_kind) if key else None
+        return bool(fact) and self._fresh(fact, max_age_days)
+
+    def get_snapshot(self, name: str, max_age_days: float):
+        """Snapshot data if fetched within max_age_days, else None."""
+        snap = self.snapshots.get(name)
+        if not snap:
+            return None
+        if datetime.now().timestamp() - snap.get('fetched_at', 0) > max_age_days * 86400:
+            return None
+        return snap.get('data')
+
+    # ── Persistence ──
+
+    def save(self) -> None:
+        """Merge this process's changes into the file (locked, atomic)."""
+        if not (self._dirty_edges or self._removed_edges or self._dirty_misses or self._dirty_snapshots):
+            return
+
+        with local_store.file_lock(self.path):
+            state = local_store.load_json(self.path)
+            edges = state.setdefault('edges', {})
+            misses = state.setdefault('misses', {})
+            snapshots = state.setdefault('snapshots', {})
+
+            for a, b in self._removed_edges:
+                edges.get(a, {}).pop(b, None)
+            for a, b in self._dirty_edges:
+                fact = self.edges.get(a, {}).get(b)
+                if fact:
+                    edges.setdefault(a, {})[b] = fact
+            for key, target_kind in self._dirty_misses:
+                fact = self.misses.get(key, {}).get(target_kind)
+                if fact:
+                    misses.setdefault(key, {})[target_kind] = fact
+                else:
+                    misses.get(key, {}).pop(target_kind, None)
+            for name in self._dirty_snapshots:
+                snapshots[name] = self.snapshots[name]
+
+            state['edges'] = {k: v for k, v in edges.items() if v}
+            state['misses'] = {k: v for k, v in misses.items() if v}
+            local_store.save_json(self.path, state)
+
+        self.edges = state['edges']
+        self.misses = state['misses']
+        self.snapshots = snapshots
+        self._dirty_edges = set()
+        self._removed_edges = set()
+        self._dirty_misses = set()
+        self._dirty_snapshots = set()
+
+
+def index_companies(xref: IdentifierXref, companies: list) -> int:
+    """Link Supabase company rows (id, symbol, isin, wkn) into the graph.
+
+    Uses replace=True so changed identifiers in Supabase replace the old ones.
+    Returns the number of companies with at least one identifier.
+    """
+    indexed = 0
+    for c in companies:
+        ids = {
+            'ticker': (c.get('symbol') or '').strip() or None,
+            'isin': (c.get('isin') or '').strip() or None,
+            'wkn': (c.get('wkn') or '').strip() or None,
+        }
+        ids = {k: v for k, v in ids.items() if v and ' ' not in v}
+        if ids:
+            xref.link_company(c['id'], 'supabase', replace=True, **ids)
+            indexed += 1
+    return indexed
+
+
+def sec_ticker_map(xref: IdentifierXref, headers: dict,
+                   max_age_days: float = SEC_TICKERS_MAX_AGE_DAYS) -> dict:
+    """SEC ticker → {cik, title} map, downloaded at most once per max_age_days.
+
+    Also links every ticker to its CIK in the graph.
+    """
+    mapping = xref.get_snapshot(SEC_TICKERS_SNAPSHOT, max_age_days)
+    if mapping is not None:
+        return mapping
+
+    r = requests.get(SEC_TICKERS_URL, headers=headers, timeout=30)
+    r.raise_for_status()
+    data = r.json()
+    # Format: { "0": {"cik_str": 320193, "ticker": "AAPL", "title": "Apple Inc."}, ... }
+    mapping = {}
+    for entry in data.values():
+        ticker = entry['ticker'].upper()
+        mapping[ticker] = {
+            'cik': int(entry['cik_str']),
+            'title': entry['title'],
+        }
+        xref.link('ticker', ticker, 'cik', entry['cik_str'], source='sec_company_tickers')
+
+    xref.store_snapshot(SEC_TICKERS_SNAPSHOT, mapping)
+    xref.save()
+    return mapping
@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 """
 Hybrid ISIN → Ticker Mapper
-1. Primary: OpenFIGI (präzise, kostenlos)
-2. Fallback: ChatGPT (für unbekannte ISINs)
-3. Validation: yfinance (Preis-Check)
+1. Primary: OpenFIGI (präzise, kostenlos) — multi-job requests,
+   100 jobs/request with OPENFIGI_API_KEY, 10 without
+2. Fallback: ChatGPT (für unbekannte ISINs, Antworten in .llm_answer_cache.json)
+3. Validation: yfinance (Preis-Check, bulk via yf.download)
 """
 
 import os
@@ -13,68 +14,208 @@ import time
 import yfinance as yf
 from dotenv import load_dotenv
 
+import llm_answer_cache
+
 load_dotenv()
 
+OPENFIGI_URL = "https://api.openfigi.com/v3/mapping"
+OPENFIGI_API_KEY = os.getenv('OPENFIGI_API_KEY', '')
+
+# OpenFIGI v3 limits: jobs per mapping request depend on the API-key tier
+OPENFIGI_JOBS_PER_REQUEST_KEY = 100
+OPENFIGI_JOBS_PER_REQUEST_ANON = 10
+OPENFIGI_MAX_RETRIES = 3
+OPENFIGI_DEFAULT_WAIT = 6  # seconds, when a 429 carries no reset header
+
+# Tickers per yf.download() call when validating in bulk
+VALIDATION_CHUNK_SIZE = 200
+
+# Identifier-xref sources written by the mapper
+XREF_SOURCE_OPENFIGI = 'openfigi'      # raw OpenFIGI answer
+XREF_SOURCE_VALIDATED = 'validated'    # ticker confirmed by a yfinance price
+# Validated mappings are reused without network for this long
+VALIDATED_MAX_AGE_DAYS = 7
+
+
+def validate_tickers_bulk(tickers):
+    """Validate many tickers with bulk yf.download() calls.
+
+    A ticker is valid if it has a positive close in the last 5 days.
+    Returns the set of valid tickers.
+    """
+    tickers = sorted({t for t in tickers if t})
+    valid = set()
+
+    for i in range(0, len(tickers), VALIDATION_CHUNK_SIZE):
+        chunk = tickers[i:i + VALIDATION_CHUNK_SIZE]
+        try:
+            data = yf.download(chunk, period='5d', group_by='ticker',
+                               progress=False, threads=True)
+        except Exception:
+            continue
+        if data is None or data.empty:
+            continue
+
+        multi = getattr(data.columns, 'nlevels', 1) > 1
+        for ticker in chunk:
+            try:
+                closes = (data[ticker]['Close'] if multi else data['Close']).dropna()
+            except KeyError:
+                continue
+            if len(closes) and float(closes.iloc[-1]) > 0:
+                valid.add(ticker)
+
+    return valid
+
+
 class HybridISINMapper:
-    def __init__(self):
+    def __init__(self, xref=None):
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
-        self.cache = {}  # In-memory cache
-        self.batch_size = 100  # Process 100 ISINs per batch
-
-    def map_isin_openfigi(self, isin):
-        """Map ISIN using OpenFIGI (primary method)"""
-        if not isin or len(isin) != 12:
+        self.cache = {}  # In-memory cache of validated ISIN -> ticker
+        # Optional IdentifierXref: answers from earlier runs, saved by the caller
+        self.xref = xref
+        # ChatGPT answers (accepted and rejected) from earlier runs
+        self.llm_cache = llm_answer_cache.LLMAnswerCache('isin_ticker_mapper')
+        self._chatgpt_asked = set()
+        self.figi_results = {}  # Raw OpenFIGI answers: ISIN -> ticker or None (miss)
+        # Jobs per OpenFIGI request, sized to the API-key tier
+        self.batch_size = OPENFIGI_JOBS_PER_REQUEST_KEY if OPENFIGI_API_KEY else OPENFIGI_JOBS_PER_REQUEST_ANON
+        self.openfigi_requests = 0
+
+    def _pick_ticker(self, isin, results):
+        """Pick the best Yahoo ticker from an OpenFIGI result list"""
+        if not results:
             return None
 
-        try:
-            url = "https://api.openfigi.com/v3/mapping"
+        # Find best match
+        for result in results:
+            ticker = result.get('ticker', '')
+            exch_code = result.get('exchCode', '')
+
+            # Prefer major exchanges
+            if exch_code in ['GY', 'GR', 'GF']:  # German
+                return f"{ticker}.DE"
+            elif exch_code == 'US':
+                return ticker
+            elif exch_code in ['SW', 'VX']:  # Swiss
+                return ticker
+
+        # Fallback to first result
+        ticker = results[0].get('ticker', '')
+        if ticker:
+            if isin.startswith('DE'):
+                return f"{ticker}.DE"
+            return ticker
 
-            headers = {
-                'Content-Type': 'application/json'
-            }
+        return None
 
-            query = {"idType": "ID_ISIN", "idValue": isin}
+    def remember_ticker(self, isin, ticker):
+        self.cache[isin] = ticker
+        if self.xref:
+            self.xref.link('isin', isin, 'ticker', ticker, source=XREF_SOURCE_VALIDATED)
+
+    def cached_ticker(self, isin):
+        """Validated ticker from this run or (if fresh) an earlier one."""
+        if isin in self.cache:
+            return self.cache[isin]
+        if self.xref:
+            ticker = self.xref.lookup('isin', isin, 'ticker', max_age_days=VALIDATED_MAX_AGE_DAYS,
+                                      sources=(XREF_SOURCE_VALIDATED,))
+            if ticker:
+                self.cache[isin] = ticker
+            return ticker
+        return None
 
-            response = requests.post(
-                url,
-                headers=headers,
-                json=[query],
-                timeout=10
-            )
+    def _openfigi_request(self, jobs):
+        """POST one multi-job mapping request, honoring OpenFIGI rate-limit headers.
 
-            if response.status_code == 200:
-                data = response.json()
-                if data and len(data) > 0 and 'data' in data[0]:
-                    results = data[0]['data']
-                    if results:
-                        # Find best match
-                        for result in results:
-                            ticker = result.get('ticker', '')
-                            exch_code = result.get('exchCode', '')
-
-                            # Prefer major exchanges
-                            if exch_code in ['GY', 'GR', 'GF']:  # German
-                                return f"{ticker}.DE"
-                            elif exch_code == 'US':
-                                return ticker
-                            elif exch_code in ['SW', 'VX']:  # Swiss
-                                return ticker
-
-                        # Fallback to first result
-                        ticker = results[0].get('ticker', '')
-                        if ticker:
-                            if isin.startswith('DE'):
-                                return f"{ticker}.DE"
-                            return ticker
-
-            # Rate limit (10/min = 6 sec wait)
-            time.sleep(0.3)
+        Returns the per-job result list (same order as jobs) or None on failure.
+        """
+        headers = {
+            'Content-Type': 'application/json'
+        }
+        if OPENFIGI_API_KEY:
+            headers['X-OPENFIGI-APIKEY'] = OPENFIGI_API_KEY
 
-        except Exception as e:
-            pass
+        for attempt in range(OPENFIGI_MAX_RETRIES):
+            try:
+                response = requests.post(OPENFIGI_URL, headers=headers, json=jobs, timeout=30)
+            except Exception:
+                return None
+            self.openfigi_requests += 1
+
+            reset = response.headers.get('ratelimit-reset')
+            wait = float(reset) if reset and reset.replace('.', '', 1).isdigit() else OPENFIGI_DEFAULT_WAIT
+
+            if response.status_code == 429:
+                print(f"      OpenFIGI rate limited, waiting {wait:.0f}s...")
+                time.sleep(wait)
+                continue
+
+            if response.status_code != 200:
+                return None
+
+            # Window exhausted: wait for the reset before the next request
+            if response.headers.get('ratelimit-remaining') == '0':
+                time.sleep(wait)
+
+            try:
+                return response.json()
+            except ValueError:
+                return None
 
         return None
 
+    def prefetch_openfigi(self, isin_list):
+        """Resolve many ISINs with as few multi-job OpenFIGI requests as possible.
+
+        Results (including misses) land in self.figi_results, so later
+        map_isin_openfigi() calls for these ISINs need no request.
+        """
+        pending = []
+        seen = set()
+        for isin in isin_list:
+            if not isin or len(isin) != 12 or isin in self.figi_results or isin in seen:
+                continue
+            seen.add(isin)
+            if self.xref:
+                known = self.xref.lookup('isin', isin, 'ticker', sources=(XREF_SOURCE_OPENFIGI,))
+                if known or self.xref.is_known_miss('isin', isin, 'ticker'):
+                    self.figi_results[isin] = known
+                    continue
+            pending.append(isin)
+
+        for i in range(0, len(pending), self.batch_size):
+            chunk = pending[i:i + self.batch_size]
+            jobs = [{"idType": "ID_ISIN", "idValue": isin} for isin in chunk]
+            data = self._openfigi_request(jobs)
+            if data is None:
+                continue  # leave unresolved, retried on next lookup
+
+            for isin, item in zip(chunk, data):
+                results = item.get('data') or []
+                ticker = self._pick_ticker(isin, results)
+                self.figi_results[isin] = ticker
+                if self.xref:
+                    if ticker:
+                        self.xref.link('isin', isin, 'ticker', ticker, source=XREF_SOURCE_OPENFIGI)
+                        self.xref.link('isin', isin, 'figi', results[0].get('compositeFIGI'),
+                                       source=XREF_SOURCE_OPENFIGI)
+                    elif 'error' not in item:
+                        self.xref.mark_miss('isin', isin, 'ticker', source=XREF_SOURCE_OPENFIGI)
+
+        return {isin: self.figi_results.get(isin) for isin in seen}
+
+    def map_isin_openfigi(self, isin):
+        """Map ISIN using OpenFIGI (primary method)"""
+        if not isin or len(isin) != 12:
+            return None
+
+        if isin not in self.figi_results:
+            self.prefetch_openfigi([isin])
+
+        return self.figi_results.get(isin)
+
     def validate_ticker(self, ticker):
         """Validate ticker with yfinance"""
         try:
@@ -85,44 +226,95 @@ class HybridISINMapper:
         except:
             return False
 
+    def validate_tickers(self, tickers):
+        """Validate many tickers in bulk, returns the set of valid ones."""
+        return validate_tickers_bulk(tickers)
+
     def map_batch_openfigi(self, isin_list):
-        """Map batch of ISINs using OpenFIGI"""
+        """Map batch of ISINs using OpenFIGI.
+
+        Sends multi-job requests (batch_size jobs each), then validates all
+        candidate tickers in bulk through yfinance.
+        """
         results = {}
+        to_map = []
 
-        print(f"   Processing {len(isin_list)} ISINs with OpenFIGI...")
+        for isin in isin_list:
+            ticker = self.cached_ticker(isin)
+            if ticker:
+                results[isin] = ticker
+            else:
+                to_map.append(isin)
 
-        for i, isin in enumerate(isin_list):
-            if isin in self.cache:
-                results[isin] = self.cache[isin]
-                continue
+        print(f"   Processing {len(to_map)} ISINs with OpenFIGI ({self.batch_size} per request)...")
 
-            ticker = self.map_isin_openfigi(isin)
+        requests_before = self.openfigi_requests
+        candidates = {isin: t for isin, t in self.prefetch_openfigi(to_map).items() if t}
+        print(f"      ... {len(candidates)} candidates from "
+              f"{self.openfigi_requests - requests_before} OpenFIGI requests")
 
-            if ticker and self.validate_ticker(ticker):
+        valid = self.validate_tickers(candidates.values())
+        for isin, ticker in candidates.items():
+            if ticker in valid:
                 results[isin] = ticker
-                self.cache[isin] = ticker
-
-            if (i + 1) % 10 == 0:
-                print(f"      ... {i + 1}/{len(isin_list)} processed")
+                self.remember_ticker(isin, ticker)
 
+        print(f"      ... {len(valid)} tickers validated")
         return results
 
     def map_with_chatgpt_fallback(self, failed_isins):
-        """Use ChatGPT for ISINs where OpenFIGI failed"""
+        """Use ChatGPT for ISINs where OpenFIGI failed.
+
+        Answers are cached per ISIN (accepted and rejected), so only ISINs
+        without a fresh cached answer are sent to the model. Suggestions of
+        all batches are validated together in bulk.
+        """
         if not failed_isins or not self.openai_api_key:
             return {}
 
-        print(f"   Using ChatGPT fallback for {len(failed_isins)} ISINs...")
+        results = {}
+        to_ask = []
+        for isin in dict.fromkeys(failed_isins):
+            entry = self.llm_cache.get(llm_answer_cache.cache_key(isin=isin))
+            if not entry:
+                to_ask.append(isin)
+            elif entry['status'] == llm_answer_cache.STATUS_ACCEPTED:
+                results[isin] = entry['answer']
+                self.remember_ticker(isin, entry['answer'])
+
+        print(f"   ChatGPT fallback: {len(results)} cached answers, "
+              f"{len(failed_isins) - len(results) - len(to_ask)} cached rejects, {len(to_ask)} new ISINs")
+        if not to_ask:
+            return results
 
         # Batch into groups of 20
-        results = {}
+        suggestions = {}
 
-        for i in range(0, len(failed_isins), 20):
-            batch = failed_isins[i:i+20]
+        for i in range(0, len(to_ask), 20):
+            batch = to_ask[i:i+20]
+            suggestions.update(self._ask_chatgpt(batch))
 
-            isins_text = "\n".join([f"- {isin}" for isin in batch])
+        valid = validate_tickers_bulk(suggestions.values())
+        for isin in to_ask:
+            key = llm_answer_cache.cache_key(isin=isin)
+            ticker = suggestions.get(isin)
+            if ticker and ticker in valid:
+                results[isin] = ticker
+                self.remember_ticker(isin, ticker)
+                self.llm_cache.record(key, ticker, llm_answer_cache.STATUS_ACCEPTED)
+            elif ticker:
+                self.llm_cache.record(key, ticker, llm_answer_cache.STATUS_REJECTED)
+            elif isin in self._chatgpt_asked:
+                self.llm_cache.record(key, None, llm_answer_cache.STATUS_UNKNOWN)
+
+        self.llm_cache.save()
+        return results
 
-            prompt = f"""Map these ISINs to Yahoo Finance ticker symbols. Output ONLY valid JSON.
+    def _ask_chatgpt(self, batch):
+        """One ChatGPT request for up to 20 ISINs, returns {isin: ticker}"""
+        isins_text = "\n".join([f"- {isin}" for isin in batch])
+
+        prompt = f"""Map these ISINs to Yahoo Finance ticker symbols. Output ONLY valid JSON.
 
 ISINs:
 {isins_text}
@@ -135,54 +327,53 @@ Rules:
 JSON format:
 {{"ISIN1": "TICKER1", "ISIN2": "TICKER2"}}"""
 
-            headers = {
-                'Authorization': f'Bearer {self.openai_api_key}',
-                'Content-Type': 'application/json'
-            }
-
-            payload = {
-                'model': 'gpt-4o-mini',
-                'messages': [
-                    {'role': 'system', 'content': 'Financial data expert. Output ONLY valid JSON, no markdown.'},
-                    {'role': 'user', 'content': prompt}
-                ],
-                'temperature': 0.1,
-                'max_tokens': 500
-            }
+        headers = {
+            'Authorization': f'Bearer {self.openai_api_key}',
+            'Content-Type': 'application/json'
+        }
+
+        payload = {
+            'model': 'gpt-4o-mini',
+            'messages': [
+                {'role': 'system', 'content': 'Financial data expert. Output ONLY valid JSON, no markdown.'},
+                {'role': 'user', 'content': prompt}
+            ],
+            'temperature': 0.1,
+            'max_tokens': 500
+        }
 
-            try:
-                response = requests.post(
-                    'https://api.openai.com/v1/chat/completions',
-                    headers=headers,
-                    json=payload,
-                    timeout=30
-                )
-
-                if response.status_code == 200:
-                    data = response.json()
-                    content = data['choices'][0]['message']['content'].strip()
-
-                    # Clean response
-                    if '```' in content:
-                        content = content.split('```')[1]
-                        if content.startswith('json'):
-                            content = content[4:]
-                        content = content.strip()
-
-                    # Parse JSON
-                    mappings = json.loads(content)
-
-                    # Validate each ticker
-                    for isin, ticker in mappings.items():
-                        if ticker and ticker != 'UNKNOWN':
-                            if self.validate_ticker(ticker):
-                                results[isin] = ticker
-                                self.cache[isin] = ticker
-
-            except Exception as e:
-                print(f"      ⚠️  ChatGPT batch failed: {e}")
+        try:
+            response = requests.post(
+                'https://api.openai.com/v1/chat/completions',
+                headers=headers,
+                json=payload,
+                timeout=30
+            )
 
-        return results
+            if response.status_code == 200:
+                data = response.json()
+                content = data['choices'][0]['message']['content'].strip()
+
+                # Clean response
+                if '```' in content:
+                    content = content.split('```')[1]
+                    if content.startswith('json'):
+                        content = content[4:]
+                    content = content.strip()
+
+                # Parse JSON
+                mappings = json.loads(content)
+                # Only ISINs of a parsed answer count as asked (skipped = unknown)
+                self._chatgpt_asked.update(batch)
+                return {
+                    isin: ticker for isin, ticker in mappings.items()
+                    if isin in batch and ticker and ticker != 'UNKNOWN'
+                }
+
+        except Exception as e:
+            print(f"      ⚠️  ChatGPT batch failed: {e}")
+
+        return {}
 
 
 if __name__ == "__main__":
@@ -13,6 +13,14 @@ import time
 load_dotenv()
 
 import supabase_helper
+from identifier_xref import IdentifierXref, index_companies
+
+
+def wkn_from_isin(isin):
+    """WKN is typically last 6 chars of German ISIN"""
+    if isin and isin.startswith('DE') and len(isin) == 12:
+        return isin[-6:]
+    return ''
 
 
 class ISINWKNUpdater:
@@ -20,8 +28,38 @@ class ISINWKNUpdater:
         self.stats = {
             'processed': 0,
             'updated': 0,
-            'skipped': 0
+            'skipped': 0,
+            'xref_hits': 0,
+            'xref_misses': 0,
         }
+        # Identifier mappings from earlier runs / other scripts
+        self.xref = IdentifierXref()
+
+    def lookup_isin(self, symbol):
+        """ISIN/WKN for a symbol: identifier xref first, then yfinance/OpenFIGI.
+
+        Returns (result, used_network).
+        """
+        isin = self.xref.lookup('ticker', symbol, 'isin')
+        if isin:
+            self.stats['xref_hits'] += 1
+            return {'isin': isin, 'wkn': wkn_from_isin(isin)}, False
+        if self.xref.is_known_miss('ticker', symbol, 'isin'):
+            self.stats['xref_misses'] += 1
+            return None, False
+
+        result = self.get_isin_wkn_from_yfinance(symbol)
+        if result:
+            self.xref.link('ticker', symbol, 'isin', result['isin'], source='yfinance')
+            return result, True
+
+        result = self.get_isin_from_openfigi(symbol)
+        if result:
+            # OpenFIGI answers with a FIGI, not an ISIN: keep it as a figi edge only
+            self.xref.link('ticker', symbol, 'figi', result['isin'], source='openfigi')
+        # No ISIN found either way; the miss also keeps OpenFIGI from being asked again
+        self.xref.mark_miss('ticker', symbol, 'isin', source='yfinance+openfigi')
+        return None, True
 
     def get_isin_wkn_from_yfinance(self, symbol):
         """Try to get ISIN from yfinance"""
@@ -30,14 +68,8 @@ class ISINWKNUpdater:
             info = ticker.info
 
             isin = info.get('isin', '')
-
-            # WKN is typically last 6 chars of German ISIN
-            wkn = ''
-            if isin and isin.startswith('DE') and len(isin) == 12:
-                wkn = isin[-6:]
-
             if isin:
-                return {'isin': isin, 'wkn': wkn}
+                return {'isin': isin, 'wkn': wkn_from_isin(isin)}
 
         except Exception:
             pass
@@ -49,19 +81,15 @@ class ISINWKNUpdater:
                 info = ticker.info
 
                 isin = info.get('isin', '')
-                wkn = ''
-                if isin and isin.startswith('DE') and len(isin) == 12:
-                    wkn = isin[-6:]
-
                 if isin:
-                    return {'isin': isin, 'wkn': wkn}
+                    return {'isin': isin, 'wkn': wkn_from_isin(isin)}
             except Exception:
                 pass
 
         return None
 
     def get_isin_from_openfigi(self, symbol):
-        """Get ISIN from Symbol using OpenFIGI API (free)"""
+        """Get the FIGI for a Symbol from the OpenFIGI API (free) - not an ISIN"""
         try:
             url = "https://api.openfigi.com/v3/mapping"
             headers_figi = {'Content-Type': 'application/json'}
@@ -116,6 +144,7 @@ class ISINWKNUpdater:
             return False
 
         print(f"   Found {len(companies)} companies")
+        index_companies(self.xref, companies)
         print(f"\n  Processing...")
 
         for company in companies:
@@ -141,10 +170,7 @@ class ISINWKNUpdater:
             self.stats['processed'] += 1
 
             # Try to get ISIN/WKN
-            result = self.get_isin_wkn_from_yfinance(symbol)
-
-            if not result:
-                result = self.get_isin_from_openfigi(symbol)
+            result, used_network = self.lookup_isin(symbol)
 
             if result and result.get('isin'):
                 update_data = {}
@@ -158,9 +184,13 @@ class ISINWKNUpdater:
                         self.stats['updated'] += 1
                         if self.stats['updated'] % 10 == 0:
                             print(f"   ... {self.stats['updated']} updated")
+                        self.xref.link_company(company_id, 'supabase', **update_data)
 
             # Rate limiting
-            time.sleep(0.5)
+            if used_network:
+                time.sleep(0.5)
+
+        self.xref.save()
 
         print("\n" + "="*70)
         print("  UPDATE COMPLETE!")
@@ -168,6 +198,7 @@ class ISINWKNUpdater:
         print(f"   Processed: {self.stats['processed']}")
         print(f"   Updated: {self.stats['updated']}")
         print(f"   Skipped: {self.stats['skipped']}")
+        print(f"   Xref hits/known misses: {self.stats['xref_hits']}/{self.stats['xref_misses']}")
 
         return True
 
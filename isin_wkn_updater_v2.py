@@ -6,9 +6,12 @@ Strategies (in order of execution):
   1. Harvest from extra_data: Copy ISIN/WKN from extra_data JSONB to core columns (free, instant)
   2. ISIN → WKN derivation: For German ISINs (DE...), derive WKN from ISIN (free, instant)
   3. WKN → ISIN derivation: For companies with WKN in extra_data, construct DE-ISIN (free, instant)
-  4. yfinance lookup: Use symbol to look up ISIN via yfinance (free, slow)
+  4. yfinance lookup: Use symbol to look up ISIN via yfinance (free, parallel under a shared rate limit)
   5. OpenFIGI API: Use symbol/ISIN to look up identifiers (250 req/day free)
 
+Companies are read once; strategies stage their changes on that working set
+and everything is written in a single bulk flush at the end.
+
 Run modes:
   --harvest-only   Only run strategies 1-3 (no API calls, safe and fast)
   --full           Run all strategies (default)
@@ -20,18 +23,25 @@ import re
 import sys
 import time
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from dotenv import load_dotenv
 
 load_dotenv()
 
 import supabase_helper
+from identifier_xref import IdentifierXref, index_companies
+from rate_limit import RateLimiter
 
 # ISIN format: 2-letter country code + 9 alphanumeric + 1 check digit = 12 chars
 ISIN_PATTERN = re.compile(r'^[A-Z]{2}[A-Z0-9]{9}[0-9]$')
 # WKN format: 6 alphanumeric characters
 WKN_PATTERN = re.compile(r'^[A-Z0-9]{6}$')
 
+# yfinance lookups: parallel workers sharing one rate limit (requests/second)
+YFINANCE_WORKERS = 4
+YFINANCE_RATE = 3.0
+
 
 def is_valid_isin(value):
     """Check if string is a valid ISIN format."""
@@ -77,9 +87,27 @@ def wkn_from_german_isin(isin):
     return None
 
 
+def has_isin(c):
+    return bool(c.get('isin')) and len(str(c['isin']).strip()) > 3
+
+
+def has_wkn(c):
+    return bool(c.get('wkn')) and len(str(c['wkn']).strip()) > 3
+
+
 class ISINWKNUpdaterV2:
-    def __init__(self, dry_run=False):
+    """Strategies share one in-memory working set (the company rows from
+    run()). Each strategy stages its changes on those rows, so later
+    strategies see earlier results without re-reading Supabase; all staged
+    changes are written in one bulk flush at the end of the run.
+    """
+
+    def __init__(self, dry_run=False, yfinance_workers=YFINANCE_WORKERS, yfinance_rate=YFINANCE_RATE):
         self.dry_run = dry_run
+        self.yfinance_workers = yfinance_workers
+        self.yfinance_rate = yfinance_rate
+        self.pending_updates = {}  # company_id -> staged column values
+        self._original = {}        # company_id -> isin/wkn before staging
         self.stats = {
             'total_companies': 0,
             'existing_isin': 0,
@@ -92,8 +120,50 @@ class ISINWKNUpdaterV2:
             'openfigi_isin': 0,
             'openfigi_wkn': 0,
             'openfigi_calls': 0,
+            'xref_hits': 0,
+            'xref_misses': 0,
             'errors': 0,
         }
+        # Identifier mappings from earlier runs / other scripts
+        self.xref = IdentifierXref()
+
+    def stage_update(self, c, data):
+        """Apply data to the working-set row and queue it for the flush."""
+        if c['id'] not in self._original:
+            self._original[c['id']] = {'isin': c.get('isin'), 'wkn': c.get('wkn')}
+        c.update(data)
+        self.pending_updates.setdefault(c['id'], {}).update(data)
+
+    def flush_updates(self, companies):
+        """Write all staged changes in bulk. Returns the number of rows written."""
+        if not self.pending_updates:
+            return 0
+
+        by_id = {c['id']: c for c in companies}
+        # Same column set for every row (PostgREST bulk upsert), name for NOT NULL
+        rows = [
+            {'id': cid, 'name': by_id[cid].get('name'),
+             'isin': by_id[cid].get('isin'), 'wkn': by_id[cid].get('wkn')}
+            for cid in self.pending_updates
+        ]
+        print(f"\n  Flushing {len(rows)} staged updates...")
+        failed = supabase_helper.bulk_update_companies(rows)
+
+        # Roll the working set back for rows that did not make it
+        for cid in failed:
+            by_id[cid].update(self._original[cid])
+        self.stats['errors'] += len(failed)
+
+        for cid in self.pending_updates:
+            if cid not in failed:
+                c = by_id[cid]
+                self.xref.link_company(cid, 'supabase', isin=c.get('isin'), wkn=c.get('wkn'))
+
+        written = len(rows) - len(failed)
+        print(f"    Written: {written}, failed: {len(failed)}")
+        self.pending_updates = {}
+        self._original = {}
+        return written
 
     def analyze(self, companies):
         """Print detailed coverage analysis without making any changes."""
@@ -220,50 +290,31 @@ class ISINWKNUpdaterV2:
                         break
 
             if update_data:
-                if not self.dry_run:
-                    if supabase_helper.update_company(c['id'], update_data):
-                        updated += 1
-                    else:
-                        self.stats['errors'] += 1
-                else:
-                    updated += 1
+                self.stage_update(c, update_data)
+                updated += 1
+                if self.dry_run:
                     print(f"    [DRY-RUN] Would update {c.get('name', 'unknown')}: {update_data}")
 
-        print(f"    Harvested: {self.stats['harvest_isin']} ISIN, {self.stats['harvest_wkn']} WKN ({updated} rows updated)")
+        print(f"    Harvested: {self.stats['harvest_isin']} ISIN, {self.stats['harvest_wkn']} WKN ({updated} rows staged)")
 
     def strategy_derive_wkn(self, companies):
         """Strategy 2: Derive WKN from German ISINs (DE...)."""
         print("\n  [Strategy 2] Deriving WKN from German ISINs...")
 
         for c in companies:
-            current_wkn = c.get('wkn')
-            if current_wkn and len(str(current_wkn).strip()) > 3:
+            if has_wkn(c):
                 continue
 
-            # Use ISIN from core column or from what we just harvested
-            isin = c.get('isin')
-            if not isin or len(str(isin).strip()) <= 3:
-                # Check extra_data too
-                ed = c.get('extra_data') or {}
-                for key in ['ISIN', 'isin', 'Isin']:
-                    val = clean_value(str(ed.get(key, '')))
-                    if val and is_valid_isin(val):
-                        isin = val
-                        break
-
-            if not isin:
+            # ISIN from core column, including what harvest just staged
+            if not has_isin(c):
                 continue
 
-            isin = str(isin).strip().upper()
+            isin = str(c['isin']).strip().upper()
             wkn = wkn_from_german_isin(isin)
             if wkn:
-                if not self.dry_run:
-                    if supabase_helper.update_company(c['id'], {'wkn': wkn}):
-                        self.stats['derive_wkn_from_isin'] += 1
-                    else:
-                        self.stats['errors'] += 1
-                else:
-                    self.stats['derive_wkn_from_isin'] += 1
+                self.stage_update(c, {'wkn': wkn})
+                self.stats['derive_wkn_from_isin'] += 1
+                if self.dry_run:
                     print(f"    [DRY-RUN] Would derive WKN {wkn} from ISIN {isin} for {c.get('name', 'unknown')}")
 
         print(f"    Derived: {self.stats['derive_wkn_from_isin']} WKN from German ISINs")
@@ -278,57 +329,77 @@ class ISINWKNUpdaterV2:
 
         print(f"\n  [Strategy 3] yfinance ISIN lookup (max {max_lookups})...")
 
+        # Working set already reflects harvest/derive results
         candidates = [
             c for c in companies
-            if (not c.get('isin') or len(str(c['isin']).strip()) <= 3)
+            if not has_isin(c)
             and c.get('symbol') and str(c['symbol']).strip()
             and ' ' not in str(c['symbol']).strip()
             and len(str(c['symbol']).strip()) <= 10
         ]
 
-        # Re-read companies to get fresh ISIN state after harvest
-        # (harvest may have already populated some)
-        if not self.dry_run:
-            fresh = supabase_helper.get_all_companies('id, isin')
-            isin_map = {r['id']: r.get('isin') for r in fresh}
-            candidates = [c for c in candidates if not isin_map.get(c['id']) or len(str(isin_map.get(c['id'], '')).strip()) <= 3]
-
         print(f"    Candidates: {len(candidates)} (processing max {max_lookups})")
-        processed = 0
 
+        # Known from an earlier run / another script? Only the rest hits yfinance
+        to_lookup = []
         for c in candidates[:max_lookups]:
             symbol = str(c['symbol']).strip()
-            processed += 1
-
-            if processed % 25 == 0:
-                print(f"    ... processed {processed}/{min(len(candidates), max_lookups)}")
-
-            # Try direct symbol
+            isin = self.xref.lookup('ticker', symbol, 'isin')
+            if isin:
+                self.stats['xref_hits'] += 1
+                self._apply_yfinance_isin(c, symbol, isin)
+            elif self.xref.is_known_miss('ticker', symbol, 'isin'):
+                self.stats['xref_misses'] += 1
+            else:
+                to_lookup.append((c, symbol))
+
+        limiter = RateLimiter(rate=self.yfinance_rate, burst=self.yfinance_workers)
+
+        def lookup(symbol):
+            limiter.acquire()
             isin = self._yfinance_lookup(yf, symbol)
-
             # Try with .DE suffix for German stocks
             if not isin and '.' not in symbol:
+                limiter.acquire()
                 isin = self._yfinance_lookup(yf, f"{symbol}.DE")
+            return isin
 
-            if isin and is_valid_isin(isin):
-                update_data = {'isin': isin}
-                wkn = wkn_from_german_isin(isin)
-                if wkn:
-                    update_data['wkn'] = wkn
-                    self.stats['yfinance_wkn'] += 1
-
-                if not self.dry_run:
-                    if supabase_helper.update_company(c['id'], update_data):
-                        self.stats['yfinance_isin'] += 1
-                    else:
-                        self.stats['errors'] += 1
+        processed = 0
+        with ThreadPoolExecutor(max_workers=self.yfinance_workers) as pool:
+            futures = {pool.submit(lookup, symbol): (c, symbol) for c, symbol in to_lookup}
+            for future in as_completed(futures):
+                c, symbol = futures[future]
+                processed += 1
+                if processed % 25 == 0:
+                    print(f"    ... processed {processed}/{len(to_lookup)}")
+
+                isin = future.result()
+                if isin:
+                    self.xref.link('ticker', symbol, 'isin', isin, source='yfinance')
+                    self._apply_yfinance_isin(c, symbol, isin)
                 else:
-                    self.stats['yfinance_isin'] += 1
-                    print(f"    [DRY-RUN] yfinance: {c.get('name')} ({symbol}) -> ISIN={isin}")
+                    self.xref.mark_miss('ticker', symbol, 'isin', source='yfinance')
 
-            time.sleep(0.3)  # Be gentle
+        self.xref.save()
+        print(f"    Found: {self.stats['yfinance_isin']} ISIN, {self.stats['yfinance_wkn']} WKN via yfinance "
+              f"({len(to_lookup)} lookups, {self.yfinance_workers} workers, "
+              f"rate-limit wait {limiter.waited:.1f}s; xref hits: {self.stats['xref_hits']}, "
+              f"known misses skipped: {self.stats['xref_misses']})")
 
-        print(f"    Found: {self.stats['yfinance_isin']} ISIN, {self.stats['yfinance_wkn']} WKN via yfinance")
+    def _apply_yfinance_isin(self, c, symbol, isin):
+        """Stage an ISIN (and derived WKN) found for a symbol."""
+        if not is_valid_isin(isin):
+            return
+        update_data = {'isin': isin}
+        wkn = wkn_from_german_isin(isin)
+        if wkn:
+            update_data['wkn'] = wkn
+            self.stats['yfinance_wkn'] += 1
+
+        self.stage_update(c, update_data)
+        self.stats['yfinance_isin'] += 1
+        if self.dry_run:
+            print(f"    [DRY-RUN] yfinance: {c.get('name')} ({symbol}) -> ISIN={isin}")
 
     def _yfinance_lookup(self, yf, symbol):
         """Single yfinance ISIN lookup."""
@@ -346,20 +417,15 @@ class ISINWKNUpdaterV2:
         """Strategy 4: Look up ISIN via OpenFIGI for companies with symbol."""
         print(f"\n  [Strategy 4] OpenFIGI lookup (max {max_calls} API calls, 250/day limit)...")
 
+        # Working set already reflects earlier strategies
         candidates = [
             c for c in companies
-            if (not c.get('isin') or len(str(c['isin']).strip()) <= 3)
+            if not has_isin(c)
             and c.get('symbol') and str(c['symbol']).strip()
             and ' ' not in str(c['symbol']).strip()
             and len(str(c['symbol']).strip()) <= 10
         ]
 
-        # Re-read to get fresh state
-        if not self.dry_run:
-            fresh = supabase_helper.get_all_companies('id, isin')
-            isin_map = {r['id']: r.get('isin') for r in fresh}
-            candidates = [c for c in candidates if not isin_map.get(c['id']) or len(str(isin_map.get(c['id'], '')).strip()) <= 3]
-
         print(f"    Candidates: {len(candidates)} (processing max {max_calls})")
 
         # OpenFIGI supports batch requests of up to 10 items
@@ -422,22 +488,14 @@ class ISINWKNUpdaterV2:
         """Strategy 5: For companies with ISIN but no WKN, use OpenFIGI to find WKN."""
         print(f"\n  [Strategy 5] OpenFIGI ISIN→WKN lookup (max {max_calls} calls)...")
 
+        # Working set already reflects earlier strategies
         candidates = [
             c for c in companies
             if c.get('isin') and is_valid_isin(str(c['isin']).strip())
-            and (not c.get('wkn') or len(str(c['wkn']).strip()) <= 3)
+            and not has_wkn(c)
             and str(c['isin']).strip().upper().startswith('DE')  # Only German for WKN
         ]
 
-        if not self.dry_run:
-            fresh = supabase_helper.get_all_companies('id, isin, wkn')
-            state = {r['id']: r for r in fresh}
-            candidates = [
-                c for c in candidates
-                if state.get(c['id']) and state[c['id']].get('isin')
-                and (not state[c['id']].get('wkn') or len(str(state[c['id']].get('wkn', '')).strip()) <= 3)
-            ]
-
         print(f"    Candidates (German ISIN, no WKN): {len(candidates)}")
         # For these, we can simply derive WKN from DE-ISIN format
         derived = 0
@@ -445,11 +503,8 @@ class ISINWKNUpdaterV2:
             isin = str(c['isin']).strip().upper()
             wkn = wkn_from_german_isin(isin)
             if wkn:
-                if not self.dry_run:
-                    if supabase_helper.update_company(c['id'], {'wkn': wkn}):
-                        derived += 1
-                else:
-                    derived += 1
+                self.stage_update(c, {'wkn': wkn})
+                derived += 1
         print(f"    Derived {derived} WKN from German ISINs")
 
     def run(self, mode='full', max_yfinance=200, max_openfigi=200):
@@ -470,9 +525,10 @@ class ISINWKNUpdaterV2:
             return False
 
         self.stats['total_companies'] = len(companies)
-        self.stats['existing_isin'] = sum(1 for c in companies if c.get('isin') and len(str(c['isin']).strip()) > 3)
-        self.stats['existing_wkn'] = sum(1 for c in companies if c.get('wkn') and len(str(c['wkn']).strip()) > 3)
+        self.stats['existing_isin'] = sum(1 for c in companies if has_isin(c))
+        self.stats['existing_wkn'] = sum(1 for c in companies if has_wkn(c))
         print(f"  Found {len(companies)} companies")
+        index_companies(self.xref, companies)
         print(f"  Current coverage: ISIN={self.stats['existing_isin']} ({self.stats['existing_isin']/len(companies)*100:.1f}%), WKN={self.stats['existing_wkn']} ({self.stats['existing_wkn']/len(companies)*100:.1f}%)")
 
         if mode == 'analyze':
@@ -493,18 +549,21 @@ class ISINWKNUpdaterV2:
             # Skip for now - yfinance is more direct
             # self.strategy_openfigi(companies, max_calls=max_openfigi)
 
+        # Single bulk write of everything the strategies staged
+        staged = len(self.pending_updates)
+        if not self.dry_run:
+            self.flush_updates(companies)
+            self.xref.save()
+        else:
+            print(f"\n  [DRY-RUN] {staged} staged updates not written")
+
         # Final stats
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
 
-        # Re-read for final counts
-        if not self.dry_run:
-            final = supabase_helper.get_all_companies('id, isin, wkn')
-            final_isin = sum(1 for c in final if c.get('isin') and len(str(c['isin']).strip()) > 3)
-            final_wkn = sum(1 for c in final if c.get('wkn') and len(str(c['wkn']).strip()) > 3)
-        else:
-            final_isin = self.stats['existing_isin'] + self.stats['harvest_isin'] + self.stats['yfinance_isin'] + self.stats['openfigi_isin']
-            final_wkn = self.stats['existing_wkn'] + self.stats['harvest_wkn'] + self.stats['derive_wkn_from_isin'] + self.stats['yfinance_wkn'] + self.stats['openfigi_wkn']
+        # Final counts from the working set (failed writes were rolled back)
+        final_isin = sum(1 for c in companies if has_isin(c))
+        final_wkn = sum(1 for c in companies if has_wkn(c))
 
         total = self.stats['total_companies']
         print("\n" + "=" * 70)
@@ -555,10 +614,16 @@ def main():
     parser.add_argument('--dry-run', action='store_true', help='Print changes without applying')
     parser.add_argument('--max-yfinance', type=int, default=200, help='Max yfinance lookups')
     parser.add_argument('--max-openfigi', type=int, default=200, help='Max OpenFIGI API calls')
+    parser.add_argument('--yfinance-workers', type=int, default=YFINANCE_WORKERS, help='Parallel yfinance lookups')
+    parser.add_argument('--yfinance-rate', type=float, default=YFINANCE_RATE, help='yfinance requests per second')
 
     args = parser.parse_args()
 
-    updater = ISINWKNUpdaterV2(dry_run=args.dry_run)
+    updater = ISINWKNUpdaterV2(
+        dry_run=args.dry_run,
+        yfinance_workers=args.yfinance_workers,
+        yfinance_rate=args.yfinance_rate,
+    )
     success = updater.run(
         mode=args.mode,
         max_yfinance=args.max_yfinance,
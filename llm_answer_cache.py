@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+LLM answer cache — remembers what a model suggested for an identifier and
+whether the suggestion held up in validation.
+
+Used by the ticker fallbacks (HybridISINMapper.map_with_chatgpt_fallback,
+fix_tickers.py) so an ISIN or company name is only sent to the model again
+once its cached answer expired.
+
+Stored in .llm_answer_cache.json as {namespace: {key: entry}}:
+  {
+    "fix_tickers": {
+      "isin:DE0007164600": {"answer": "SAP.DE", "status": "accepted", "asked_at": 1773481333.6},
+      "name:acme robotics": {"answer": "ACME", "status": "rejected", "asked_at": 1773481333.6}
+    }
+  }
+
+Keys are the ISIN when there is one, otherwise the normalized company name.
+"""
+
+import os
+from datetime import datetime
+
+import local_store
+from company_names import normalize_company_name
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_FILE = os.path.join(SCRIPT_DIR, '.llm_answer_cache.json')
+
+STATUS_ACCEPTED = 'accepted'  # suggestion passed validation
+STATUS_REJECTED = 'rejected'  # suggestion failed validation
+STATUS_PRIVATE = 'private'    # model says not publicly traded
+STATUS_UNKNOWN = 'unknown'    # model gave no answer
+
+# Days until an identifier may be asked about again
+TTL_DAYS = {
+    STATUS_ACCEPTED: 90,
+    STATUS_REJECTED: 30,
+    STATUS_PRIVATE: 60,
+    STATUS_UNKNOWN: 14,
+}
+
+
+def cache_key(isin: str = None, name: str = None) -> str | None:
+    """ISIN if present, otherwise the normalized company name."""
+    isin = (isin or '').strip().upper()
+    if len(isin) == 12:
+        return f"isin:{isin}"
+    name = normalize_company_name(name or '') if name else ''
+    return f"name:{name}" if name else None
+
+
+class LLMAnswerCache:
+    def __init__(self, namespace: str, path: str = CACHE_FILE):
+        self.namespace = namespace
+        self.path = path
+        self.entries = local_store.load_json(path).get(namespace, {})
+        self._changed = {}
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, key: str) -> dict | None:
+        """Cached entry for key if still within its TTL, else None."""
+        entry = self.entries.get(key) if key else None
+        if entry:
+            ttl = TTL_DAYS.get(entry.get('status'), TTL_DAYS[STATUS_UNKNOWN])
+            if datetime.now().timestamp() - entry.get('asked_at', 0) <= ttl * 86400:
+                self.stats['hits'] += 1
+                return entry
+        self.stats['misses'] += 1
+        return None
+
+    def record(self, key: str, answer, status: str) -> None:
+        if not key:
+            return
+        entry = {'answer': answer, 'status': status, 'asked_at': datetime.now().timestamp()}
+        self.entries[key] = entry
+        self._changed[key] = entry
+
+    def save(self) -> None:
+        """Merge this run's answers into the file (locked, atomic)."""
+        if not self._changed:
+            return
+        with local_store.file_lock(self.path):
+            state = local_store.load_json(self.path)
+            entries = state.setdefault(self.namespace, {})
+            entries.update(self._changed)
+            # Drop entries past the longest TTL
+            cutoff = datetime.now().timestamp() - max(TTL_DAYS.values()) * 86400
+            state[self.namespace] = {k: v for k, v in entries.items() if v.get('asked_at', 0) > cutoff}
+            local_store.save_json(self.path, state)
+        self.entries = state[self.namespace]
+        self._changed = {}
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Asynchronous LLM batch jobs — submit many prompts at once, collect the
+answers in a later run.
+
+Backends:
+  AnthropicBatchBackend  Message Batches API (results within 24h, half price)
+  LocalBatchBackend      local stand-in: stores the job in a directory and
+                         answers it with a responder function after a number
+                         of polls. Used to exercise the submit → poll → apply
+                         flow without an API key (--batch-backend local).
+
+Jobs that are still running are kept in a BatchJobStore (JSON file), so the
+next cron run can poll them:
+
+    store = BatchJobStore(path)
+    job_id = backend.submit([(custom_id, prompt), ...])
+    store.add(job_id, backend.name, payload)
+    ...
+    for job_id, job in store.open_jobs():
+        if backend.status(job_id) == 'ended':
+            for custom_id, text in backend.results(job_id):
+                ...
+            store.remove(job_id)
+"""
+
+import json
+import os
+import uuid
+from datetime import datetime
+
+import local_store
+
+STATUS_IN_PROGRESS = 'in_progress'
+STATUS_ENDED = 'ended'
+
+
+class AnthropicBatchBackend:
+    name = 'anthropic'
+
+    def __init__(self, client, model: str, max_tokens: int = 2000):
+        self.client = client
+        self.model = model
+        self.max_tokens = max_tokens
+
+    def submit(self, requests: list) -> str:
+        """requests: [(custom_id, prompt)]. Returns the batch id."""
+        batch = self.client.messages.batches.create(requests=[
+            {
+                'custom_id': custom_id,
+                'params': {
+                    'model': self.model,
+                    'max_tokens': self.max_tokens,
+                    'messages': [{'role': 'user', 'content': prompt}],
+                },
+            }
+            for custom_id, prompt in requests
+        ])
+        return batch.id
+
+    def status(self, job_id: str) -> str:
+        batch = self.client.messages.batches.retrieve(job_id)
+        return STATUS_ENDED if batch.processing_status == 'ended' else STATUS_IN_PROGRESS
+
+    def results(self, job_id: str):
+        """Yield (custom_id, text); text is None for errored/expired requests."""
+        for entry in self.client.messages.batches.results(job_id):
+            text = None
+            if entry.result.type == 'succeeded':
+                text = entry.result.message.content[0].text
+            yield entry.custom_id, text
+
+
+class LocalBatchBackend:
+    name = 'local'
+
+    def __init__(self, directory: str, responder, ready_after_polls: int = 1):
+        """responder(prompt) -> answer text; a job ends after ready_after_polls status calls."""
+        self.directory = directory
+        self.responder = responder
+        self.ready_after_polls = ready_after_polls
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def submit(self, requests: list) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        job_id = f"local_{uuid.uuid4().hex[:12]}"
+        local_store.save_json(self._path(job_id), {
+            'polls': 0,
+            'requests': [[custom_id, prompt] for custom_id, prompt in requests],
+        })
+        return job_id
+
+    def status(self, job_id: str) -> str:
+        job = local_store.load_json(self._path(job_id))
+        if not job:
+            raise KeyError(f"unknown local batch job {job_id}")
+        job['polls'] += 1
+        local_store.save_json(self._path(job_id), job)
+        return STATUS_ENDED if job['polls'] >= self.ready_after_polls else STATUS_IN_PROGRESS
+
+    def results(self, job_id: str):
+        job = local_store.load_json(self._path(job_id))
+        for custom_id, prompt in job.get('requests', []):
+            try:
+                text = self.responder(prompt)
+            except Exception:
+                text = None
+            yield custom_id, text
+
+
+class BatchJobStore:
+    """Submitted jobs that have not been applied yet: {job_id: job}."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.jobs = local_store.load_json(path)
+
+    def add(self, job_id: str, backend: str, payload: dict) -> None:
+        self.jobs[job_id] = {
+            'backend': backend,
+            'submitted_at': datetime.now().timestamp(),
+            'polls': 0,
+            'payload': payload,
+        }
+        self.save()
+
+    def open_jobs(self, backend: str = None) -> list:
+        return [(job_id, job) for job_id, job in self.jobs.items()
+                if backend is None or job.get('backend') == backend]
+
+    def touch(self, job_id: str) -> None:
+        self.jobs[job_id]['polls'] = self.jobs[job_id].get('polls', 0) + 1
+        self.jobs[job_id]['last_poll_at'] = datetime.now().timestamp()
+        self.save()
+
+    def remove(self, job_id: str) -> None:
+        self.jobs.pop(job_id, None)
+        self.save()
+
+    def save(self) -> None:
+        local_store.save_json(self.path, self.jobs)
+
+
+def parse_json_array(text: str | None) -> list | None:
+    """JSON array from a model answer (markdown fences allowed), else None."""
+    if not text:
+        return None
+    text = text.strip()
+    if text.startswith('```'):
+        text = text.split('\n', 1)[1] if '\n' in text else ''
+        text = text.rsplit('```', 1)[0]
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    return value if isinstance(value, list) else None
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Local JSON state files for Blackfire automation scripts.
+
+Small caches that let cron jobs remember what they did last run without
+another round trip to Supabase (e.g. last written stock prices).
+Files live next to the scripts (same place as invalid_companies.json)
+and are written atomically so a killed run never leaves a truncated file.
+Writers that share a file across scripts take file_lock() around their
+read-modify-write.
+"""
+
+import fcntl
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+def load_json(path: str, default=None):
+    """Load a JSON state file. Returns default if missing or corrupt."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {} if default is None else default
+
+
+def save_json(path: str, data) -> None:
+    """Write a JSON state file atomically (temp file + rename)."""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', suffix='.json', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def file_lock(path: str, shared: bool = False):
+    """Hold an flock on a sidecar '<path>.lock' file for the duration of the block."""
+    lock_fd = open(f"{path}.lock", 'a')
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(lock_fd, fcntl.LOCK_UN)
+        lock_fd.close()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate story clustering for company_news (MinHash).
+
+The same wire story shows up in Yahoo Finance, MarketWatch, Benzinga,
+PR Newswire and Brave results under different URLs. Each article is
+reduced to 3-word shingles of its title and the start of its summary.
+MinHash signatures with LSH banding find candidate pairs; a candidate
+joins a cluster if the exact shingle Jaccard similarity is at least
+CLUSTER_MIN_JACCARD, or if both have the same normalized headline. New
+articles are clustered against each other and against rows stored in
+the last CLUSTER_LOOKBACK_DAYS days.
+
+The collector analyzes sentiment once per cluster and company, reuses the
+LLM result of an already stored member (or of a member analyzed in an
+earlier batch of the run) where there is one, and creates at most one
+alert per cluster and company.
+
+Schema (run once in Supabase):
+
+    ALTER TABLE company_news ADD COLUMN IF NOT EXISTS cluster_id text;
+    CREATE INDEX IF NOT EXISTS company_news_cluster_id_idx ON company_news (cluster_id);
+
+Until the column exists, clusters are only used within the run and are
+not stored. Rows stored before the migration have no cluster_id; a new
+article matching one of them starts a cluster named after that row's
+content.
+"""
+
+import hashlib
+import random
+import re
+from datetime import datetime, timedelta, timezone
+
+SHINGLE_SIZE = 3            # words per shingle
+SUMMARY_WORDS = 40          # summaries differ by source, only their start counts
+CLUSTER_MIN_JACCARD = 0.5   # shingle overlap for near-duplicates
+CLUSTER_LOOKBACK_DAYS = 3   # stored articles considered for clustering
+MIN_TITLE_WORDS = 6         # shorter headlines are too generic for exact-title clustering
+
+# 16 bands × 2 rows: pairs with Jaccard 0.5 become candidates with ~99% probability
+MINHASH_BANDS = 16
+MINHASH_ROWS = 2
+_MASK64 = (1 << 64) - 1
+_rng = random.Random(20260415)
+_SEEDS = [(_rng.getrandbits(64), _rng.getrandbits(64) | 1) for _ in range(MINHASH_BANDS * MINHASH_ROWS)]
+
+
+def _tokens(text: str) -> list:
+    text = re.sub(r'<[^>]+>', ' ', text or '').lower()
+    return re.findall(r'[a-z0-9]+', text)
+
+
+def shingles(title: str, summary: str = None) -> frozenset:
+    tokens = _tokens(title) + _tokens(summary)[:SUMMARY_WORDS]
+    if len(tokens) < SHINGLE_SIZE:
+        return frozenset([' '.join(tokens)]) if tokens else frozenset()
+    return frozenset(' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1))
+
+
+def minhash(shingle_set: frozenset) -> tuple:
+    """MinHash signature (in-process only: built on the salted str hash)."""
+    if not shingle_set:
+        return ()
+    hashes = [hash(sh) & _MASK64 for sh in shingle_set]
+    return tuple(min(((h ^ xor) * mult) & _MASK64 for h in hashes) for xor, mult in _SEEDS)
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def title_key(title: str) -> str | None:
+    tokens = _tokens(title)
+    return ' '.join(tokens) if len(tokens) >= MIN_TITLE_WORDS else None
+
+
+def company_key(row: dict) -> str:
+    """Who a company_news row is about (company or industry)."""
+    return row.get('company_id') or f"industry:{row.get('industry_match')}"
+
+
+def has_cluster_column(client) -> bool:
+    try:
+        client.table('company_news').select('cluster_id').limit(1).execute()
+        return True
+    except Exception:
+        return False
+
+
+class NewsClusterer:
+    """Assigns cluster ids to new articles, seeded with recently stored ones."""
+
+    def __init__(self, client, lookback_days: int = CLUSTER_LOOKBACK_DAYS, alert_threshold: int = 4,
+                 source_column: bool = False):
+        self.client = client
+        self.alert_threshold = alert_threshold
+        self.has_column = has_cluster_column(client) if client is not None else False
+        # company_news.sentiment_source exists (marks provisional lexicon fields)
+        self.source_column = source_column
+        self._members = []     # [(shingles, cluster_id)]
+        self._buckets = {}     # (band, signature slice) -> [member index]
+        self._by_content = {}  # shingles -> cluster_id
+        self._titles = {}      # normalized title -> cluster_id
+        self.known = {}        # (cluster_id, company_key) -> stored sentiment fields
+        self.alerted = set()   # (cluster_id, company_id) already alert-worthy before this run
+        self._stored_ids = set()
+        self.stats = {'stored_loaded': 0, 'clusters': 0, 'joined_stored': 0, 'joined_run': 0}
+        if client is not None and lookback_days > 0:
+            self._load_recent(lookback_days)
+
+    def _load_recent(self, days: int) -> None:
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+        fields = 'company_id, industry_match, title, summary, sentiment, catalyst_type, relevance'
+        if self.has_column:
+            fields += ', cluster_id'
+        if self.source_column:
+            fields += ', sentiment_source'
+        page_size = 1000
+        offset = 0
+        while True:
+            try:
+                response = self.client.table('company_news') \
+                    .select(fields) \
+                    .gte('fetched_at', cutoff) \
+                    .range(offset, offset + page_size - 1) \
+                    .execute()
+            except Exception as e:
+                print(f"  Warning: could not load recent articles for clustering: {e}")
+                return
+            batch = response.data or []
+            for row in batch:
+                cluster_id = self._assign(row['title'], row.get('summary'), row.get('cluster_id'), stored=True)
+                self.stats['stored_loaded'] += 1
+                if row.get('sentiment') and not row.get('sentiment_source'):
+                    self.known.setdefault((cluster_id, company_key(row)), {
+                        'sentiment': row.get('sentiment'),
+                        'catalyst_type': row.get('catalyst_type'),
+                        'relevance': row.get('relevance'),
+                    })
+                if row.get('company_id') and (row.get('relevance') or 0) >= self.alert_threshold:
+                    self.alerted.add((cluster_id, row['company_id']))
+            if len(batch) < page_size:
+                break
+            offset += page_size
+
+    def _find(self, shingle_set: frozenset, signature: tuple, tkey: str | None) -> str | None:
+        if tkey and tkey in self._titles:
+            return self._titles[tkey]
+        checked = set()
+        for band in range(len(signature) // MINHASH_ROWS):
+            key = (band, signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS])
+            for idx in self._buckets.get(key, ()):
+                if idx in checked:
+                    continue
+                checked.add(idx)
+                other, cluster_id = self._members[idx]
+                if jaccard(shingle_set, other) >= CLUSTER_MIN_JACCARD:
+                    return cluster_id
+        return None
+
+    def _assign(self, title: str, summary: str = None, cluster_id: str = None, stored: bool = False) -> str:
+        shingle_set = shingles(title, summary)
+        if shingle_set in self._by_content:
+            # Same text again (stored articles repeat once per matched company)
+            found = self._by_content[shingle_set]
+            if not stored and not cluster_id:
+                self.stats['joined_stored' if found in self._stored_ids else 'joined_run'] += 1
+            return cluster_id or found
+
+        signature = minhash(shingle_set)
+        tkey = title_key(title)
+        found = self._find(shingle_set, signature, tkey)
+        if found and not cluster_id:
+            cluster_id = found
+            if not stored:
+                self.stats['joined_stored' if found in self._stored_ids else 'joined_run'] += 1
+        if not cluster_id:
+            content = ' '.join(_tokens(title) + _tokens(summary)[:SUMMARY_WORDS])
+            cluster_id = hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+            if not stored:
+                self.stats['clusters'] += 1
+        if stored:
+            self._stored_ids.add(cluster_id)
+
+        idx = len(self._members)
+        self._members.append((shingle_set, cluster_id))
+        for band in range(len(signature) // MINHASH_ROWS):
+            key = (band, signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS])
+            self._buckets.setdefault(key, []).append(idx)
+        self._by_content.setdefault(shingle_set, cluster_id)
+        if tkey:
+            self._titles.setdefault(tkey, cluster_id)
+        return cluster_id
+
+    def assign(self, rows: list) -> None:
+        """Set 'cluster_id' on new company_news rows (in place).
+
+        Rows of the same article (one per matched company) share a URL and
+        get the same cluster.
+        """
+        by_url = {}
+        for row in rows:
+            url = row.get('url')
+            if url not in by_url:
+                by_url[url] = self._assign(row['title'], row.get('summary'))
+            row['cluster_id'] = by_url[url]
+
+    def remember(self, rows: list) -> None:
+        """Results of rows analyzed in this run, reused for later members of their clusters.
+
+        Provisional (lexicon-only) rows are not remembered.
+        """
+        for row in rows:
+            if row.get('cluster_id') and row.get('sentiment') and not row.get('sentiment_source'):
+                self.known.setdefault((row['cluster_id'], company_key(row)), {
+                    'sentiment': row.get('sentiment'),
+                    'catalyst_type': row.get('catalyst_type'),
+                    'relevance': row.get('relevance'),
+                })
@@ -16,12 +16,18 @@ Usage:
   python3 news_collector.py --brave-only     # skip RSS, only Brave Search
   python3 news_collector.py --rss-only       # skip Brave, only RSS feeds
   python3 news_collector.py --no-sentiment   # skip sentiment analysis (faster)
+  python3 news_collector.py --lexicon-threshold 4  # fewer LLM calls (see news_lexicon.py)
   python3 news_collector.py --backfill-sentiment  # backfill sentiment on existing articles
+  python3 news_collector.py --backfill-sentiment --sentiment-workers 8  # more parallel API calls
+  python3 news_collector.py --backfill-sentiment --batch-job  # async batch job, applied by later runs
+  python3 news_collector.py --rebuild-news-stats  # recompute company_news_stats (news_stats.py)
 
 Features:
   - Relevance scoring (1-5) for investment decision prioritization
   - Industry-level news matching for articles not tied to specific companies
   - Automatic alert creation for high-relevance news (relevance >= 4)
+  - Streaming: new articles are clustered, analyzed, inserted and alerted on in
+    batches while the search is still running (news_pipeline.py)
 """
 
 import argparse
@@ -32,9 +38,9 @@ import re
 import signal
 import sys
 import time
-import hashlib
 from collections import Counter
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import date, datetime, timezone
 from urllib.parse import urlparse
 
 import requests
@@ -51,13 +57,26 @@ except ImportError:
     import feedparser
 
 try:
-    from anthropic import Anthropic
+    from anthropic import Anthropic, APIConnectionError, APIStatusError
 except ImportError:
     print("Installing anthropic...")
     os.system(f"{sys.executable} -m pip install anthropic")
-    from anthropic import Anthropic
+    from anthropic import Anthropic, APIConnectionError, APIStatusError
 
 import supabase_helper
+import local_store
+from aho_corasick import AhoCorasick
+from brave_priority import BraveCompanyStats, load_upcoming_catalysts, prioritize
+from news_dedup import NewsDeduper, url_hash, backfill_url_hashes
+from news_clusters import NewsClusterer, company_key
+from sentiment_cache import SentimentCache
+from rate_limit import AdaptiveConcurrency, RateLimiter
+from llm_batch import (
+    AnthropicBatchBackend, LocalBatchBackend, BatchJobStore, parse_json_array, STATUS_ENDED,
+)
+from news_pipeline import BatchPipeline
+from news_lexicon import LexiconGate, LEXICON_SOURCE, LEXICON_THRESHOLD, has_sentiment_source_column
+from news_stats import NewsStatsWriter, rebuild_news_stats
 
 # ---------------------------------------------------------------------------
 # Configuration
@@ -90,21 +109,39 @@ RSS_FEEDS = [
 # Brave Search API config
 BRAVE_API_KEY = os.getenv('BRAVE_API_KEY', '')
 BRAVE_SEARCH_URL = "https://api.search.brave.com/res/v1/news/search"
-BRAVE_RATE_LIMIT_DELAY = 1.1  # seconds between requests (1 req/s free tier + margin)
-BRAVE_BATCH_SIZE = 20  # companies per batch before pause
-BRAVE_BATCH_PAUSE = 5.0  # seconds between batches
+BRAVE_RATE_PER_SECOND = float(os.getenv('BRAVE_RATE_PER_SECOND', '1'))  # plan limit (free tier: 1 req/s)
+BRAVE_MAX_WORKERS = 4  # concurrent requests, all sharing the token bucket
+BRAVE_GROUP_SIZE = 4  # rotation companies packed into one OR query
+BRAVE_QUERY_MAX_CHARS = 300  # Brave rejects long queries
+BRAVE_RESULTS_PER_COMPANY = 5
 BRAVE_MAX_CONSECUTIVE_429 = 3  # stop Brave after this many consecutive 429s
 BRAVE_BACKOFF_STEPS = [5, 15, 30]  # exponential backoff seconds on 429
 BRAVE_MAX_RUNTIME_MINUTES = 90  # stop Brave Search after this many minutes
-BRAVE_ROTATION_GROUPS = 7  # divide remaining companies into 7 daily groups (one per weekday)
+BRAVE_BUDGET_SHARE = 0.8  # share of the runtime cap planned for (rest: 429 backoffs, slow responses)
 
 # RSS config
-RSS_TIMEOUT = 15  # seconds per feed fetch
+RSS_TIMEOUT = 15  # seconds per feed fetch (hard limit incl. download)
 RSS_MAX_ENTRIES = 30  # max entries per feed
+RSS_MAX_WORKERS = 8  # feeds fetched in parallel
+RSS_SEEN_IDS_MAX = 500  # entry ids remembered per feed
+# Per-feed ETag/Last-Modified, seen entry ids and latency/yield stats
+RSS_STATE_FILE = os.path.join(SCRIPT_DIR, '.rss_feed_state.json')
 
 # Sentiment analysis config
-SENTIMENT_BATCH_SIZE = 10  # articles per API call
-SENTIMENT_RATE_LIMIT_DELAY = 1.0  # seconds between API calls
+SENTIMENT_MODEL = "claude-haiku-4-5-20251001"
+SENTIMENT_MAX_WORKERS = 4  # concurrent API calls (reduced automatically on rate limits)
+SENTIMENT_INPUT_TOKENS = 4000  # estimated prompt tokens per API call
+SENTIMENT_OUTPUT_TOKENS = 1500  # estimated answer tokens per API call (max_tokens 2000)
+SENTIMENT_MAX_STORIES = 40  # stories per API call
+SENTIMENT_MAX_RETRIES = 4  # per batch on 429/5xx/connection errors
+SENTIMENT_JOB_MAX_REQUESTS = 10000  # requests per batch job (API limit 100k / 256 MB)
+# Batch jobs submitted by --backfill-sentiment --batch-job, polled by later runs
+SENTIMENT_JOBS_FILE = os.path.join(SCRIPT_DIR, '.sentiment_batch_jobs.json')
+LOCAL_BATCH_DIR = os.path.join(SCRIPT_DIR, '.llm_batch_local')  # --batch-backend local
+NEWS_FLUSH_ROWS = 200  # new rows per pipeline batch (cluster → sentiment → insert → alerts)
+NEWS_FLUSH_SECONDS = 120  # a smaller batch is flushed after this long
+NEWS_UPDATE_CHUNK = 200  # rows per bulk sentiment write
+BACKFILL_FLUSH_ROWS = 1000  # backfill writes accumulated results in chunks of this size
 ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY', '')
 
 # Minimum company name length for matching (avoid false positives)
@@ -206,6 +243,7 @@ def build_company_index(companies: list) -> dict:
     Returns dict with:
       - 'by_symbol': {symbol_upper: company}
       - 'by_name': [(name_lower, company)] sorted longest first
+      - 'symbol_matcher' / 'name_matcher': Aho-Corasick automatons over both
       - 'companies': original list
     """
     by_symbol = {}
@@ -229,9 +267,32 @@ def build_company_index(companies: list) -> dict:
     # Sort by name length descending (match longer names first to avoid partial matches)
     by_name.sort(key=lambda x: -len(x[0]))
 
+    # Automatons built once per run. Values carry the position in
+    # by_symbol / by_name so matches keep the precedence of that order.
+    symbol_matcher = AhoCorasick()
+    for order, (symbol, company) in enumerate(by_symbol.items()):
+        if len(symbol) < 2:
+            continue
+        # $TSLA anywhere, bare TSLA only with word boundaries (symbols >= 3 chars)
+        symbol_matcher.add(f"${symbol}", (order, company, False))
+        if len(symbol) >= 3:
+            symbol_matcher.add(symbol, (order, company, True))
+
+    name_matcher = AhoCorasick()
+    for order, (name_lower, company) in enumerate(by_name):
+        if not _is_meaningful_name(name_lower):
+            continue
+        # For short names (< 6 chars), require word boundary match
+        name_matcher.add(name_lower, (order, company, len(name_lower) < 6))
+
+    symbol_matcher.build()
+    name_matcher.build()
+
     return {
         'by_symbol': by_symbol,
         'by_name': by_name,
+        'symbol_matcher': symbol_matcher,
+        'name_matcher': name_matcher,
         'companies': companies,
     }
 
@@ -243,9 +304,35 @@ def _is_meaningful_name(name: str) -> bool:
     return len(meaningful) >= 1 and len(name) >= 4
 
 
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == '_'
+
+
+def _at_word_boundary(text: str, pos: int) -> bool:
+    """Same as regex \\b at text position pos."""
+    before = pos > 0 and _is_word_char(text[pos - 1])
+    after = pos < len(text) and _is_word_char(text[pos])
+    return before != after
+
+
+def _collect_matches(matcher: AhoCorasick, text: str) -> dict:
+    """{order: company} for all occurrences passing the word-boundary filter."""
+    hits = {}
+    for start, end, (order, company, whole_word) in matcher.iter(text):
+        if order in hits:
+            continue
+        if whole_word and not (_at_word_boundary(text, start) and _at_word_boundary(text, end)):
+            continue
+        hits[order] = company
+    return hits
+
+
 def match_article_to_companies(title: str, summary: str, index: dict) -> list:
     """Match an article to companies by symbol or name.
 
+    One pass over the text per automaton (see build_company_index).
+    Symbols take precedence over names, longer names over shorter ones.
+
     Returns list of matched company dicts (may be empty).
     """
     text = f"{title} {summary or ''}".upper()
@@ -253,45 +340,14 @@ def match_article_to_companies(title: str, summary: str, index: dict) -> list:
     matched = []
     matched_ids = set()
 
-    # 1. Symbol matching — look for $SYMBOL or standalone symbol in text
-    for symbol, company in index['by_symbol'].items():
-        if len(symbol) < 2:
-            continue
-        cid = company['id']
-        if cid in matched_ids:
-            continue
-
-        # Match $TSLA or word-boundary TSLA (but only for symbols >= 3 chars)
-        if f"${symbol}" in text:
-            matched.append(company)
-            matched_ids.add(cid)
-            continue
-
-        if len(symbol) >= 3:
-            # Word boundary match to avoid partial matches
-            pattern = r'\b' + re.escape(symbol) + r'\b'
-            if re.search(pattern, text):
+    # 1. Symbol matching — $SYMBOL or standalone symbol, then 2. company names
+    for matcher, haystack in ((index['symbol_matcher'], text), (index['name_matcher'], text_lower)):
+        hits = _collect_matches(matcher, haystack)
+        for order in sorted(hits):
+            company = hits[order]
+            if company['id'] not in matched_ids:
                 matched.append(company)
-                matched_ids.add(cid)
-
-    # 2. Company name matching — substring in title/summary
-    for name_lower, company in index['by_name']:
-        cid = company['id']
-        if cid in matched_ids:
-            continue
-        if not _is_meaningful_name(name_lower):
-            continue
-
-        # For short names (< 6 chars), require word boundary match
-        if len(name_lower) < 6:
-            pattern = r'\b' + re.escape(name_lower) + r'\b'
-            if re.search(pattern, text_lower):
-                matched.append(company)
-                matched_ids.add(cid)
-        else:
-            if name_lower in text_lower:
-                matched.append(company)
-                matched_ids.add(cid)
+                matched_ids.add(company['id'])
 
     return matched
 
@@ -317,71 +373,210 @@ def match_article_to_industries(title: str, summary: str) -> list:
 # RSS Feed collection
 # ---------------------------------------------------------------------------
 
-def fetch_rss_feeds() -> list:
-    """Fetch articles from all configured RSS feeds.
+def load_feed_state() -> dict:
+    """Per-feed state from the last successful run: {feed_name: {...}}."""
+    return local_store.load_json(RSS_STATE_FILE)
 
-    Returns list of dicts with: title, summary, url, source, published_at
-    """
-    all_articles = []
 
-    for feed_config in RSS_FEEDS:
-        feed_name = feed_config['name']
-        feed_url = feed_config['url']
-        print(f"    Fetching RSS: {feed_name}...")
+def save_feed_state(feed_state: dict) -> None:
+    """Persist feed state — only after the run's articles were stored."""
+    try:
+        local_store.save_json(RSS_STATE_FILE, feed_state)
+    except Exception as e:
+        print(f"  Warning: could not save RSS feed state: {e}")
+
+
+def _parse_feed_entry(entry, feed_name: str) -> dict | None:
+    title = (entry.get('title') or '').strip()
+    if not title:
+        return None
 
+    summary = (entry.get('summary') or entry.get('description') or '').strip()
+    # Strip HTML tags from summary
+    summary = re.sub(r'<[^>]+>', '', summary).strip()
+    if len(summary) > 500:
+        summary = summary[:497] + '...'
+
+    link = (entry.get('link') or '').strip()
+    if not link:
+        return None
+
+    # Parse published date
+    published_at = None
+    if entry.get('published_parsed'):
         try:
-            feed = feedparser.parse(feed_url, request_headers={
-                'User-Agent': 'BlackfireNewsCollector/1.0'
-            })
+            published_at = datetime(*entry.published_parsed[:6],
+                                    tzinfo=timezone.utc).isoformat()
+        except Exception:
+            pass
+    elif entry.get('updated_parsed'):
+        try:
+            published_at = datetime(*entry.updated_parsed[:6],
+                                    tzinfo=timezone.utc).isoformat()
+        except Exception:
+            pass
 
-            if feed.bozo and not feed.entries:
-                print(f"      Warning: Feed error for {feed_name}: {feed.bozo_exception}")
+    return {
+        'title': title,
+        'summary': summary if summary else None,
+        'url': link,
+        'source': feed_name,
+        'published_at': published_at,
+    }
+
+
+def _fetch_feed(feed_config: dict, previous: dict) -> dict:
+    """Fetch one feed (runs in a worker thread, no printing).
+
+    Sends If-None-Match/If-Modified-Since from the previous run and skips
+    entries whose id was already seen. The download is aborted once
+    RSS_TIMEOUT is exceeded.
+    """
+    started = time.monotonic()
+    deadline = started + RSS_TIMEOUT
+    result = {
+        'name': feed_config['name'], 'status': None, 'error': None,
+        'articles': [], 'entry_ids': [], 'skipped_seen': 0,
+        'etag': None, 'last_modified': None, 'latency': 0.0,
+    }
+
+    headers = {'User-Agent': 'BlackfireNewsCollector/1.0'}
+    if previous.get('etag'):
+        headers['If-None-Match'] = previous['etag']
+    if previous.get('last_modified'):
+        headers['If-Modified-Since'] = previous['last_modified']
+
+    try:
+        with requests.get(feed_config['url'], headers=headers, timeout=RSS_TIMEOUT, stream=True) as response:
+            result['status'] = response.status_code
+            if response.status_code == 304:
+                return result
+            response.raise_for_status()
+
+            chunks = []
+            for chunk in response.iter_content(chunk_size=8192):
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"download exceeded {RSS_TIMEOUT}s")
+                chunks.append(chunk)
+            result['etag'] = response.headers.get('ETag')
+            result['last_modified'] = response.headers.get('Last-Modified')
+            content_type = response.headers.get('Content-Type', '')
+
+        feed = feedparser.parse(b''.join(chunks), response_headers={'content-type': content_type})
+        if feed.bozo and not feed.entries:
+            result['error'] = f"Feed error: {feed.bozo_exception}"
+            return result
+
+        seen = set(previous.get('seen_ids', []))
+        for entry in feed.entries[:RSS_MAX_ENTRIES]:
+            article = _parse_feed_entry(entry, feed_config['name'])
+            if not article:
                 continue
+            entry_id = entry.get('id') or article['url']
+            result['entry_ids'].append(entry_id)
+            if entry_id in seen:
+                result['skipped_seen'] += 1
+                continue
+            result['articles'].append(article)
 
-            count = 0
-            for entry in feed.entries[:RSS_MAX_ENTRIES]:
-                title = (entry.get('title') or '').strip()
-                if not title:
-                    continue
+    except Exception as e:
+        result['error'] = str(e)
+    finally:
+        result['latency'] = time.monotonic() - started
+
+    return result
+
+
+def _update_feed_state(feed_state: dict, feed_config: dict, result: dict) -> None:
+    """Record conditional-GET validators, seen ids and latency/yield stats."""
+    st = feed_state.get(feed_config['name'], {})
+    if st.get('url') != feed_config['url']:
+        st = {}  # feed moved, start over
+    st['url'] = feed_config['url']
+
+    if result['status'] == 200 and not result['error']:
+        st['etag'] = result['etag']
+        st['last_modified'] = result['last_modified']
+        # Newest ids first, bounded
+        seen = list(dict.fromkeys(result['entry_ids'] + st.get('seen_ids', [])))
+        st['seen_ids'] = seen[:RSS_SEEN_IDS_MAX]
+
+    stats = st.setdefault('stats', {})
+    stats['runs'] = stats.get('runs', 0) + 1
+    stats['not_modified'] = stats.get('not_modified', 0) + (result['status'] == 304)
+    stats['errors'] = stats.get('errors', 0) + bool(result['error'])
+    stats['new_articles'] = stats.get('new_articles', 0) + len(result['articles'])
+    # Exponential moving average keeps the latency trend without a history
+    prev_avg = stats.get('avg_latency')
+    stats['avg_latency'] = round(result['latency'] if prev_avg is None else 0.8 * prev_avg + 0.2 * result['latency'], 3)
+    stats['last_latency'] = round(result['latency'], 3)
+    stats['last_status'] = result['status']
+    stats['last_new'] = len(result['articles'])
+    stats['last_error'] = result['error']
+    stats['last_run'] = datetime.now(timezone.utc).isoformat()
+
+    feed_state[feed_config['name']] = st
+
+
+def fetch_rss_feeds(feed_state: dict = None) -> list:
+    """Fetch articles from all configured RSS feeds, RSS_MAX_WORKERS at a time.
+
+    feed_state (see load_feed_state) is updated in place with validators,
+    seen entry ids and per-feed stats; the caller saves it.
 
-                summary = (entry.get('summary') or entry.get('description') or '').strip()
-                # Strip HTML tags from summary
-                summary = re.sub(r'<[^>]+>', '', summary).strip()
-                if len(summary) > 500:
-                    summary = summary[:497] + '...'
+    Returns list of dicts with: title, summary, url, source, published_at
+    """
+    if feed_state is None:
+        feed_state = {}
+    all_articles = []
 
-                link = (entry.get('link') or '').strip()
-                if not link:
-                    continue
+    started = {}  # feed name -> monotonic start, set by the worker
 
-                # Parse published date
-                published_at = None
-                if entry.get('published_parsed'):
-                    try:
-                        published_at = datetime(*entry.published_parsed[:6],
-                                                tzinfo=timezone.utc).isoformat()
-                    except Exception:
-                        pass
-                elif entry.get('updated_parsed'):
-                    try:
-                        published_at = datetime(*entry.updated_parsed[:6],
-                                                tzinfo=timezone.utc).isoformat()
-                    except Exception:
-                        pass
-
-                all_articles.append({
-                    'title': title,
-                    'summary': summary if summary else None,
-                    'url': link,
-                    'source': feed_name,
-                    'published_at': published_at,
-                })
-                count += 1
-
-            print(f"      Got {count} articles")
+    def run(feed_config, previous):
+        started[feed_config['name']] = time.monotonic()
+        return _fetch_feed(feed_config, previous)
 
-        except Exception as e:
-            print(f"      Error fetching {feed_name}: {e}")
+    pool = ThreadPoolExecutor(max_workers=min(RSS_MAX_WORKERS, len(RSS_FEEDS)))
+    futures = {}
+    for feed_config in RSS_FEEDS:
+        previous = feed_state.get(feed_config['name'], {})
+        if previous.get('url') != feed_config['url']:
+            previous = {}
+        futures[pool.submit(run, feed_config, previous)] = feed_config
+
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            results = [(futures[f], f.result()) for f in done]
+
+            # Hard per-feed timeout: give up on feeds running longer than RSS_TIMEOUT
+            now = time.monotonic()
+            for future in list(pending):
+                feed_config = futures[future]
+                t0 = started.get(feed_config['name'])
+                if t0 is not None and now - t0 > RSS_TIMEOUT:
+                    pending.discard(future)
+                    results.append((feed_config, {
+                        'name': feed_config['name'], 'status': None,
+                        'error': f"timed out after {RSS_TIMEOUT}s", 'articles': [],
+                        'entry_ids': [], 'skipped_seen': 0, 'latency': now - t0,
+                    }))
+
+            for feed_config, result in results:
+                _update_feed_state(feed_state, feed_config, result)
+                name = feed_config['name']
+                if result['error']:
+                    print(f"    {name:20s} {result['latency']:5.1f}s  Error: {result['error'][:80]}")
+                elif result['status'] == 304:
+                    print(f"    {name:20s} {result['latency']:5.1f}s  not modified")
+                else:
+                    print(f"    {name:20s} {result['latency']:5.1f}s  {len(result['articles'])} new, "
+                          f"{result['skipped_seen']} already seen")
+                all_articles.extend(result['articles'])
+    finally:
+        # Abandoned workers stop on their own download deadline
+        pool.shutdown(wait=False, cancel_futures=True)
 
     return all_articles
 
@@ -390,21 +585,79 @@ def fetch_rss_feeds() -> list:
 # Brave Search collection
 # ---------------------------------------------------------------------------
 
-def search_brave_news(company_name: str, symbol: str = None,
-                      consecutive_429_count: int = 0) -> tuple:
-    """Search Brave News API for a specific company.
+def brave_company_query(company_name: str, symbol: str = None) -> str:
+    """Search query for a single company."""
+    if symbol:
+        base_symbol = symbol.split('.')[0]
+        return f'"{company_name}" OR ${base_symbol} stock news'
+    return f'"{company_name}" stock'
+
 
-    Returns tuple of (articles_list, was_429: bool).
-    The caller uses was_429 to track consecutive rate limits.
+def plan_brave_queries(always_search: list, rotation: list) -> list:
+    """Plan Brave requests: one per priority company, packed OR queries for the rotation.
+
+    Returns [{'query', 'companies', 'count', 'tier'}]. Results of a packed
+    query are attributed to its companies through the name matcher, so only
+    companies with a meaningful name are packed; the rest get a query of
+    their own.
     """
-    if not BRAVE_API_KEY:
-        return [], False
+    plan = []
+
+    def single(company, tier):
+        name = (company.get('name') or '').strip()
+        if name:
+            plan.append({
+                'query': brave_company_query(name, (company.get('symbol') or '').strip()),
+                'companies': [company],
+                'count': BRAVE_RESULTS_PER_COMPANY,
+                'tier': tier,
+            })
 
-    # Build search query
-    query = f'"{company_name}" stock'
-    if symbol:
-        base_symbol = symbol.split('.')[0]
-        query = f'"{company_name}" OR ${base_symbol} stock news'
+    for company in always_search:
+        single(company, 'priority')
+
+    group = []
+
+    def close_group():
+        if len(group) == 1:
+            single(group[0], 'rotation')
+        elif group:
+            plan.append({
+                'query': ' OR '.join(f'"{c["name"].strip()}"' for c in group),
+                'companies': list(group),
+                'count': min(20, BRAVE_RESULTS_PER_COMPANY * len(group)),
+                'tier': 'rotation',
+            })
+        group.clear()
+
+    for company in rotation:
+        name = (company.get('name') or '').strip()
+        if not name:
+            continue
+        if not _is_meaningful_name(name.lower()) or len(name) < 6:
+            single(company, 'rotation')
+            continue
+        query_len = sum(len(c['name'].strip()) + 6 for c in group) + len(name) + 2
+        if group and (len(group) >= BRAVE_GROUP_SIZE or query_len > BRAVE_QUERY_MAX_CHARS):
+            close_group()
+        group.append(company)
+    close_group()
+
+    return plan
+
+
+def search_brave_news(query: str, count: int = BRAVE_RESULTS_PER_COMPANY,
+                      limiter: RateLimiter = None) -> tuple:
+    """Search Brave News API (runs in a worker thread).
+
+    Returns tuple of (articles_list, was_429: bool, failed: bool).
+    The caller uses was_429 to track consecutive rate limits; failed marks
+    answers that are no search result at all (HTTP error, timeout), which
+    must not count as a search that found nothing. A 429 pauses every
+    worker through the shared limiter (BRAVE_BACKOFF_STEPS by 429s in a row).
+    """
+    if not BRAVE_API_KEY:
+        return [], False, True
 
     headers = {
         'Accept': 'application/json',
@@ -413,27 +666,38 @@ def search_brave_news(company_name: str, symbol: str = None,
     }
     params = {
         'q': query,
-        'count': 5,  # max 5 results per company
+        'count': count,
         'freshness': 'pw',  # past week
     }
 
     try:
+        if limiter:
+            limiter.acquire()
+        sent_at = time.monotonic()
         resp = requests.get(BRAVE_SEARCH_URL, headers=headers, params=params, timeout=10)
 
         if resp.status_code == 429:
-            # Exponential backoff: pick delay based on how many consecutive 429s
-            backoff_idx = min(consecutive_429_count, len(BRAVE_BACKOFF_STEPS) - 1)
-            backoff_secs = BRAVE_BACKOFF_STEPS[backoff_idx]
-            print(f"      Rate limited (429), backoff {backoff_secs}s (consecutive: {consecutive_429_count + 1})")
-            time.sleep(backoff_secs)
+            # Exponential backoff, shared: all workers wait out the same pause
+            if limiter:
+                backoff_secs = limiter.backoff(BRAVE_BACKOFF_STEPS, sent_at)
+                print(f"      Rate limited (429), backoff {backoff_secs:.0f}s "
+                      f"(consecutive: {limiter.backoff_streak})")
+                limiter.acquire()
+            else:
+                time.sleep(BRAVE_BACKOFF_STEPS[0])
             # Retry once after backoff
+            sent_at = time.monotonic()
             resp = requests.get(BRAVE_SEARCH_URL, headers=headers, params=params, timeout=10)
             if resp.status_code == 429:
-                return [], True  # still rate limited
+                if limiter:
+                    limiter.backoff(BRAVE_BACKOFF_STEPS, sent_at)
+                return [], True, False  # still rate limited
 
         if resp.status_code != 200:
-            print(f"      Brave API error {resp.status_code} for {company_name}")
-            return [], False
+            print(f"      Brave API error {resp.status_code} for {query[:60]}")
+            return [], False, True
+        if limiter:
+            limiter.reset_backoff()
 
         data = resp.json()
         results = data.get('results', [])
@@ -452,11 +716,28 @@ def search_brave_news(company_name: str, symbol: str = None,
                 'published_at': r.get('age') or r.get('page_age') or None,
             })
 
-        return articles, False
+        return articles, False, False
 
     except Exception as e:
-        print(f"      Brave error for {company_name}: {e}")
-        return [], False
+        print(f"      Brave error for {query[:60]}: {e}")
+        return [], False, True
+
+
+def attribute_brave_results(planned: dict, articles: list, company_index: dict) -> list:
+    """[(article, company)] for one request's results.
+
+    Single-company queries keep every result; packed queries keep the
+    companies of the query that the name matcher finds in the article.
+    """
+    if len(planned['companies']) == 1:
+        return [(article, planned['companies'][0]) for article in articles]
+    group_ids = {c['id'] for c in planned['companies']}
+    attributed = []
+    for article in articles:
+        for company in match_article_to_companies(article['title'], article.get('summary') or '', company_index):
+            if company['id'] in group_ids:
+                attributed.append((article, company))
+    return attributed
 
 
 def get_watchlist_company_ids(client) -> set:
@@ -513,12 +794,21 @@ def get_high_value_company_ids(client) -> set:
     return ids
 
 
-def build_brave_search_list(priority_companies: list, client, limit: int = 0) -> tuple:
+def brave_company_budget(always_count: int) -> int:
+    """Rotation companies that fit into one run at the plan's rate limit."""
+    calls = int(BRAVE_RATE_PER_SECOND * BRAVE_MAX_RUNTIME_MINUTES * 60 * BRAVE_BUDGET_SHARE)
+    return max(0, calls - always_count) * BRAVE_GROUP_SIZE
+
+
+def build_brave_search_list(priority_companies: list, client, limit: int = 0,
+                            company_stats: BraveCompanyStats = None) -> tuple:
     """Build ordered list of companies for Brave Search.
 
-    Returns (always_search_list, rotation_list) where:
+    Returns (always_search_list, rotation_list, info) where:
       - always_search_list: watchlist + high-value companies (searched every run)
-      - rotation_list: today's rotation slice of remaining public companies
+      - rotation_list: remaining public companies picked by expected news yield
+        (brave_priority.prioritize), each at least every MIN_REVISIT_DAYS
+      - info: selection counts for the run log
     """
     # Get high-priority company IDs
     watchlist_ids = get_watchlist_company_ids(client)
@@ -534,81 +824,76 @@ def build_brave_search_list(priority_companies: list, client, limit: int = 0) ->
         else:
             rest.append(c)
 
-    # Daily rotation: pick today's slice of the rest
-    day_of_year = datetime.now().timetuple().tm_yday
-    group_index = day_of_year % BRAVE_ROTATION_GROUPS
-    group_size = max(1, len(rest) // BRAVE_ROTATION_GROUPS)
-    start = group_index * group_size
-    # Last group gets any remainder
-    if group_index == BRAVE_ROTATION_GROUPS - 1:
-        rotation_slice = rest[start:]
-    else:
-        rotation_slice = rest[start:start + group_size]
+    budget = brave_company_budget(len(always_search))
+    if limit > 0:
+        budget = min(budget, max(0, limit - len(always_search)))
+    catalysts = load_upcoming_catalysts(client)
+    rotation_slice, info = prioritize(rest, company_stats or BraveCompanyStats(), catalysts, budget)
+    info['budget'] = budget
 
     # Apply --limit if set (applies to total, always_search first)
-    if limit > 0:
-        if len(always_search) >= limit:
-            always_search = always_search[:limit]
-            rotation_slice = []
-        else:
-            remaining = limit - len(always_search)
-            rotation_slice = rotation_slice[:remaining]
+    if limit > 0 and len(always_search) >= limit:
+        always_search = always_search[:limit]
+        rotation_slice = []
 
-    return always_search, rotation_slice
+    return always_search, rotation_slice, info
 
 
 # ---------------------------------------------------------------------------
-# Deduplication
+# Sentiment Analysis (Claude Haiku)
 # ---------------------------------------------------------------------------
 
-def get_existing_urls(client) -> set:
-    """Fetch all existing news URLs from company_news to avoid duplicates."""
-    existing = set()
-    page_size = 1000
-    offset = 0
+def _company_label(article: dict, company_map: dict) -> str:
+    if article.get('company_id'):
+        return company_map.get(article['company_id'], 'Unknown')
+    return f"{article.get('industry_match')} industry"
 
-    while True:
-        response = client.table('company_news') \
-            .select('url') \
-            .range(offset, offset + page_size - 1) \
-            .execute()
-        batch = response.data
-        for row in batch:
-            url = row.get('url')
-            if url:
-                existing.add(url.strip().lower())
-        if len(batch) < page_size:
-            break
-        offset += page_size
 
-    return existing
+def _group_stories(articles: list) -> list:
+    """Group company_news rows into stories: one per cluster, else one per URL.
 
+    Every row of a story is about the same article text; rows differ only
+    by the company (or industry) they were matched to.
+    """
+    stories = {}
+    for article in articles:
+        if article.get('cluster_id'):
+            key = article['cluster_id']
+        elif article.get('url'):
+            key = url_hash(article['url'])
+        else:
+            key = f"id:{article.get('id')}"
+        stories.setdefault(key, []).append(article)
+    return list(stories.values())
 
-def normalize_url(url: str) -> str:
-    """Normalize URL for deduplication (lowercase, strip tracking params)."""
-    url = url.strip().lower()
-    # Remove common tracking parameters
-    url = re.sub(r'[?&](utm_\w+|ref|source|fbclid|gclid)=[^&]*', '', url)
-    # Remove trailing ? or &
-    url = url.rstrip('?&')
-    return url
 
+def _story_companies(members: list) -> list:
+    """Distinct company keys of a story, in the order they are listed in the prompt."""
+    return list(dict.fromkeys(company_key(a) for a in members))
 
-# ---------------------------------------------------------------------------
-# Sentiment Analysis (Claude Haiku)
-# ---------------------------------------------------------------------------
 
-def _build_sentiment_prompt(articles: list, company_map: dict) -> str:
-    """Build prompt for Claude Haiku sentiment analysis with relevance scoring."""
+def _story_hashes(members: list) -> set:
+    return {url_hash(a['url']) for a in members if a.get('url')}
+
+
+def _build_sentiment_prompt(stories: list, company_map: dict) -> str:
+    """Build prompt for Claude Haiku sentiment analysis with relevance scoring.
+
+    One entry per story, listing every company the article was matched to.
+    """
     articles_text = []
-    for i, article in enumerate(articles):
-        company_name = company_map.get(article.get('company_id', ''), 'Unknown')
+    for i, members in enumerate(stories):
+        article = members[0]
         summary = article.get('summary') or 'No summary'
+        labels = {}
+        for member in members:
+            labels.setdefault(company_key(member), _company_label(member, company_map))
         articles_text.append(
-            f'{i+1}. "{article["title"]}" about {company_name} - {summary}'
+            f'{i+1}. "{article["title"]}" - {summary}\n'
+            f'   Companies: {"; ".join(labels.values())}'
         )
 
-    return f"""Analyze the sentiment of these news articles about companies. For each article, return:
+    return f"""Analyze the sentiment of these news articles about companies. Each article lists the companies it mentions. For each article, return:
 - index: article number (1-based)
 - sentiment: "positive", "negative", or "neutral"
 - catalyst_type: if this is a potential catalyst, what type? (earnings, fda, partnership, ipo, acquisition, product_launch, regulatory, leadership, funding, spac, lockup, null)
@@ -618,6 +903,7 @@ def _build_sentiment_prompt(articles: list, company_map: dict) -> str:
   3 = Moderate relevance (analyst upgrade/downgrade, industry trend)
   2 = Minor news (general mention, market commentary)
   1 = Low relevance (tangential mention, general market noise)
+- company_relevance: array with one 1-5 relevance per listed company, in the listed order (same scale, for that company specifically; 1 if it is only mentioned in passing)
 
 Articles:
 {chr(10).join(articles_text)}
@@ -625,121 +911,371 @@ Articles:
 Return ONLY a JSON array."""
 
 
-def analyze_sentiment_batch(articles: list, anthropic_client: Anthropic, company_map: dict) -> list:
-    """Analyze sentiment for a batch of articles using Claude Haiku.
+class SentimentParseError(Exception):
+    """Model answer was not a JSON array (e.g. cut off at max_tokens)."""
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def plan_sentiment_batches(stories: list, company_map: dict) -> list:
+    """Pack stories into API calls by estimated prompt and answer tokens."""
+    overhead = _estimate_tokens(_build_sentiment_prompt([], company_map))
+    batches = []
+    batch, input_tokens, output_tokens = [], overhead, 0
+    for members in stories:
+        article = members[0]
+        companies = _story_companies(members)
+        story_input = _estimate_tokens(f"{article['title']} {article.get('summary') or ''}") \
+            + 8 * len(companies) + 10
+        story_output = 40 + 4 * len(companies)
+        if batch and (input_tokens + story_input > SENTIMENT_INPUT_TOKENS
+                      or output_tokens + story_output > SENTIMENT_OUTPUT_TOKENS
+                      or len(batch) >= SENTIMENT_MAX_STORIES):
+            batches.append(batch)
+            batch, input_tokens, output_tokens = [], overhead, 0
+        batch.append(members)
+        input_tokens += story_input
+        output_tokens += story_output
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _seconds_until(reset: str | None) -> float:
+    """Seconds until an RFC 3339 reset timestamp from a rate-limit header."""
+    if not reset:
+        return 0.0
+    try:
+        reset_at = datetime.fromisoformat(reset.replace('Z', '+00:00'))
+        return max(0.0, (reset_at - datetime.now(timezone.utc)).total_seconds())
+    except ValueError:
+        return 0.0
+
+
+def _observe_rate_limit_headers(headers, limiter: AdaptiveConcurrency, prompt_tokens: int) -> None:
+    """Throttle when the remaining request/token quota would not cover the
+    calls about to run, otherwise allow one more concurrent call."""
+    def remaining(name: str) -> int | None:
+        value = headers.get(f'anthropic-ratelimit-{name}-remaining')
+        try:
+            return int(value) if value is not None else None
+        except ValueError:
+            return None
+
+    requests_left = remaining('requests')
+    tokens_left = remaining('input-tokens')
+    if tokens_left is None:
+        tokens_left = remaining('tokens')
+
+    if requests_left is not None and requests_left <= limiter.limit:
+        limiter.throttle(_seconds_until(headers.get('anthropic-ratelimit-requests-reset')))
+    elif tokens_left is not None and tokens_left < prompt_tokens * limiter.limit:
+        reset = headers.get('anthropic-ratelimit-input-tokens-reset') \
+            or headers.get('anthropic-ratelimit-tokens-reset')
+        limiter.throttle(_seconds_until(reset))
+    else:
+        limiter.relax()
+
+
+def analyze_sentiment_batch(stories: list, anthropic_client: Anthropic, company_map: dict,
+                            limiter: AdaptiveConcurrency = None) -> list:
+    """Analyze sentiment for a batch of stories using Claude Haiku.
 
     Args:
-        articles: list of article dicts (must have title, summary, company_id)
+        stories: list of stories, each a list of article dicts for the same
+                 article text (title, summary, company_id/industry_match)
         anthropic_client: Anthropic API client
         company_map: {company_id: company_name} mapping
+        limiter: shared concurrency limit, adjusted from the rate-limit headers
 
     Returns:
-        list of dicts with index, sentiment, catalyst_type, relevance
+        list of dicts with index, sentiment, catalyst_type, relevance, company_relevance
+
+    Raises SentimentParseError if the answer is no JSON array; API errors propagate.
     """
-    prompt = _build_sentiment_prompt(articles, company_map)
+    prompt = _build_sentiment_prompt(stories, company_map)
 
+    if limiter:
+        limiter.acquire()
     try:
-        response = anthropic_client.messages.create(
-            model="claude-haiku-4-5-20251001",
+        raw = anthropic_client.messages.with_raw_response.create(
+            model=SENTIMENT_MODEL,
             max_tokens=2000,
             messages=[{"role": "user", "content": prompt}]
         )
-        text = response.content[0].text.strip()
+        if limiter:
+            _observe_rate_limit_headers(raw.headers, limiter, _estimate_tokens(prompt))
+    finally:
+        if limiter:
+            limiter.release()
 
-        # Extract JSON from response (handle markdown code blocks)
-        if text.startswith('```'):
-            text = text.split('\n', 1)[1]
-            text = text.rsplit('```', 1)[0]
+    response = raw.parse()
+    text = response.content[0].text.strip()
 
-        results = json.loads(text)
-        return results
+    # Extract JSON from response (handle markdown code blocks)
+    if text.startswith('```'):
+        text = text.split('\n', 1)[1]
+        text = text.rsplit('```', 1)[0]
 
+    try:
+        results = json.loads(text)
     except json.JSONDecodeError as e:
-        print(f"    JSON parse error in sentiment analysis: {e}")
-        return []
-    except Exception as e:
-        print(f"    Sentiment API error: {e}")
-        return []
+        raise SentimentParseError(str(e))
+    if not isinstance(results, list):
+        raise SentimentParseError(f"expected a JSON array, got {type(results).__name__}")
+    return results
+
 
+def _retry_after(error: Exception, attempt: int) -> float:
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return 5.0 * 2 ** attempt
+
+
+def analyze_stories(batches: list, company_map: dict, on_result, stats: Counter,
+                    workers: int = SENTIMENT_MAX_WORKERS, limiter: AdaptiveConcurrency = None) -> None:
+    """Run sentiment batches concurrently.
+
+    Pass a limiter to keep the learned concurrency across calls (the
+    collector analyzes one pipeline batch at a time).
+
+    on_result(members, result) is called in the calling thread for every story
+    the model answered. A batch whose answer is not valid JSON is split in
+    half and retried; 429/5xx/connection errors pause all workers and retry
+    the batch up to SENTIMENT_MAX_RETRIES times.
+    """
+    # Retries are ours: the SDK's own retries would hide 429s from the limiter
+    anthropic_client = Anthropic(api_key=ANTHROPIC_API_KEY, max_retries=0)
+    limiter = limiter or AdaptiveConcurrency(workers)
+    throttled_before = limiter.throttled
+    total = len(batches)
+    done_batches = 0
+    started = time.time()
+
+    with ThreadPoolExecutor(max_workers=limiter.max_workers) as pool:
+        def submit(batch, attempt=0):
+            future = pool.submit(analyze_sentiment_batch, batch, anthropic_client, company_map, limiter)
+            pending[future] = (batch, attempt)
+
+        pending = {}
+        for batch in batches:
+            submit(batch)
+
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                batch, attempt = pending.pop(future)
+                try:
+                    results = future.result()
+                except SentimentParseError as e:
+                    if len(batch) > 1:
+                        mid = len(batch) // 2
+                        submit(batch[:mid])
+                        submit(batch[mid:])
+                        stats['sentiment_batches_split'] += 1
+                        total += 1
+                    else:
+                        print(f"    JSON parse error in sentiment analysis, story skipped: {e}")
+                        stats['sentiment_failed'] += 1
+                    continue
+                except (APIStatusError, APIConnectionError) as e:
+                    status = getattr(e, 'status_code', None)
+                    retryable = status is None or status == 429 or status >= 500
+                    if retryable and attempt < SENTIMENT_MAX_RETRIES:
+                        limiter.throttle(_retry_after(e, attempt))
+                        stats['sentiment_retries'] += 1
+                        submit(batch, attempt + 1)
+                    else:
+                        print(f"    Sentiment API error: {e}")
+                        stats['sentiment_failed'] += len(batch)
+                    continue
+                except Exception as e:
+                    print(f"    Sentiment API error: {e}")
+                    stats['sentiment_failed'] += len(batch)
+                    continue
 
-def run_sentiment_analysis(news_to_insert: list, company_map: dict, stats: Counter):
+                for result in results:
+                    idx = result.get('index', 0) - 1 if isinstance(result, dict) else -1
+                    if 0 <= idx < len(batch):
+                        on_result(batch[idx], result)
+
+                done_batches += 1
+                if done_batches % 10 == 0 or not pending:
+                    print(f"    ... {done_batches}/{total} batches done "
+                          f"({stats.get('sentiment_analyzed', 0)} analyzed, "
+                          f"{stats.get('catalyst_detected', 0)} catalysts, "
+                          f"{stats.get('high_relevance', 0)} high-relevance; "
+                          f"{limiter.limit} parallel, {time.time() - started:.0f}s)")
+
+    stats['sentiment_throttled'] += limiter.throttled - throttled_before
+
+
+def _parse_sentiment_result(result: dict) -> dict:
+    """Validated sentiment/catalyst_type/relevance fields of one model result."""
+    fields = {}
+
+    sentiment = str(result.get('sentiment') or '').lower()
+    if sentiment in ('positive', 'negative', 'neutral'):
+        fields['sentiment'] = sentiment
+
+    catalyst = result.get('catalyst_type')
+    if catalyst and str(catalyst).lower() not in ('null', 'none', ''):
+        fields['catalyst_type'] = str(catalyst).lower()
+
+    relevance = result.get('relevance')
+    if relevance is not None:
+        try:
+            relevance = int(relevance)
+            if 1 <= relevance <= 5:
+                fields['relevance'] = relevance
+        except (ValueError, TypeError):
+            pass
+
+    return fields
+
+
+def _parse_company_relevance(result: dict, companies: list) -> dict:
+    """{company_key: relevance} from the result's company_relevance array."""
+    values = result.get('company_relevance')
+    if not isinstance(values, list):
+        return {}
+    parsed = {}
+    for key, value in zip(companies, values):
+        relevance = _parse_sentiment_result({'relevance': value}).get('relevance')
+        if relevance is not None:
+            parsed[key] = relevance
+    return parsed
+
+
+def _fields_for_article(article: dict, fields: dict, company_relevance: dict) -> dict:
+    """Story-level fields for one row, with that row's company relevance."""
+    return _fields_for_company(company_key(article), fields, company_relevance)
+
+
+def _fields_for_company(key: str, fields: dict, company_relevance: dict) -> dict:
+    row_fields = {k: fields[k] for k in ('sentiment', 'catalyst_type') if fields.get(k)}
+    relevance = company_relevance.get(key, fields.get('relevance'))
+    if relevance is not None:
+        row_fields['relevance'] = relevance
+    return row_fields
+
+
+def _count_sentiment_fields(fields: dict, stats: Counter) -> None:
+    if 'sentiment' in fields:
+        stats['sentiment_analyzed'] += 1
+    if 'catalyst_type' in fields:
+        stats['catalyst_detected'] += 1
+    if 'relevance' in fields:
+        stats['relevance_scored'] += 1
+        if fields['relevance'] >= RELEVANCE_ALERT_THRESHOLD:
+            stats['high_relevance'] += 1
+
+
+def run_sentiment_analysis(news_to_insert: list, company_map: dict, stats: Counter,
+                           known_clusters: dict = None, cache: SentimentCache = None,
+                           workers: int = SENTIMENT_MAX_WORKERS, limiter: AdaptiveConcurrency = None,
+                           gate: LexiconGate = None, priority_ids: set = None):
     """Run sentiment analysis on all articles to be inserted.
 
     Modifies articles in-place, setting 'sentiment', 'catalyst_type', and 'relevance' fields.
+    Each story (cluster, else URL) is analyzed once with all its companies in
+    the prompt; the result is fanned out to the per-company rows. Rows are
+    filled without a model call from known_clusters ({(cluster_id, company_key):
+    fields} of already stored members) or from the URL-hash sentiment cache.
+    With a gate, the remaining stories are pre-classified locally; only those
+    the gate escalates (threshold, priority_ids, audit sample) go to the model,
+    the others keep the provisional fields, flagged with sentiment_source.
     """
-    if not ANTHROPIC_API_KEY:
-        print("\n  Sentiment: SKIPPED (no ANTHROPIC_API_KEY in .env)")
+    known_clusters = known_clusters or {}
+
+    to_analyze = []
+    provisional = {}  # id(row) -> (escalation reason, provisional fields)
+    for members in _group_stories(news_to_insert):
+        pending = []
+        for article in members:
+            fields = known_clusters.get((article.get('cluster_id'), company_key(article)))
+            if fields:
+                article.update({k: v for k, v in fields.items() if v is not None})
+                stats['sentiment_from_stored_cluster'] += 1
+            else:
+                pending.append(article)
+        if not pending:
+            continue
+
+        entry = cache.get(_story_hashes(pending)) if cache is not None else None
+        if entry:
+            for article in pending:
+                article.update(_fields_for_article(article, entry, entry.get('company_relevance') or {}))
+            stats['sentiment_cached'] += len(pending)
+            continue
+
+        if gate is not None:
+            names = {company_key(a): _company_label(a, company_map) for a in pending}
+            reason, fields_by_key = gate.triage(pending, names, priority_ids)
+            if reason is None:
+                for article in pending:
+                    article.update(fields_by_key[company_key(article)])
+                    article['sentiment_source'] = LEXICON_SOURCE
+                stats['sentiment_lexicon'] += len(pending)
+                continue
+            for article in pending:
+                provisional[id(article)] = (reason, fields_by_key[company_key(article)])
+        to_analyze.append(pending)
+
+    if not to_analyze or not ANTHROPIC_API_KEY:
         return
 
-    anthropic_client = Anthropic(api_key=ANTHROPIC_API_KEY)
-    batches = [news_to_insert[i:i + SENTIMENT_BATCH_SIZE]
-               for i in range(0, len(news_to_insert), SENTIMENT_BATCH_SIZE)]
+    batches = plan_sentiment_batches(to_analyze, company_map)
 
-    print(f"\n  Phase 3: Sentiment Analysis + Relevance Scoring (Claude Haiku)")
-    print("  " + "-" * 40)
-    print(f"  Analyzing {len(news_to_insert)} articles in {len(batches)} batches...")
+    print(f"    Sentiment: {len(to_analyze)} stories ({sum(len(s) for s in to_analyze)} articles) "
+          f"in {len(batches)} API calls, up to {workers} in parallel...")
 
-    for batch_idx, batch in enumerate(batches):
-        results = analyze_sentiment_batch(batch, anthropic_client, company_map)
+    def on_result(members: list, result: dict) -> None:
+        fields = _parse_sentiment_result(result)
+        company_relevance = _parse_company_relevance(result, _story_companies(members))
+        for article in members:
+            row_fields = _fields_for_article(article, fields, company_relevance)
+            article.update(row_fields)
+            _count_sentiment_fields(row_fields, stats)
+            if id(article) in provisional:
+                reason, prov_fields = provisional[id(article)]
+                gate.compare(prov_fields, row_fields, reason)
+        stats['sentiment_stories'] += 1
+        if cache is not None and fields.get('sentiment'):
+            cache.record(_story_hashes(members), fields, company_relevance)
 
-        if results:
-            for result in results:
-                idx = result.get('index', 0) - 1
-                if 0 <= idx < len(batch):
-                    sentiment = result.get('sentiment', '').lower()
-                    if sentiment in ('positive', 'negative', 'neutral'):
-                        batch[idx]['sentiment'] = sentiment
-                        stats['sentiment_analyzed'] += 1
-
-                    catalyst = result.get('catalyst_type')
-                    if catalyst and str(catalyst).lower() not in ('null', 'none', ''):
-                        batch[idx]['catalyst_type'] = str(catalyst).lower()
-                        stats['catalyst_detected'] += 1
-
-                    relevance = result.get('relevance')
-                    if relevance is not None:
-                        try:
-                            relevance = int(relevance)
-                            if 1 <= relevance <= 5:
-                                batch[idx]['relevance'] = relevance
-                                stats['relevance_scored'] += 1
-                                if relevance >= RELEVANCE_ALERT_THRESHOLD:
-                                    stats['high_relevance'] += 1
-                        except (ValueError, TypeError):
-                            pass
-
-        if (batch_idx + 1) % 10 == 0 or batch_idx == len(batches) - 1:
-            print(f"    ... {batch_idx + 1}/{len(batches)} batches done "
-                  f"({stats.get('sentiment_analyzed', 0)} analyzed, "
-                  f"{stats.get('catalyst_detected', 0)} catalysts, "
-                  f"{stats.get('high_relevance', 0)} high-relevance)")
-
-        time.sleep(SENTIMENT_RATE_LIMIT_DELAY)
-
-
-def backfill_sentiment():
-    """Backfill sentiment and relevance on existing articles where sentiment IS NULL."""
-    if not ANTHROPIC_API_KEY:
-        print("\n  ERROR: ANTHROPIC_API_KEY not set in .env")
-        sys.exit(1)
+    analyze_stories(batches, company_map, on_result, stats, workers, limiter)
 
-    client = supabase_helper.get_client()
-    anthropic_client = Anthropic(api_key=ANTHROPIC_API_KEY)
 
-    # Load company names for the prompt
-    companies = supabase_helper.get_all_companies('id, name')
-    company_map = {c['id']: c.get('name', '?') for c in companies}
+_sentiment_source_available = None  # None = not checked yet
 
-    # Fetch articles without sentiment
-    print("\n  Loading articles without sentiment...")
+
+def _has_sentiment_source(client) -> bool:
+    """company_news.sentiment_source exists (see news_lexicon.py)."""
+    global _sentiment_source_available
+    if _sentiment_source_available is None:
+        _sentiment_source_available = has_sentiment_source_column(client)
+    return _sentiment_source_available
+
+
+def _load_articles_without_sentiment(client) -> list:
+    """Rows without sentiment, and rows with only provisional lexicon fields."""
     articles = []
     page_size = 1000
     offset = 0
 
     while True:
-        response = client.table('company_news') \
-            .select('id, company_id, title, summary') \
-            .is_('sentiment', 'null') \
+        query = client.table('company_news') \
+            .select('id, company_id, industry_match, url, title, summary')
+        if _has_sentiment_source(client):
+            query = query.or_(f'sentiment.is.null,sentiment_source.eq.{LEXICON_SOURCE}')
+        else:
+            query = query.is_('sentiment', 'null')
+        response = query \
             .range(offset, offset + page_size - 1) \
             .execute()
         batch = response.data
@@ -748,70 +1284,365 @@ def backfill_sentiment():
             break
         offset += page_size
 
+    return articles
+
+
+_sentiment_rpc_available = None  # None = not tried yet
+
+
+def _write_with_retry(write, size: int, max_retries: int = 3) -> bool:
+    for attempt in range(max_retries):
+        try:
+            write()
+            return True
+        except Exception as e:
+            if attempt < max_retries - 1:
+                wait_s = 2 ** (attempt + 1)
+                print(f"    Retry writing {size} articles in {wait_s}s... ({e})")
+                time.sleep(wait_s)
+            else:
+                print(f"    Failed to write {size} articles: {e}")
+    return False
+
+
+def apply_sentiment_updates(client, updates: list, max_retries: int = 3) -> dict:
+    """Write [(article_id, fields)] with few requests.
+
+    Uses the apply_news_sentiment(updates jsonb) function when it exists
+    (NEWS_UPDATE_CHUNK rows per call). Until then rows with identical
+    fields (sentiment × catalyst × relevance has only a few hundred
+    combinations) share one UPDATE ... WHERE id IN (...). Each chunk is
+    retried with backoff. The updates are LLM answers: they clear the
+    provisional-lexicon flag (sentiment_source) where the column exists.
+
+    Migration (run once in Supabase, after the sentiment_source column of
+    news_lexicon.py; re-run if the function was created without it):
+
+        CREATE OR REPLACE FUNCTION apply_news_sentiment(updates jsonb) RETURNS integer
+        LANGUAGE sql AS $$
+          WITH done AS (
+            UPDATE company_news n SET
+              sentiment = COALESCE(u.sentiment, n.sentiment),
+              catalyst_type = COALESCE(u.catalyst_type, n.catalyst_type),
+              relevance = COALESCE(u.relevance, n.relevance),
+              sentiment_source = NULL
+            FROM jsonb_populate_recordset(NULL::company_news, updates) u
+            WHERE n.id = u.id
+            RETURNING 1
+          )
+          SELECT count(*)::int FROM done;
+        $$;
+
+    Returns {'written', 'failed', 'requests', 'seconds'}.
+    """
+    global _sentiment_rpc_available
+    result = {'written': 0, 'failed': 0, 'requests': 0, 'seconds': 0.0}
+    updates = [(article_id, fields) for article_id, fields in updates if fields]
+    if not updates:
+        return result
+    started = time.time()
+
+    if _sentiment_rpc_available is not False:
+        rows = [{'id': article_id, **fields} for article_id, fields in updates]
+        for i in range(0, len(rows), NEWS_UPDATE_CHUNK):
+            chunk = rows[i:i + NEWS_UPDATE_CHUNK]
+            if _sentiment_rpc_available is None:
+                try:
+                    client.rpc('apply_news_sentiment', {'updates': chunk}).execute()
+                    _sentiment_rpc_available = True
+                    result['requests'] += 1
+                    result['written'] += len(chunk)
+                    continue
+                except Exception as e:
+                    if 'apply_news_sentiment' in str(e) or 'PGRST202' in str(e):
+                        print("  apply_news_sentiment() missing — migration pending, using grouped updates")
+                        _sentiment_rpc_available = False
+                        updates = updates[i:]
+                        break
+                    # Other error: retried below like any chunk
+            result['requests'] += 1
+            if _write_with_retry(lambda: client.rpc('apply_news_sentiment', {'updates': chunk}).execute(),
+                                 len(chunk), max_retries):
+                result['written'] += len(chunk)
+            else:
+                result['failed'] += len(chunk)
+        if _sentiment_rpc_available:
+            result['seconds'] = time.time() - started
+            return result
+
+    clear_source = _has_sentiment_source(client)
+    groups = {}
+    for article_id, fields in updates:
+        if clear_source:
+            fields = {**fields, 'sentiment_source': None}
+        groups.setdefault(tuple(sorted(fields.items())), []).append(article_id)
+
+    for values, ids in groups.items():
+        for i in range(0, len(ids), NEWS_UPDATE_CHUNK):
+            chunk = ids[i:i + NEWS_UPDATE_CHUNK]
+            result['requests'] += 1
+            if _write_with_retry(lambda: client.table('company_news').update(dict(values)).in_('id', chunk).execute(),
+                                 len(chunk), max_retries):
+                result['written'] += len(chunk)
+            else:
+                result['failed'] += len(chunk)
+
+    result['seconds'] = time.time() - started
+    return result
+
+
+def backfill_sentiment(workers: int = SENTIMENT_MAX_WORKERS):
+    """Backfill sentiment and relevance on existing articles where sentiment IS NULL."""
+    if not ANTHROPIC_API_KEY:
+        print("\n  ERROR: ANTHROPIC_API_KEY not set in .env")
+        sys.exit(1)
+
+    client = supabase_helper.get_client()
+    cache = SentimentCache()
+
+    # Load company names for the prompt
+    companies = supabase_helper.get_all_companies('id, name')
+    company_map = {c['id']: c.get('name', '?') for c in companies}
+
+    # Fetch articles without sentiment
+    print("\n  Loading articles without sentiment...")
+    articles = _load_articles_without_sentiment(client)
+
     if not articles:
         print("  No articles need sentiment backfill.")
         return
 
-    print(f"  Found {len(articles)} articles without sentiment.")
+    stories = _group_stories(articles)
+    print(f"  Found {len(articles)} articles without sentiment ({len(stories)} unique articles).")
 
-    batches = [articles[i:i + SENTIMENT_BATCH_SIZE]
-               for i in range(0, len(articles), SENTIMENT_BATCH_SIZE)]
-    est_cost = len(batches) * 0.001
-    print(f"  Estimated cost: ~${est_cost:.2f} ({len(batches)} batches x ~$0.001)")
-    print(f"  Processing...")
-
-    total_updated = 0
     total_catalysts = 0
     total_relevance = 0
+    pending_updates = []
+    write_totals = Counter()
+
+    def write_story(members: list, fields: dict, company_relevance: dict) -> None:
+        nonlocal total_catalysts, total_relevance
+        for article in members:
+            update_data = _fields_for_article(article, fields, company_relevance)
+            total_catalysts += 'catalyst_type' in update_data
+            total_relevance += 'relevance' in update_data
+            if update_data:
+                pending_updates.append((article['id'], update_data))
+        if len(pending_updates) >= BACKFILL_FLUSH_ROWS:
+            flush()
+
+    def flush() -> None:
+        if pending_updates:
+            write_totals.update(apply_sentiment_updates(client, pending_updates))
+            pending_updates.clear()
+
+    # Articles analyzed before (e.g. stored while the model was unavailable)
+    to_analyze = []
+    for members in stories:
+        entry = cache.get(_story_hashes(members))
+        if entry:
+            write_story(members, entry, entry.get('company_relevance') or {})
+        else:
+            to_analyze.append(members)
+    if cache.stats['hits']:
+        flush()
+        print(f"  {cache.stats['hits']} articles answered from the sentiment cache")
 
-    for batch_idx, batch in enumerate(batches):
-        results = analyze_sentiment_batch(batch, anthropic_client, company_map)
+    batches = plan_sentiment_batches(to_analyze, company_map)
+    est_cost = len(batches) * 0.002
+    print(f"  Estimated cost: ~${est_cost:.2f} ({len(batches)} batches x ~$0.002)")
+    print(f"  Processing with up to {workers} parallel calls...")
 
-        if results:
-            for result in results:
-                idx = result.get('index', 0) - 1
-                if 0 <= idx < len(batch):
-                    article = batch[idx]
-                    update_data = {}
-
-                    sentiment = result.get('sentiment', '').lower()
-                    if sentiment in ('positive', 'negative', 'neutral'):
-                        update_data['sentiment'] = sentiment
-
-                    catalyst = result.get('catalyst_type')
-                    if catalyst and str(catalyst).lower() not in ('null', 'none', ''):
-                        update_data['catalyst_type'] = str(catalyst).lower()
-                        total_catalysts += 1
-
-                    relevance = result.get('relevance')
-                    if relevance is not None:
-                        try:
-                            relevance = int(relevance)
-                            if 1 <= relevance <= 5:
-                                update_data['relevance'] = relevance
-                                total_relevance += 1
-                        except (ValueError, TypeError):
-                            pass
-
-                    if update_data:
-                        try:
-                            client.table('company_news') \
-                                .update(update_data) \
-                                .eq('id', article['id']) \
-                                .execute()
-                            total_updated += 1
-                        except Exception as e:
-                            print(f"    Error updating {article['id']}: {e}")
-
-        if (batch_idx + 1) % 10 == 0 or batch_idx == len(batches) - 1:
-            print(f"    ... {batch_idx + 1}/{len(batches)} batches done "
-                  f"({total_updated} updated, {total_catalysts} catalysts, "
-                  f"{total_relevance} relevance scored)")
-
-        time.sleep(SENTIMENT_RATE_LIMIT_DELAY)
-
-    print(f"\n  Backfill complete: {total_updated} articles updated, "
+    stats = Counter()
+    started = time.time()
+
+    def on_result(members: list, result: dict) -> None:
+        fields = _parse_sentiment_result(result)
+        company_relevance = _parse_company_relevance(result, _story_companies(members))
+        write_story(members, fields, company_relevance)
+        for article in members:
+            _count_sentiment_fields(_fields_for_article(article, fields, company_relevance), stats)
+        if fields.get('sentiment'):
+            cache.record(_story_hashes(members), fields, company_relevance)
+            stats['stories_done'] += 1
+            if stats['stories_done'] % 200 == 0:
+                cache.save()
+
+    analyze_stories(batches, company_map, on_result, stats, workers)
+    elapsed = time.time() - started
+    print(f"  Model phase: {elapsed:.0f}s ({stats.get('stories_done', 0) / max(elapsed, 1e-9):.1f} articles/s, "
+          f"{stats.get('sentiment_batches_split', 0)} batches split, {stats.get('sentiment_retries', 0)} retries, "
+          f"{stats.get('sentiment_failed', 0)} failed)")
+
+    flush()
+    cache.save()
+    # Sentiment counts per company changed
+    NewsStatsWriter(client).refresh(a.get('company_id') for a in articles)
+    print(f"\n  Backfill complete: {write_totals['written']} articles updated, "
           f"{total_catalysts} catalysts detected, {total_relevance} relevance scored.")
+    write_seconds = write_totals['seconds']
+    print(f"  Writes: {write_totals['requests']} requests in {write_seconds:.1f}s "
+          f"({write_totals['written'] / max(write_seconds, 1e-9):.0f} rows/s), "
+          f"{write_totals['failed']} failed")
+
+
+def _local_sentiment_responder(prompt: str) -> str:
+    """Stand-in answer for --batch-backend local: neutral, relevance 2."""
+    answers = []
+    for i, companies in enumerate(re.findall(r'^   Companies: (.*)$', prompt, re.M)):
+        answers.append({
+            'index': i + 1,
+            'sentiment': 'neutral',
+            'catalyst_type': None,
+            'relevance': 2,
+            'company_relevance': [2] * len(companies.split('; ')),
+        })
+    return json.dumps(answers)
+
+
+def sentiment_batch_backend(name: str):
+    if name == 'local':
+        return LocalBatchBackend(LOCAL_BATCH_DIR, _local_sentiment_responder)
+    return AnthropicBatchBackend(Anthropic(api_key=ANTHROPIC_API_KEY), SENTIMENT_MODEL)
+
+
+def poll_sentiment_jobs(client, backend) -> int:
+    """Apply the results of finished batch jobs. Returns articles updated."""
+    store = BatchJobStore(SENTIMENT_JOBS_FILE)
+    jobs = store.open_jobs(backend.name)
+    if not jobs:
+        return 0
+
+    print(f"\n  Polling {len(jobs)} sentiment batch job(s)...")
+    cache = SentimentCache()
+    total_written = 0
+
+    for job_id, job in jobs:
+        try:
+            status = backend.status(job_id)
+        except Exception as e:
+            print(f"    {job_id}: status check failed ({e})")
+            continue
+        store.touch(job_id)
+        age_h = (datetime.now().timestamp() - job['submitted_at']) / 3600
+        if status != STATUS_ENDED:
+            print(f"    {job_id}: still running ({age_h:.1f}h since submit)")
+            continue
+
+        requests_map = job['payload']['requests']
+        updates = []
+        answered = 0
+        unanswered = 0
+        for custom_id, text in backend.results(job_id):
+            stories = requests_map.get(custom_id)
+            if stories is None:
+                continue
+            results = parse_json_array(text)
+            if results is None:
+                # Rows stay NULL and go into the next job
+                unanswered += len(stories)
+                continue
+            for result in results:
+                idx = result.get('index', 0) - 1 if isinstance(result, dict) else -1
+                if not 0 <= idx < len(stories):
+                    continue
+                story = stories[idx]
+                companies = list(dict.fromkeys(key for _, key in story['rows']))
+                fields = _parse_sentiment_result(result)
+                company_relevance = _parse_company_relevance(result, companies)
+                for article_id, key in story['rows']:
+                    updates.append((article_id, _fields_for_company(key, fields, company_relevance)))
+                if fields.get('sentiment'):
+                    cache.record(story['hashes'], fields, company_relevance)
+                    answered += 1
+
+        write = apply_sentiment_updates(client, updates)
+        cache.save()
+        NewsStatsWriter(client).refresh(
+            key for story in requests_map.values() for _, key in story['rows'] if not key.startswith('industry:')
+        )
+        total_written += write['written']
+        print(f"    {job_id}: ended after {age_h:.1f}h — {answered} articles answered, "
+              f"{unanswered} unanswered, {write['written']} rows updated, {write['failed']} failed "
+              f"({write['requests']} requests, {write['seconds']:.1f}s)")
+        # Unwritten rows stay NULL; their answers are in the cache for the next backfill
+        store.remove(job_id)
+
+    return total_written
+
+
+def submit_sentiment_job(client, backend, company_map: dict) -> list:
+    """Submit all articles without sentiment (not already in an open job). Returns job ids."""
+    store = BatchJobStore(SENTIMENT_JOBS_FILE)
+    in_flight = {
+        article_id
+        for _, job in store.open_jobs()
+        for stories in job['payload']['requests'].values()
+        for story in stories
+        for article_id, _ in story['rows']
+    }
+
+    articles = [a for a in _load_articles_without_sentiment(client) if a['id'] not in in_flight]
+    if not articles:
+        print("  No articles need a sentiment batch job.")
+        return []
+
+    # Articles answered before need no job
+    cache = SentimentCache()
+    updates = []
+    to_analyze = []
+    for members in _group_stories(articles):
+        entry = cache.get(_story_hashes(members))
+        if entry:
+            for article in members:
+                updates.append((article['id'], _fields_for_article(article, entry, entry.get('company_relevance') or {})))
+        else:
+            to_analyze.append(members)
+    if updates:
+        write = apply_sentiment_updates(client, updates)
+        print(f"  {write['written']} articles answered from the sentiment cache")
+
+    batches = plan_sentiment_batches(to_analyze, company_map)
+    print(f"  {len(articles)} articles ({len(to_analyze)} unique) in {len(batches)} requests, "
+          f"{len(in_flight)} already in open jobs")
+
+    job_ids = []
+    for start in range(0, len(batches), SENTIMENT_JOB_MAX_REQUESTS):
+        requests_list = []
+        payload = {'requests': {}}
+        for i, batch in enumerate(batches[start:start + SENTIMENT_JOB_MAX_REQUESTS]):
+            custom_id = f"b{start + i}"
+            requests_list.append((custom_id, _build_sentiment_prompt(batch, company_map)))
+            payload['requests'][custom_id] = [
+                {'rows': [[a['id'], company_key(a)] for a in members], 'hashes': sorted(_story_hashes(members))}
+                for members in batch
+            ]
+        job_id = backend.submit(requests_list)
+        store.add(job_id, backend.name, payload)
+        job_ids.append(job_id)
+        print(f"  Submitted {backend.name} batch job {job_id} ({len(requests_list)} requests)")
+
+    return job_ids
+
+
+def backfill_sentiment_job(backend_name: str = 'anthropic'):
+    """--backfill-sentiment --batch-job: apply finished jobs, then submit the rest."""
+    if backend_name != 'local' and not ANTHROPIC_API_KEY:
+        print("\n  ERROR: ANTHROPIC_API_KEY not set in .env")
+        sys.exit(1)
+
+    client = supabase_helper.get_client()
+    backend = sentiment_batch_backend(backend_name)
+
+    updated = poll_sentiment_jobs(client, backend)
+    if updated:
+        print(f"  Applied {updated} results from finished jobs")
+
+    companies = supabase_helper.get_all_companies('id, name')
+    company_map = {c['id']: c.get('name', '?') for c in companies}
+    print("\n  Loading articles without sentiment...")
+    submit_sentiment_job(client, backend, company_map)
+    print("  Results are applied by the next --backfill-sentiment --batch-job or --apply run.")
 
 
 # ---------------------------------------------------------------------------
@@ -820,15 +1651,22 @@ def backfill_sentiment():
 
 def create_news_alerts(news_to_insert: list, company_map: dict,
                        watchlist_ids: set, highvalue_ids: set,
-                       client, stats: Counter, dry_run: bool):
+                       client, stats: Counter, dry_run: bool,
+                       alerted_clusters: set = None):
     """Create alerts for high-relevance news articles (relevance >= 4).
 
     Alert priority rules:
       - Company on watchlist: HIGH priority
       - Company is Defcon 1/2 or Thier 2026**/2026***: MEDIUM priority
       - Other companies: no alert (just stored with high relevance)
+
+    At most one alert per story cluster and company: alerted_clusters holds
+    (cluster_id, company_id) pairs that are already alert-worthy (stored before
+    this run or alerted in an earlier batch); new alerts are added to it.
     """
     alerts_to_create = []
+    if alerted_clusters is None:
+        alerted_clusters = set()
 
     for article in news_to_insert:
         relevance = article.get('relevance')
@@ -839,6 +1677,11 @@ def create_news_alerts(news_to_insert: list, company_map: dict,
         if not company_id:
             continue  # skip industry-only articles for alerts
 
+        cluster_key = (article.get('cluster_id') or article.get('url'), company_id)
+        if cluster_key in alerted_clusters:
+            stats['alerts_collapsed'] += 1
+            continue
+
         company_name = company_map.get(company_id, 'Unknown')
         title = article.get('title', '')[:200]
 
@@ -865,6 +1708,7 @@ def create_news_alerts(news_to_insert: list, company_map: dict,
                 'catalyst_type': catalyst,
                 'source': article.get('source'),
                 'url': article.get('url'),
+                'cluster_id': article.get('cluster_id'),
             }),
             'is_active': True,
             'is_read': False,
@@ -872,6 +1716,7 @@ def create_news_alerts(news_to_insert: list, company_map: dict,
             'created_at': datetime.now(timezone.utc).isoformat(),
         }
         alerts_to_create.append(alert_data)
+        alerted_clusters.add(cluster_key)
         stats['alerts_created'] += 1
 
     if not alerts_to_create:
@@ -1035,6 +1880,318 @@ def create_spac_lockup_events_from_news(articles: list, company_map: dict, dry_r
     print(f"    Events inserted: {inserted}")
 
 
+# ---------------------------------------------------------------------------
+# Collection pipeline: fetch → dedup → match (generators) → batches →
+# cluster → analyze → insert → alert (worker thread, see news_pipeline.py)
+# ---------------------------------------------------------------------------
+
+def _news_row(article: dict, article_hash: str, company_id: str = None, industry: str = None,
+              published_at: str = None) -> dict:
+    """company_news row for a matched article."""
+    return {
+        'company_id': company_id,
+        'title': article['title'][:500],
+        'summary': article.get('summary'),
+        'url': article['url'][:2000],
+        'url_hash': article_hash,
+        'source': article['source'],
+        'sentiment': None,
+        'relevance': None,
+        'industry_match': industry,
+        'published_at': published_at,
+        'fetched_at': datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def collect_rss_rows(rss_articles: list, deduper: NewsDeduper, company_index: dict, stats: Counter):
+    """Yield the new company_news rows of each RSS article (dedup + matching)."""
+    deduper.prefetch(a['url'] for a in rss_articles)
+    for article in rss_articles:
+        if deduper.is_duplicate(article['url']):
+            stats['rss_duplicates'] += 1
+            continue
+        article_hash = url_hash(article['url'])
+
+        matched = match_article_to_companies(
+            article['title'], article.get('summary', ''), company_index
+        )
+
+        if matched:
+            rows = [_news_row(article, article_hash, company_id=company['id'],
+                              published_at=article.get('published_at'))
+                    for company in matched]
+            stats['rss_matched'] += len(rows)
+        else:
+            # No company match — check for industry-level match
+            industries = match_article_to_industries(
+                article['title'], article.get('summary', '')
+            )
+            if not industries:
+                stats['rss_unmatched'] += 1
+                continue
+            # Store with company_id=None but industry_match set
+            rows = [_news_row(article, article_hash, industry=industry,
+                              published_at=article.get('published_at'))
+                    for industry in industries]
+            stats['industry_matched'] += len(rows)
+
+        # Claim the URL to prevent intra-run duplicates
+        deduper.claim(article['url'])
+        yield rows
+
+
+def collect_brave_rows(plan: list, limiter: RateLimiter, deduper: NewsDeduper, company_index: dict,
+                       company_stats: BraveCompanyStats, stats: Counter):
+    """Run the planned Brave queries and yield the new rows of each answer.
+
+    Requests run on a small pool under one token bucket; answers are
+    deduplicated and matched here, in the consuming thread (dedup/matching
+    are not thread-safe). Every answer yields a list, possibly empty, so the
+    consumer regains control regularly. Stops at BRAVE_MAX_RUNTIME_MINUTES or
+    after BRAVE_MAX_CONSECUTIVE_429 rate-limited answers in a row.
+    """
+    consecutive_429 = 0
+    brave_stopped_reason = None
+    brave_start_time = time.time()
+    brave_deadline = brave_start_time + BRAVE_MAX_RUNTIME_MINUTES * 60
+
+    def stop_reason():
+        if time.time() > brave_deadline:
+            return f"max runtime ({BRAVE_MAX_RUNTIME_MINUTES} min)"
+        if consecutive_429 >= BRAVE_MAX_CONSECUTIVE_429:
+            return f"{BRAVE_MAX_CONSECUTIVE_429} consecutive 429s"
+        return None
+
+    queue = iter(plan)
+    done_calls = 0
+    with ThreadPoolExecutor(max_workers=BRAVE_MAX_WORKERS) as pool:
+        in_flight = {}
+
+        def fill():
+            while len(in_flight) < BRAVE_MAX_WORKERS * 2 and not stop_reason():
+                planned = next(queue, None)
+                if planned is None:
+                    return
+                future = pool.submit(search_brave_news, planned['query'], planned['count'], limiter)
+                in_flight[future] = planned
+
+        fill()
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                planned = in_flight.pop(future)
+                articles, was_429, failed = future.result()
+                done_calls += 1
+
+                if was_429:
+                    consecutive_429 += 1
+                    stats['brave_429s'] += 1
+                    continue
+                consecutive_429 = 0  # reset on success
+                if failed:
+                    # No answer: neither a search nor a 0-yield for the company stats
+                    stats['brave_errors'] += 1
+                    continue
+
+                stats['brave_searches'] += 1
+                stats['brave_companies_searched'] += len(planned['companies'])
+
+                attributed = attribute_brave_results(planned, articles, company_index)
+                new_by_company = Counter()
+                if len(planned['companies']) > 1:
+                    stats['brave_unattributed'] += len({a['url'] for a in articles}) \
+                        - len({a['url'] for a, _ in attributed})
+                deduper.prefetch(a['url'] for a, _ in attributed if a.get('url'))
+                claimed = set()
+                rows = []
+                for article, company in attributed:
+                    if not article.get('url'):
+                        continue
+
+                    if article['url'] not in claimed and deduper.is_duplicate(article['url']):
+                        stats['brave_duplicates'] += 1
+                        continue
+
+                    # Parse published_at from Brave's age format (e.g. "2 hours ago")
+                    published_at = article.get('published_at')
+                    if published_at and not published_at.startswith('20'):
+                        # It's a relative time string, not ISO — set to None
+                        published_at = None
+
+                    rows.append(_news_row(article, url_hash(article['url']), company_id=company['id'],
+                                          published_at=published_at))
+                    stats['brave_matched'] += 1
+                    new_by_company[company['id']] += 1
+                    # One packed result may belong to several companies of the query
+                    claimed.add(article['url'])
+                    deduper.claim(article['url'])
+
+                for company in planned['companies']:
+                    company_stats.record(company['id'], new_by_company[company['id']], date.today())
+
+                # Progress every 50 calls
+                if done_calls % 50 == 0:
+                    elapsed_min = (time.time() - brave_start_time) / 60
+                    print(f"    ... {done_calls}/{len(plan)} calls ({planned['tier']}), "
+                          f"{stats['brave_companies_searched']} companies, "
+                          f"{stats['brave_searches']} ok / {stats.get('brave_429s', 0)} 429s, "
+                          f"{elapsed_min:.1f} min elapsed")
+                yield rows
+
+            brave_stopped_reason = stop_reason()
+            if brave_stopped_reason:
+                print(f"\n    STOPPING: {brave_stopped_reason} (waiting for {len(in_flight)} running requests)")
+            else:
+                fill()
+
+    # Final Brave stats
+    brave_elapsed = (time.time() - brave_start_time) / 60
+    failed_calls = stats.get('brave_429s', 0) + stats.get('brave_errors', 0)
+    success_rate = (stats['brave_searches'] / max(1, stats['brave_searches'] + failed_calls)) * 100
+    print(f"\n  Brave Search completed in {brave_elapsed:.1f} min")
+    print(f"  Success rate: {success_rate:.0f}% ({stats['brave_searches']} ok / {stats.get('brave_429s', 0)} rate-limited"
+          f" / {stats.get('brave_errors', 0)} errors)")
+    print(f"  Companies per API call: "
+          f"{stats['brave_companies_searched'] / max(1, stats['brave_searches']):.2f} "
+          f"({stats['brave_companies_searched']} companies in {stats['brave_searches']} calls, "
+          f"{limiter.waited:.0f}s waited for the rate limit)")
+    if brave_stopped_reason:
+        print(f"  Stopped early: {brave_stopped_reason}")
+
+
+def insert_news_rows(client, rows: list, batch_size: int = 50) -> tuple:
+    """Insert company_news rows in batches. Returns (stored rows, errors).
+
+    A failing batch is retried row by row.
+    """
+    stored = []
+    errors = 0
+    for i in range(0, len(rows), batch_size):
+        batch = rows[i:i + batch_size]
+        try:
+            client.table('company_news').insert(batch).execute()
+            stored.extend(batch)
+        except Exception as e:
+            print(f"    Error inserting batch at offset {i}: {e}")
+            # Try inserting one by one for this batch
+            for single in batch:
+                try:
+                    client.table('company_news').insert(single).execute()
+                    stored.append(single)
+                except Exception as e2:
+                    errors += 1
+                    print(f"      Failed single insert: {single['title'][:40]}... ({e2})")
+    return stored, errors
+
+
+class NewsBatchProcessor:
+    """Downstream stages for one batch of new rows: cluster → analyze → insert → alert.
+
+    Runs in the pipeline's worker thread, one batch at a time; it owns the
+    clusterer, sentiment cache and its own stats (merged by main at the end).
+    Clusters, sentiment results and alert collapsing carry over between
+    batches, so a story split across batches is analyzed and alerted once.
+    """
+
+    SAMPLE_ROWS = 15
+
+    def __init__(self, client, company_map: dict, deduper: NewsDeduper, dry_run: bool,
+                 sentiment: bool = True, workers: int = SENTIMENT_MAX_WORKERS,
+                 lexicon_threshold: int = LEXICON_THRESHOLD):
+        self.client = client
+        self.company_map = company_map
+        self.deduper = deduper
+        self.dry_run = dry_run
+        self.sentiment = sentiment
+        self.workers = workers
+        self.clusterer = None
+        self.source_column = False
+        self.cache = SentimentCache() if sentiment else None
+        self.limiter = AdaptiveConcurrency(workers)
+        # Local pre-classifier in front of the LLM (threshold 0: everything goes to the LLM)
+        self.gate = LexiconGate(lexicon_threshold) if sentiment and lexicon_threshold > 0 else None
+        self.watchlist_ids = None
+        self.highvalue_ids = None
+        self.news_stats = None
+        self.stats = Counter()
+        self.samples = []
+        self.batches = 0
+
+    def _prepare(self) -> None:
+        """Loaded with the first batch: nothing to do in runs without new articles."""
+        self.source_column = _has_sentiment_source(self.client)
+        self.clusterer = NewsClusterer(self.client, alert_threshold=RELEVANCE_ALERT_THRESHOLD,
+                                       source_column=self.source_column)
+        print(f"    Story clustering against {self.clusterer.stats['stored_loaded']} recent articles")
+        if self.gate is not None and not self.source_column:
+            print("    company_news.sentiment_source missing — migration pending, "
+                  "lexicon-only rows stored without sentiment (see news_lexicon.py)")
+        if not self.dry_run:
+            self.news_stats = NewsStatsWriter(self.client)
+            if not self.news_stats.has_table:
+                print("    company_news_stats missing — migration pending, aggregates not updated (see news_stats.py)")
+            elif not self.news_stats.ready:
+                print("    company_news_stats empty — run --rebuild-news-stats once, aggregates not updated until then")
+        if self.sentiment:
+            self.watchlist_ids = get_watchlist_company_ids(self.client)
+            self.highvalue_ids = get_high_value_company_ids(self.client)
+
+    def __call__(self, rows: list) -> None:
+        if self.clusterer is None:
+            self._prepare()
+        started = time.time()
+        self.batches += 1
+        self.stats['rows'] += len(rows)
+
+        self.clusterer.assign(rows)
+        if self.sentiment:
+            run_sentiment_analysis(rows, self.company_map, self.stats, self.clusterer.known, self.cache,
+                                   self.workers, self.limiter,
+                                   self.gate, self.watchlist_ids | self.highvalue_ids)
+            self.clusterer.remember(rows)
+            self.cache.save()
+            if self.gate is not None:
+                self.gate.save()
+
+        if self.dry_run:
+            stored = rows
+        else:
+            # Columns whose migration is still pending
+            pending = [col for col, ok in (('url_hash', self.deduper.has_column),
+                                           ('cluster_id', self.clusterer.has_column)) if not ok]
+            for row in rows:
+                for col in pending:
+                    row.pop(col, None)
+                # Unflagged provisional fields would pass for LLM answers: leave them NULL for the backfill
+                if not self.source_column and row.pop('sentiment_source', None):
+                    for col in ('sentiment', 'catalyst_type', 'relevance'):
+                        row.pop(col, None)
+            stored, errors = insert_news_rows(self.client, rows)
+            self.stats['inserted'] += len(stored)
+            self.stats['insert_errors'] += errors
+            self.deduper.remember_stored(row.get('url_hash') for row in stored)
+            self.news_stats.add(stored)
+
+        alerts_before = self.stats['alerts_created']
+        if self.sentiment:
+            create_news_alerts(
+                stored, self.company_map,
+                self.watchlist_ids, self.highvalue_ids,
+                self.client, self.stats, self.dry_run,
+                alerted_clusters=self.clusterer.alerted,
+            )
+            create_spac_lockup_events_from_news(stored, self.company_map, self.dry_run, self.stats)
+
+        room = self.SAMPLE_ROWS - len(self.samples)
+        if room > 0:
+            self.samples.extend(rows[:room])
+
+        print(f"    Batch {self.batches}: {len(rows)} rows, "
+              f"{'would insert' if self.dry_run else 'inserted'} {len(stored)}, "
+              f"{self.stats['alerts_created'] - alerts_before} alerts "
+              f"({time.time() - started:.1f}s)")
+
+
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
@@ -1050,6 +2207,17 @@ def main():
     parser.add_argument('--rss-only', action='store_true', help='Skip Brave, only use RSS feeds')
     parser.add_argument('--no-sentiment', action='store_true', help='Skip sentiment analysis (faster runs)')
     parser.add_argument('--backfill-sentiment', action='store_true', help='Backfill sentiment on existing articles')
+    parser.add_argument('--batch-job', action='store_true',
+                        help='With --backfill-sentiment: submit an asynchronous batch job, apply finished ones')
+    parser.add_argument('--batch-backend', choices=['anthropic', 'local'], default='anthropic',
+                        help='Batch job backend (local = offline stand-in for testing)')
+    parser.add_argument('--sentiment-workers', type=int, default=SENTIMENT_MAX_WORKERS,
+                        help='Max parallel sentiment API calls (reduced automatically on rate limits)')
+    parser.add_argument('--lexicon-threshold', type=int, default=LEXICON_THRESHOLD,
+                        help='Provisional relevance (1-5) that sends a story to the LLM; '
+                             'watchlist/high-value always go; 0 = no pre-classifier')
+    parser.add_argument('--backfill-url-hash', action='store_true', help='Set url_hash on articles stored before the column existed')
+    parser.add_argument('--rebuild-news-stats', action='store_true', help='Rebuild company_news_stats from company_news')
     args = parser.parse_args()
 
     # Handle backfill mode separately
@@ -1058,10 +2226,25 @@ def main():
         print("  NEWS COLLECTOR — SENTIMENT BACKFILL")
         print(f"  Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print("=" * 70)
-        backfill_sentiment()
+        if args.batch_job:
+            backfill_sentiment_job(args.batch_backend)
+        else:
+            backfill_sentiment(args.sentiment_workers)
         print("\n  Done!")
         return
 
+    if args.backfill_url_hash:
+        print("\n  Backfilling company_news.url_hash...")
+        updated = backfill_url_hashes(supabase_helper.get_client())
+        print(f"\n  Done! {updated} rows hashed")
+        return
+
+    if args.rebuild_news_stats:
+        print("\n  Rebuilding company_news_stats...")
+        written = rebuild_news_stats(supabase_helper.get_client())
+        print(f"\n  Done! {written} companies written")
+        return
+
     dry_run = not args.apply
     start_time = datetime.now()
 
@@ -1101,236 +2284,98 @@ def main():
     # Build company index for matching
     company_index = build_company_index(companies)
 
-    # Load existing URLs for deduplication
+    # URL dedup: hash lookups for this run's candidates only
     client = supabase_helper.get_client()
-    print("\n  Loading existing news URLs for deduplication...")
-    existing_urls = get_existing_urls(client)
-    print(f"  Existing news articles: {len(existing_urls)}")
+    deduper = NewsDeduper(client)
+    print(f"  URL dedup: {'url_hash lookups' if deduper.has_column else 'full URL scan'}, "
+          f"{len(deduper.recent)} recent hashes cached locally")
 
     # Stats
     stats = Counter()
-    news_to_insert = []  # list of dicts ready for DB insert
-
-    # -----------------------------------------------------------------------
-    # Phase 1: RSS Feeds — collect articles and match to companies
-    # -----------------------------------------------------------------------
-    if not args.brave_only:
-        print("\n  Phase 1: RSS Feed Collection")
-        print("  " + "-" * 40)
-
-        rss_articles = fetch_rss_feeds()
-        stats['rss_articles_total'] = len(rss_articles)
-        print(f"\n  Total RSS articles: {len(rss_articles)}")
-
-        print("  Matching articles to companies...")
-        for article in rss_articles:
-            url_normalized = normalize_url(article['url'])
-            if url_normalized in existing_urls:
-                stats['rss_duplicates'] += 1
-                continue
-
-            matched = match_article_to_companies(
-                article['title'], article.get('summary', ''), company_index
-            )
-
-            if matched:
-                for company in matched:
-                    news_to_insert.append({
-                        'company_id': company['id'],
-                        'title': article['title'][:500],
-                        'summary': article.get('summary'),
-                        'url': article['url'][:2000],
-                        'source': article['source'],
-                        'sentiment': None,
-                        'relevance': None,
-                        'industry_match': None,
-                        'published_at': article.get('published_at'),
-                        'fetched_at': datetime.now(timezone.utc).isoformat(),
-                    })
-                    stats['rss_matched'] += 1
-                    # Add to existing URLs to prevent intra-run duplicates
-                    existing_urls.add(url_normalized)
-            else:
-                # No company match — check for industry-level match
-                industries = match_article_to_industries(
-                    article['title'], article.get('summary', '')
-                )
-                if industries:
-                    # Store with company_id=None but industry_match set
-                    for industry in industries:
-                        news_to_insert.append({
-                            'company_id': None,
-                            'title': article['title'][:500],
-                            'summary': article.get('summary'),
-                            'url': article['url'][:2000],
-                            'source': article['source'],
-                            'sentiment': None,
-                            'relevance': None,
-                            'industry_match': industry,
-                            'published_at': article.get('published_at'),
-                            'fetched_at': datetime.now(timezone.utc).isoformat(),
-                        })
-                        stats['industry_matched'] += 1
-                    existing_urls.add(url_normalized)
-                else:
-                    stats['rss_unmatched'] += 1
-
-    # -----------------------------------------------------------------------
-    # Phase 2: Brave Search — prioritized with watchlist, rotation, timeouts
-    # -----------------------------------------------------------------------
-    if not args.rss_only and BRAVE_API_KEY:
-        print("\n  Phase 2: Brave Search (prioritized)")
-        print("  " + "-" * 40)
-
-        # Build prioritized search list
-        print("  Loading watchlist and high-value company IDs...")
-        always_search, rotation_slice = build_brave_search_list(
-            priority_companies, client, args.limit
-        )
-        day_of_year = datetime.now().timetuple().tm_yday
-        group_index = day_of_year % BRAVE_ROTATION_GROUPS
-
-        print(f"  Always-search (watchlist + high-value): {len(always_search)}")
-        print(f"  Rotation group {group_index + 1}/{BRAVE_ROTATION_GROUPS}: {len(rotation_slice)}")
-        total_brave = len(always_search) + len(rotation_slice)
-        print(f"  Total to search this run: {total_brave}")
-
-        # Track rate limit state
-        consecutive_429 = 0
-        brave_stopped_reason = None
-        brave_start_time = time.time()
-        brave_deadline = brave_start_time + BRAVE_MAX_RUNTIME_MINUTES * 60
-
-        # Process both lists in order: always_search first, then rotation
-        all_brave_companies = []
-        for c in always_search:
-            all_brave_companies.append((c, 'priority'))
-        for c in rotation_slice:
-            all_brave_companies.append((c, 'rotation'))
-
-        for i, (company, tier) in enumerate(all_brave_companies):
-            # Check max runtime
-            if time.time() > brave_deadline:
-                brave_stopped_reason = f"max runtime ({BRAVE_MAX_RUNTIME_MINUTES} min)"
-                print(f"\n    STOPPING: {brave_stopped_reason}")
-                break
-
-            # Check consecutive 429 limit
-            if consecutive_429 >= BRAVE_MAX_CONSECUTIVE_429:
-                brave_stopped_reason = f"{BRAVE_MAX_CONSECUTIVE_429} consecutive 429s"
-                print(f"\n    STOPPING: {brave_stopped_reason}")
-                break
-
-            name = (company.get('name') or '').strip()
-            symbol = (company.get('symbol') or '').strip()
-
-            if not name:
-                continue
-
-            articles, was_429 = search_brave_news(name, symbol, consecutive_429)
-
-            if was_429:
-                consecutive_429 += 1
-                stats['brave_429s'] += 1
-                continue
-            else:
-                consecutive_429 = 0  # reset on success
-
-            stats['brave_searches'] += 1
-
-            for article in articles:
-                if not article.get('url'):
-                    continue
-
-                url_normalized = normalize_url(article['url'])
-                if url_normalized in existing_urls:
-                    stats['brave_duplicates'] += 1
-                    continue
-
-                # Parse published_at from Brave's age format (e.g. "2 hours ago")
-                published_at = article.get('published_at')
-                if published_at and not published_at.startswith('20'):
-                    # It's a relative time string, not ISO — set to None
-                    published_at = None
-
-                news_to_insert.append({
-                    'company_id': company['id'],
-                    'title': article['title'][:500],
-                    'summary': article.get('summary'),
-                    'url': article['url'][:2000],
-                    'source': article['source'],
-                    'sentiment': None,
-                    'relevance': None,
-                    'industry_match': None,
-                    'published_at': published_at,
-                    'fetched_at': datetime.now(timezone.utc).isoformat(),
-                })
-                stats['brave_matched'] += 1
-                existing_urls.add(url_normalized)
-
-            # Rate limiting
-            if (i + 1) % BRAVE_BATCH_SIZE == 0:
-                elapsed_min = (time.time() - brave_start_time) / 60
-                print(f"    ... {i + 1}/{total_brave} searched ({tier}), "
-                      f"{stats['brave_searches']} ok / {stats.get('brave_429s', 0)} 429s, "
-                      f"{elapsed_min:.1f} min elapsed, pausing {BRAVE_BATCH_PAUSE}s...")
-                time.sleep(BRAVE_BATCH_PAUSE)
-            else:
-                time.sleep(BRAVE_RATE_LIMIT_DELAY)
-
-            # Progress every 50
-            if (i + 1) % 50 == 0:
-                elapsed_min = (time.time() - brave_start_time) / 60
-                print(f"    ... {i + 1}/{total_brave} searched, "
-                      f"{stats['brave_searches']} ok / {stats.get('brave_429s', 0)} 429s, "
-                      f"{elapsed_min:.1f} min elapsed")
-
-        # Final Brave stats
-        brave_elapsed = (time.time() - brave_start_time) / 60
-        success_rate = (stats['brave_searches'] / max(1, stats['brave_searches'] + stats.get('brave_429s', 0))) * 100
-        print(f"\n  Brave Search completed in {brave_elapsed:.1f} min")
-        print(f"  Success rate: {success_rate:.0f}% ({stats['brave_searches']} ok / {stats.get('brave_429s', 0)} rate-limited)")
-        if brave_stopped_reason:
-            print(f"  Stopped early: {brave_stopped_reason}")
-
-    elif not args.rss_only and not BRAVE_API_KEY:
-        print("\n  Phase 2: SKIPPED (no BRAVE_API_KEY in .env)")
-
-    # -----------------------------------------------------------------------
-    # Phase 3: Sentiment Analysis — analyze new articles before insert
-    # -----------------------------------------------------------------------
+    feed_state = None
+    company_stats = None
     company_map = {c['id']: c.get('name', '?') for c in companies}
 
-    if news_to_insert and not args.no_sentiment:
-        run_sentiment_analysis(news_to_insert, company_map, stats)
-
-    # -----------------------------------------------------------------------
-    # Phase 4: Alert creation for high-relevance news
-    # -----------------------------------------------------------------------
-    if news_to_insert and not args.no_sentiment:
-        # Load watchlist and high-value IDs for alert priority
-        print("\n  Phase 4: Alert Creation (relevance >= 4)")
-        print("  " + "-" * 40)
-        watchlist_ids = get_watchlist_company_ids(client)
-        highvalue_ids = get_high_value_company_ids(client)
-        create_news_alerts(
-            news_to_insert, company_map,
-            watchlist_ids, highvalue_ids,
-            client, stats, dry_run
-        )
+    # New rows stream into batches that are clustered, analyzed, inserted and
+    # alerted on in a worker thread while the next ones are still fetched
+    sentiment = not args.no_sentiment
+    if sentiment and not ANTHROPIC_API_KEY:
+        print("  Sentiment: SKIPPED for uncached stories (no ANTHROPIC_API_KEY in .env)")
+    processor = NewsBatchProcessor(client, company_map, deduper, dry_run, sentiment, args.sentiment_workers,
+                                   args.lexicon_threshold)
+    print(f"  Pipeline: batches of {NEWS_FLUSH_ROWS} rows or {NEWS_FLUSH_SECONDS}s, "
+          f"cluster → {'sentiment → ' if sentiment else ''}{'insert' if not dry_run else 'preview'} → alerts")
+
+    pipeline = BatchPipeline(processor, NEWS_FLUSH_ROWS, NEWS_FLUSH_SECONDS)
+    try:
+        # -------------------------------------------------------------------
+        # Phase 1: RSS Feeds — collect articles and match to companies
+        # -------------------------------------------------------------------
+        if not args.brave_only:
+            print("\n  Phase 1: RSS Feed Collection")
+            print("  " + "-" * 40)
+
+            feed_state = load_feed_state()
+            rss_started = time.time()
+            rss_articles = fetch_rss_feeds(feed_state)
+            stats['rss_articles_total'] = len(rss_articles)
+            stats['rss_not_modified'] = sum(
+                1 for f in RSS_FEEDS if feed_state.get(f['name'], {}).get('stats', {}).get('last_status') == 304
+            )
+            print(f"  RSS fetch took {time.time() - rss_started:.1f}s "
+                  f"({stats['rss_not_modified']}/{len(RSS_FEEDS)} feeds not modified)")
+            print(f"\n  Total RSS articles: {len(rss_articles)}")
+
+            print("  Matching articles to companies...")
+            for rows in collect_rss_rows(rss_articles, deduper, company_index, stats):
+                pipeline.extend(rows)
+            del rss_articles
+
+        # -------------------------------------------------------------------
+        # Phase 2: Brave Search — prioritized with watchlist, rotation, timeouts
+        # -------------------------------------------------------------------
+        if not args.rss_only and BRAVE_API_KEY:
+            print("\n  Phase 2: Brave Search (prioritized)")
+            print("  " + "-" * 40)
+
+            # Build prioritized search list
+            print("  Loading watchlist and high-value company IDs...")
+            company_stats = BraveCompanyStats()
+            always_search, rotation_slice, selection = build_brave_search_list(
+                priority_companies, client, args.limit, company_stats
+            )
 
-    # -----------------------------------------------------------------------
-    # Phase 5: SPAC/Lock-up auto-event creation from catalyst detection
-    # -----------------------------------------------------------------------
-    if news_to_insert and not args.no_sentiment:
-        print("\n  Phase 5: SPAC/Lock-up Event Detection")
-        print("  " + "-" * 40)
-        create_spac_lockup_events_from_news(
-            news_to_insert, company_map, dry_run, stats
-        )
+            print(f"  Always-search (watchlist + high-value): {len(always_search)}")
+            print(f"  By expected yield: {len(rotation_slice)} of budget {selection['budget']} "
+                  f"({selection['due_selected']}/{selection['due']} due for revisit, "
+                  f"{selection['extra_selected']}/{selection['extra_candidates']} extra, "
+                  f"{selection['with_catalyst']} with upcoming catalyst, "
+                  f"{selection['skipped_low_yield']} skipped as low-yield)")
+            total_brave = len(always_search) + len(rotation_slice)
+            print(f"  Total to search this run: {total_brave}")
+
+            plan = plan_brave_queries(always_search, rotation_slice)
+            print(f"  API calls planned: {len(plan)} "
+                  f"({sum(1 for p in plan if len(p['companies']) > 1)} packed OR queries)")
+
+            limiter = RateLimiter(rate=BRAVE_RATE_PER_SECOND, burst=1)
+            for rows in collect_brave_rows(plan, limiter, deduper, company_index, company_stats, stats):
+                pipeline.extend(rows)
+
+        elif not args.rss_only and not BRAVE_API_KEY:
+            print("\n  Phase 2: SKIPPED (no BRAVE_API_KEY in .env)")
+    finally:
+        # Process what was collected, also when a producer failed
+        print(f"\n  Finishing pipeline ({pipeline.stats['rows']} rows collected)...")
+        pipeline.close()
+        stats.update(processor.stats)
+        if not dry_run:
+            deduper.save()
+            if company_stats is not None:
+                company_stats.save()
 
     # -----------------------------------------------------------------------
-    # Summary & Insert
+    # Summary
     # -----------------------------------------------------------------------
     print("\n  " + "=" * 50)
     print("  RESULTS")
@@ -1338,35 +2383,73 @@ def main():
 
     print(f"\n  RSS feeds:")
     print(f"    Articles fetched:    {stats.get('rss_articles_total', 0)}")
+    print(f"    Feeds not modified:  {stats.get('rss_not_modified', 0)}")
     print(f"    Matched to company:  {stats.get('rss_matched', 0)}")
     print(f"    Industry matched:    {stats.get('industry_matched', 0)}")
     print(f"    Unmatched:           {stats.get('rss_unmatched', 0)}")
     print(f"    Duplicates skipped:  {stats.get('rss_duplicates', 0)}")
 
     print(f"\n  Brave Search:")
-    print(f"    Companies searched:  {stats.get('brave_searches', 0)}")
+    print(f"    API calls:           {stats.get('brave_searches', 0)}")
+    print(f"    Companies searched:  {stats.get('brave_companies_searched', 0)}")
+    print(f"    Unattributed:        {stats.get('brave_unattributed', 0)}")
     print(f"    Rate limited (429):  {stats.get('brave_429s', 0)}")
+    print(f"    Errors:              {stats.get('brave_errors', 0)}")
     print(f"    Articles found:      {stats.get('brave_matched', 0)}")
     print(f"    Duplicates skipped:  {stats.get('brave_duplicates', 0)}")
 
+    print(f"\n  URL dedup:")
+    print(f"    Local cache hits:    {deduper.stats['cache_hits']}")
+    print(f"    Hashes queried:      {deduper.stats['queried']} in {deduper.stats['queries']} queries")
+    print(f"    Already stored:      {deduper.stats['found_in_db']}")
+
+    if processor.clusterer is not None:
+        clusters = processor.clusterer.stats
+        print(f"\n  Story clusters:")
+        print(f"    New clusters:        {clusters['clusters']}")
+        print(f"    Joined within run:   {clusters['joined_run']}")
+        print(f"    Joined stored:       {clusters['joined_stored']} "
+              f"({clusters['stored_loaded']} recent articles loaded)")
+
     print(f"\n  Sentiment & Relevance:")
     print(f"    Articles analyzed:   {stats.get('sentiment_analyzed', 0)}")
+    print(f"    Stories sent to LLM: {stats.get('sentiment_stories', 0)}")
+    print(f"    From cache:          {stats.get('sentiment_cached', 0)}")
+    print(f"    From stored cluster: {stats.get('sentiment_from_stored_cluster', 0)}")
+    if processor.gate is not None:
+        gate = processor.gate.stats
+        escalated = sum(gate[f"escalated_{r}"] for r in ('threshold', 'priority', 'audit'))
+        print(f"    Lexicon only:        {stats.get('sentiment_lexicon', 0)} articles "
+              f"({gate['kept_local']} stories kept local, {escalated} escalated: "
+              f"{gate['escalated_threshold']} threshold, {gate['escalated_priority']} priority, "
+              f"{gate['escalated_audit']} audit)")
+        if gate['compared']:
+            print(f"    Lexicon agreement:   {gate['decision_agree'] / gate['compared'] * 100:.0f}% same "
+                  f"escalation decision, {gate['sentiment_agree'] / max(1, gate['sentiment_compared']) * 100:.0f}% "
+                  f"same sentiment ({gate['compared']} rows; details: python3 news_lexicon.py)")
     print(f"    Catalysts detected:  {stats.get('catalyst_detected', 0)}")
     print(f"    Relevance scored:    {stats.get('relevance_scored', 0)}")
     print(f"    High relevance (4+): {stats.get('high_relevance', 0)}")
     print(f"    Alerts created:      {stats.get('alerts_created', 0)}")
+    print(f"    Alerts collapsed:    {stats.get('alerts_collapsed', 0)}")
 
     if stats.get('spac_events_created', 0) > 0 or stats.get('lockup_events_created', 0) > 0:
         print(f"\n  SPAC/Lock-up Events:")
         print(f"    SPAC events created: {stats.get('spac_events_created', 0)}")
         print(f"    Lock-up events:      {stats.get('lockup_events_created', 0)}")
 
-    print(f"\n  Total new articles:    {len(news_to_insert)}")
+    print(f"\n  Pipeline:")
+    print(f"    Batches processed:   {pipeline.stats['batches']}")
+    print(f"    Batches failed:      {pipeline.stats['failed_batches']} ({pipeline.stats['failed_rows']} rows)")
+    print(f"    Producer blocked:    {pipeline.stats['blocked_seconds']:.1f}s (waiting for the worker)")
+
+    total_new = pipeline.stats['rows']
+    print(f"\n  Total new articles:    {total_new}")
 
     # Show sample articles
-    if news_to_insert:
-        print(f"\n  Sample articles (first 15):")
-        for article in news_to_insert[:15]:
+    if processor.samples:
+        print(f"\n  Sample articles (first {len(processor.samples)}):")
+        for article in processor.samples:
             cid = article.get('company_id')
             cname = company_map.get(cid, article.get('industry_match') or '?')[:30]
             title = article['title'][:40]
@@ -1378,37 +2461,27 @@ def main():
             ind_str = f" <{ind}>" if ind else ''
             print(f"    [{article['source'][:15]:15s}] {cname:30s} | {title} ({sent} r:{rel}{cat_str}{ind_str})")
 
-    # Insert into Supabase
-    if not dry_run and news_to_insert:
-        print(f"\n  Inserting {len(news_to_insert)} articles into company_news...")
-        inserted = 0
-        errors = 0
-        batch_size = 50  # insert in batches of 50
-
-        for i in range(0, len(news_to_insert), batch_size):
-            batch = news_to_insert[i:i + batch_size]
-            try:
-                client.table('company_news').insert(batch).execute()
-                inserted += len(batch)
-                if (i + batch_size) % 200 == 0 or i + batch_size >= len(news_to_insert):
-                    print(f"    ... {inserted}/{len(news_to_insert)} inserted")
-            except Exception as e:
-                errors += len(batch)
-                print(f"    Error inserting batch at offset {i}: {e}")
-                # Try inserting one by one for this batch
-                for single in batch:
-                    try:
-                        client.table('company_news').insert(single).execute()
-                        inserted += 1
-                        errors -= 1
-                    except Exception as e2:
-                        print(f"      Failed single insert: {single['title'][:40]}... ({e2})")
-
-        print(f"\n  Inserted: {inserted}")
-        if errors > 0:
-            print(f"  Errors:   {errors}")
-    elif dry_run and news_to_insert:
-        print(f"\n  Run with --apply to insert {len(news_to_insert)} articles into Supabase")
+    if not dry_run and total_new:
+        print(f"\n  Inserted: {stats.get('inserted', 0)}")
+        if processor.news_stats is not None and processor.news_stats.ready:
+            print(f"  News stats: {processor.news_stats.stats['companies_updated']} company updates "
+                  f"in {processor.news_stats.stats['requests']} requests, {processor.news_stats.stats['failed']} failed")
+        if stats.get('insert_errors'):
+            print(f"  Errors:   {stats['insert_errors']}")
+    elif dry_run and total_new:
+        print(f"\n  Run with --apply to insert {total_new} articles into Supabase")
+
+    # Seen entry ids / validators only once the articles are stored
+    if (not dry_run and feed_state is not None and not stats.get('insert_errors')
+            and not pipeline.stats['failed_batches']):
+        save_feed_state(feed_state)
+
+    # Sentiment batch jobs submitted by an earlier --backfill-sentiment --batch-job
+    if not dry_run and ANTHROPIC_API_KEY and BatchJobStore(SENTIMENT_JOBS_FILE).open_jobs('anthropic'):
+        try:
+            poll_sentiment_jobs(client, sentiment_batch_backend('anthropic'))
+        except Exception as e:
+            print(f"  Warning: polling sentiment batch jobs failed: {e}")
 
     # Log to sync_history
     end_time = datetime.now()
@@ -1421,8 +2494,8 @@ def main():
             'start_time': start_time,
             'end_time': end_time,
             'success': True,
-            'updates': len(news_to_insert),
-            'creates': len(news_to_insert),
+            'updates': stats.get('inserted', 0),
+            'creates': stats.get('inserted', 0),
             'db_companies': total_companies,
         })
 
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+URL dedup for company_news — hash lookups instead of loading every URL.
+
+Each article gets url_hash = sha1(normalize_url(url)). Before inserting,
+the collector asks Supabase only for the hashes of this run's candidates
+(in chunks), after checking a local cache of recently stored hashes.
+Startup cost no longer grows with the size of company_news.
+
+Schema (run once in Supabase):
+
+    ALTER TABLE company_news ADD COLUMN IF NOT EXISTS url_hash text;
+    CREATE UNIQUE INDEX IF NOT EXISTS company_news_url_hash_key
+        ON company_news (url_hash, company_id, industry_match) NULLS NOT DISTINCT;
+
+The unique index is per (article, company/industry) because one article
+is stored once for every company or industry it matched. Existing rows
+are hashed with `python3 news_collector.py --backfill-url-hash`.
+
+Until the column exists, NewsDeduper falls back to loading all URLs
+(normalized the same way as candidates).
+"""
+
+import hashlib
+import os
+import re
+from datetime import datetime
+
+import local_store
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+URL_HASH_CACHE_FILE = os.path.join(SCRIPT_DIR, '.news_url_hashes.json')
+
+URL_HASH_CACHE_DAYS = 14  # stored hashes kept locally this long
+URL_HASH_QUERY_CHUNK = 150  # hashes per `url_hash IN (...)` query
+
+
+def normalize_url(url: str) -> str:
+    """Normalize URL for deduplication (lowercase, strip tracking params)."""
+    url = url.strip().lower()
+    # Remove common tracking parameters
+    url = re.sub(r'[?&](utm_\w+|ref|source|fbclid|gclid)=[^&]*', '', url)
+    # Remove trailing ? or &
+    url = url.rstrip('?&')
+    return url
+
+
+def url_hash(url: str) -> str:
+    """Stable dedup key of an article URL."""
+    return hashlib.sha1(normalize_url(url).encode('utf-8')).hexdigest()
+
+
+def has_url_hash_column(client) -> bool:
+    try:
+        client.table('company_news').select('url_hash').limit(1).execute()
+        return True
+    except Exception:
+        return False
+
+
+class NewsDeduper:
+    """Tracks which article URLs are already stored (or taken this run)."""
+
+    def __init__(self, client, cache_path: str = URL_HASH_CACHE_FILE):
+        self.client = client
+        self.cache_path = cache_path
+        self.has_column = has_url_hash_column(client)
+        self.recent = local_store.load_json(cache_path)  # {hash: stored_at}
+        self.seen = set()      # hashes known to exist or claimed this run
+        self.checked = set()   # hashes already looked up in Supabase
+        self.stats = {'cache_hits': 0, 'queried': 0, 'queries': 0, 'found_in_db': 0}
+
+        if not self.has_column:
+            print("  WARNING: company_news.url_hash missing — migration pending, loading all URLs")
+            self.seen = self._load_all_url_hashes()
+        else:
+            cutoff = datetime.now().timestamp() - URL_HASH_CACHE_DAYS * 86400
+            self.recent = {h: ts for h, ts in self.recent.items() if ts > cutoff}
+
+    def _load_all_url_hashes(self) -> set:
+        """Legacy path: page through every stored URL."""
+        existing = set()
+        page_size = 1000
+        offset = 0
+        while True:
+            response = self.client.table('company_news') \
+                .select('url') \
+                .range(offset, offset + page_size - 1) \
+                .execute()
+            batch = response.data
+            for row in batch:
+                if row.get('url'):
+                    existing.add(url_hash(row['url']))
+            if len(batch) < page_size:
+                break
+            offset += page_size
+        return existing
+
+    def prefetch(self, urls) -> None:
+        """Look up the hashes of many candidate URLs with a few chunked queries."""
+        if not self.has_column:
+            return
+        to_query = []
+        for url in urls:
+            h = url_hash(url)
+            if h in self.seen or h in self.checked:
+                continue
+            if h in self.recent:
+                self.seen.add(h)
+                self.stats['cache_hits'] += 1
+                continue
+            self.checked.add(h)
+            to_query.append(h)
+
+        for i in range(0, len(to_query), URL_HASH_QUERY_CHUNK):
+            chunk = to_query[i:i + URL_HASH_QUERY_CHUNK]
+            response = self.client.table('company_news') \
+                .select('url_hash') \
+                .in_('url_hash', chunk) \
+                .execute()
+            self.stats['queries'] += 1
+            self.stats['queried'] += len(chunk)
+            for row in response.data or []:
+                self.seen.add(row['url_hash'])
+                self.stats['found_in_db'] += 1
+
+    def is_duplicate(self, url: str) -> bool:
+        h = url_hash(url)
+        if h not in self.seen and h not in self.checked:
+            self.prefetch([url])
+        return h in self.seen
+
+    def claim(self, url: str) -> str:
+        """Mark a URL as taken by this run, returns its hash."""
+        h = url_hash(url)
+        self.seen.add(h)
+        return h
+
+    def remember_stored(self, hashes) -> None:
+        """Hashes that were inserted successfully go into the local cache."""
+        now = datetime.now().timestamp()
+        for h in hashes:
+            if h:
+                self.recent[h] = now
+
+    def save(self) -> None:
+        if not self.has_column:
+            return
+        try:
+            local_store.save_json(self.cache_path, self.recent)
+        except Exception as e:
+            print(f"  Warning: could not save URL hash cache: {e}")
+
+
+def backfill_url_hashes(client, page_size: int = 1000) -> int:
+    """Set url_hash on rows stored before the column existed. Returns rows updated."""
+    if not has_url_hash_column(client):
+        print("  company_news.url_hash missing — run the migration first (see news_dedup.py)")
+        return 0
+
+    updated = 0
+    while True:
+        # Updated rows drop out of the filter, so always read the first page
+        response = client.table('company_news') \
+            .select('id, url') \
+            .is_('url_hash', 'null') \
+            .limit(page_size) \
+            .execute()
+        rows = response.data or []
+        if not rows:
+            break
+        progressed = 0
+        for row in rows:
+            value = url_hash(row['url']) if row.get('url') else f"nourl:{row['id']}"
+            for attempt_value in (value, f"dup:{row['id']}"):
+                try:
+                    client.table('company_news').update({'url_hash': attempt_value}).eq('id', row['id']).execute()
+                    updated += 1
+                    progressed += 1
+                    break
+                except Exception as e:
+                    # Same article + company already hashed: keep the row, mark it as duplicate
+                    print(f"    Could not hash {row['id']} as {attempt_value[:12]}: {str(e)[:80]}")
+        print(f"    ... {updated} rows hashed")
+        if not progressed:
+            break
+    return updated
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Lexicon pre-classifier for company_news — decides which stories are worth
+an LLM call.
+
+Market wrap-ups and passing mentions end up with relevance 1-2 after a
+Claude call. LexiconClassifier scores a story locally from keyword lists
+(catalyst terms, positive/negative words, market-noise phrases) and the
+source, all compiled once into one Aho-Corasick automaton. It gives a
+provisional sentiment, catalyst type and relevance:
+
+  relevance = 1
+            + 1.5 if the company name (legal suffix stripped) is a whole word in the title
+            + catalyst level (earnings/funding/... in the title, less in the summary)
+            - 1.5 for market-noise phrases ("stocks to watch", "market wrap", ...)
+            + source weight (press wires/Brave company search up, tech blogs down)
+  clamped to 1-5
+
+LexiconGate sends a story to the LLM if its provisional relevance reaches
+the threshold (--lexicon-threshold, default LEXICON_THRESHOLD), if it is
+about a watchlist/high-value company, or as part of a small audit sample
+(AUDIT_SHARE of the rest, picked by URL hash). Other stories keep the
+provisional fields, stored with sentiment_source = 'lexicon': they are not
+reused for later members of their cluster, and --backfill-sentiment sends
+them to the LLM like rows without sentiment. An LLM answer clears the flag.
+
+Schema (run once in Supabase):
+
+    ALTER TABLE company_news ADD COLUMN IF NOT EXISTS sentiment_source text;
+    CREATE INDEX IF NOT EXISTS company_news_sentiment_source_idx
+        ON company_news (sentiment_source) WHERE sentiment_source IS NOT NULL;
+
+Until the column exists, lexicon-only rows are stored without sentiment
+(NULL), so the backfill still reaches them.
+
+For every escalated row the provisional and the LLM answer are compared
+and counted per day in .news_lexicon_stats.json (relevance pairs and
+sentiment agreement). `python3 news_lexicon.py` prints the agreement and,
+per possible threshold, how many rows would have gone to the LLM and how
+many LLM-relevant rows (>= 3) would have been kept local:
+
+  {
+    "2026-04-16": {
+      "pairs": {"2:1": 14, "4:4": 9, ...},          # "lexicon:llm" relevance
+      "audit_pairs": {"1:1": 3, "2:3": 1},          # audit sample only (unbiased for low scores)
+      "sentiment_total": 40, "sentiment_agree": 29
+    }
+  }
+"""
+
+import argparse
+import os
+import zlib
+from collections import Counter
+from datetime import date, timedelta
+
+import local_store
+from aho_corasick import AhoCorasick
+from company_names import normalize_company_name
+from news_clusters import company_key
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATS_FILE = os.path.join(SCRIPT_DIR, '.news_lexicon_stats.json')
+STATS_DAYS = 60
+
+LEXICON_THRESHOLD = 3   # provisional relevance that sends a story to the LLM
+AUDIT_SHARE = 0.05      # share of the other stories escalated anyway, to measure misses
+LLM_RELEVANT = 3        # LLM relevance counted as "should have been escalated" in reports
+
+# Terms ending in '*' also match longer words (acquire* → acquires, acquired)
+CATALYST_TERMS = {
+    'acquisition': ['acquire*', 'acquisition*', 'merger*', 'takeover*', 'buyout*', 'to buy', 'agrees to buy'],
+    'ipo': ['ipo', 'ipos', 'initial public offering', 'go public', 'goes public', 'going public',
+            'prices offering', 'direct listing'],
+    'fda': ['fda', 'clinical trial*', 'phase 3', 'phase iii', 'breakthrough designation'],
+    'spac': ['spac', 'spacs', 'blank check', 'business combination', 'de-spac'],
+    'lockup': ['lock-up*', 'lockup*'],
+    'funding': ['raises', 'raised', 'funding round', 'series a', 'series b', 'series c', 'series d',
+                'series e', 'seed round', 'valuation', 'valued at', 'investment from'],
+    'earnings': ['earnings', 'quarterly results', 'revenue', 'guidance', 'eps', 'q1', 'q2', 'q3', 'q4',
+                 'fiscal year', 'profit warning'],
+    'partnership': ['partnership*', 'partners with', 'teams up', 'collaborat*', 'strategic alliance',
+                    'signs deal', 'contract with', 'awarded contract'],
+    'leadership': ['ceo', 'cfo', 'chief executive', 'appoint*', 'steps down', 'resign*', 'names new'],
+    'regulatory': ['sec', 'lawsuit*', 'antitrust', 'regulator*', 'investigation', 'probe', 'sued', 'ban'],
+    'product_launch': ['launch*', 'unveil*', 'introduc*', 'rolls out', 'releases new'],
+}
+
+# Added to the provisional relevance by a catalyst term in the title (one less in the summary)
+CATALYST_LEVEL = {
+    'acquisition': 3, 'ipo': 3, 'fda': 3, 'spac': 3,
+    'funding': 2, 'earnings': 2, 'lockup': 2, 'partnership': 2, 'leadership': 2,
+    'regulatory': 1, 'product_launch': 1,
+}
+
+POSITIVE_TERMS = [
+    'beat', 'beats', 'surge*', 'soar*', 'jump*', 'rall*', 'record', 'upgrade*', 'outperform*', 'win', 'wins', 'won',
+    'approv*', 'growth', 'grow*', 'profit', 'profitable', 'strong', 'expand*', 'gain*', 'boost*',
+    'raises', 'raised', 'tops', 'exceed*', 'breakthrough', 'milestone',
+]
+NEGATIVE_TERMS = [
+    'miss', 'misses', 'missed', 'plunge*', 'fall*', 'fell', 'drop*', 'slump*', 'sink*', 'sank', 'tumble*', 'downgrade*',
+    'lawsuit*', 'sued', 'layoff*', 'lay off', 'cuts', 'job cuts', 'loss', 'losses', 'recall*', 'probe',
+    'investigation', 'bankrupt*', 'delay*', 'decline*', 'warns', 'warning', 'warned', 'fraud', 'resign*', 'halt*', 'weak',
+    'default*', 'short seller',
+]
+NOISE_TERMS = [
+    'stocks to watch', 'stock market today', 'market wrap', 'markets wrap', 'premarket', 'pre-market',
+    'biggest movers', 'top movers', 'top gainers', 'top losers', 'week ahead', 'morning brief',
+    'stocks making the biggest moves', 'what to watch', 'roundup', 'round-up', 'dow jones',
+    's&p 500', 'nasdaq composite', 'etf', 'best stocks', 'stocks to buy', 'top stocks',
+    'newsletter', 'podcast', 'weekly recap', 'daily recap', 'live updates',
+]
+
+# Added to the provisional relevance; prefixes of company_news.source
+SOURCE_WEIGHTS = {
+    'PR Newswire': 0.5,
+    'GlobeNewsWire': 0.5,
+    'Brave Search': 0.5,     # company-specific search
+    'Reuters': 0.25,
+    'Bloomberg Markets': 0.25,
+    'Financial Times': 0.25,
+    'TechCrunch': 0.25,
+    'Seeking Alpha': -0.25,
+    'Yahoo Finance': -0.25,
+    'MarketWatch': -0.25,
+    'The Verge': -0.5,
+    'Ars Technica': -0.5,
+    'VentureBeat': -0.25,
+    'Hacker News': -0.5,
+}
+
+TITLE_MENTION_BONUS = 1.5
+NOISE_PENALTY = 1.5
+
+LEXICON_SOURCE = 'lexicon'  # company_news.sentiment_source of provisional rows
+
+
+def has_sentiment_source_column(client) -> bool:
+    try:
+        client.table('company_news').select('sentiment_source').limit(1).execute()
+        return True
+    except Exception:
+        return False
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == '_'
+
+
+def _bounded(text: str, start: int, end: int, prefix: bool) -> bool:
+    """Word boundary before start and (unless prefix) after end."""
+    if start > 0 and _is_word_char(text[start - 1]):
+        return False
+    return prefix or end >= len(text) or not _is_word_char(text[end])
+
+
+def mentioned_in(title: str, name: str) -> bool:
+    """Company name without legal suffix ("Apple Inc." → "apple") as whole words in the title."""
+    name = normalize_company_name(name) if name else ''
+    if not name:
+        return False
+    text = (title or '').lower()
+    start = text.find(name)
+    while start >= 0:
+        if _bounded(text, start, start + len(name), prefix=False):
+            return True
+        start = text.find(name, start + 1)
+    return False
+
+
+class LexiconClassifier:
+    """Keyword scorer; the automaton is built once and shared by all calls."""
+
+    def __init__(self, source_weights: dict = None):
+        self.source_weights = SOURCE_WEIGHTS if source_weights is None else source_weights
+        self._matcher = AhoCorasick()
+        for catalyst, terms in CATALYST_TERMS.items():
+            for term in terms:
+                self._add(term, ('catalyst', catalyst))
+        for term in POSITIVE_TERMS:
+            self._add(term, ('positive', None))
+        for term in NEGATIVE_TERMS:
+            self._add(term, ('negative', None))
+        for term in NOISE_TERMS:
+            self._add(term, ('noise', None))
+        self._matcher.build()
+
+    def _add(self, term: str, value: tuple) -> None:
+        prefix = term.endswith('*')
+        self._matcher.add(term.rstrip('*'), value + (prefix,))
+
+    def _hits(self, text: str) -> list:
+        text = (text or '').lower()
+        return [(kind, label) for start, end, (kind, label, prefix) in self._matcher.iter(text)
+                if _bounded(text, start, end, prefix)]
+
+    def _source_weight(self, source: str) -> float:
+        for prefix, weight in self.source_weights.items():
+            if (source or '').startswith(prefix):
+                return weight
+        return 0.0
+
+    def classify(self, title: str, summary: str = None, source: str = None) -> dict:
+        """Story-level provisional fields (relevance without a company mention)."""
+        title_hits = self._hits(title)
+        summary_hits = self._hits(summary)
+
+        level = 0
+        catalyst = None
+        for hits, bonus in ((title_hits, 0), (summary_hits, -1)):
+            for kind, label in hits:
+                if kind == 'catalyst' and CATALYST_LEVEL[label] + bonus > level:
+                    level = CATALYST_LEVEL[label] + bonus
+                    catalyst = label
+
+        # Title words count double for the sentiment
+        tone = Counter()
+        for hits, weight in ((title_hits, 2), (summary_hits, 1)):
+            for kind, _ in hits:
+                tone[kind] += weight
+        if tone['positive'] > tone['negative']:
+            sentiment = 'positive'
+        elif tone['negative'] > tone['positive']:
+            sentiment = 'negative'
+        else:
+            sentiment = 'neutral'
+
+        score = 1 + level + self._source_weight(source)
+        if tone['noise']:
+            score -= NOISE_PENALTY
+        return {
+            'sentiment': sentiment,
+            'catalyst_type': catalyst,
+            'score': score,
+            'noise': bool(tone['noise']),
+        }
+
+    @staticmethod
+    def relevance(story: dict, mentioned_in_title: bool) -> int:
+        """Provisional 1-5 relevance of the story for one company."""
+        score = story['score'] + (TITLE_MENTION_BONUS if mentioned_in_title else 0)
+        return max(1, min(5, int(score + 0.5)))
+
+
+class LexiconGate:
+    """Decides per story: LLM call or provisional fields. Records agreement."""
+
+    def __init__(self, threshold: int = LEXICON_THRESHOLD, audit_share: float = AUDIT_SHARE,
+                 stats_path: str = STATS_FILE, classifier: LexiconClassifier = None):
+        self.threshold = threshold
+        self.audit_share = audit_share
+        self.stats_path = stats_path
+        self.classifier = classifier or LexiconClassifier()
+        self.stats = Counter()
+        self._today = {}
+
+    def triage(self, members: list, names: dict, priority_ids: set = None) -> tuple:
+        """(reason or None, {company_key: provisional row fields}) for one story.
+
+        members are the company_news rows of the story, names {company_key:
+        name}. reason is 'threshold', 'priority' or 'audit' when the story
+        should go to the LLM, None when the provisional fields are kept.
+        """
+        article = members[0]
+        story = self.classifier.classify(article.get('title'), article.get('summary'), article.get('source'))
+        provisional = {}
+        for member in members:
+            key = company_key(member)
+            fields = {
+                'sentiment': story['sentiment'],
+                'relevance': self.classifier.relevance(story, mentioned_in(article.get('title'), names.get(key))),
+            }
+            if story['catalyst_type']:
+                fields['catalyst_type'] = story['catalyst_type']
+            provisional[key] = fields
+
+        top = max(f['relevance'] for f in provisional.values())
+        if top >= self.threshold:
+            reason = 'threshold'
+        elif priority_ids and any(m.get('company_id') in priority_ids for m in members):
+            reason = 'priority'
+        elif self._audit(article.get('url_hash') or article.get('url') or ''):
+            reason = 'audit'
+        else:
+            reason = None
+        self.stats[f"escalated_{reason}" if reason else 'kept_local'] += 1
+        return reason, provisional
+
+    def _audit(self, key: str) -> bool:
+        # Stable per article, so a re-run picks the same sample
+        return (zlib.crc32(key.encode('utf-8')) % 10000) < self.audit_share * 10000 if key else False
+
+    def compare(self, provisional: dict, llm_fields: dict, reason: str = None) -> None:
+        """Count one row's provisional fields against the LLM's answer."""
+        day = self._today
+        if llm_fields.get('relevance') is not None:
+            pair = f"{provisional['relevance']}:{llm_fields['relevance']}"
+            for bucket in ('pairs', 'audit_pairs') if reason == 'audit' else ('pairs',):
+                day.setdefault(bucket, {})
+                day[bucket][pair] = day[bucket].get(pair, 0) + 1
+            self.stats['compared'] += 1
+            if (provisional['relevance'] >= self.threshold) == (llm_fields['relevance'] >= self.threshold):
+                self.stats['decision_agree'] += 1
+        if llm_fields.get('sentiment'):
+            day['sentiment_total'] = day.get('sentiment_total', 0) + 1
+            if llm_fields['sentiment'] == provisional['sentiment']:
+                day['sentiment_agree'] = day.get('sentiment_agree', 0) + 1
+                self.stats['sentiment_agree'] += 1
+            self.stats['sentiment_compared'] += 1
+
+    def save(self) -> None:
+        """Add this run's counts to today's entry (locked merge), drop old days."""
+        if not self._today:
+            return
+        try:
+            with local_store.file_lock(self.stats_path):
+                state = local_store.load_json(self.stats_path)
+                entry = state.setdefault(date.today().isoformat(), {})
+                for key, value in self._today.items():
+                    if isinstance(value, dict):
+                        bucket = entry.setdefault(key, {})
+                        for pair, count in value.items():
+                            bucket[pair] = bucket.get(pair, 0) + count
+                    else:
+                        entry[key] = entry.get(key, 0) + value
+                cutoff = (date.today() - timedelta(days=STATS_DAYS)).isoformat()
+                state = {day: e for day, e in state.items() if day >= cutoff}
+                local_store.save_json(self.stats_path, state)
+            self._today = {}
+        except Exception as e:
+            print(f"  Warning: could not save lexicon stats: {e}")
+
+
+def agreement_report(state: dict, days: int = 30) -> dict:
+    """Agreement of the last `days` days and the effect of each threshold.
+
+    thresholds: {t: (share of compared rows at or above t, share of
+    LLM-relevant rows below t)}, from all pairs and from the audit sample.
+    """
+    cutoff = (date.today() - timedelta(days=days)).isoformat()
+    pairs = Counter()
+    audit = Counter()
+    sentiment_total = sentiment_agree = 0
+    for day, entry in state.items():
+        if day < cutoff:
+            continue
+        for pair, count in entry.get('pairs', {}).items():
+            pairs[tuple(int(v) for v in pair.split(':'))] += count
+        for pair, count in entry.get('audit_pairs', {}).items():
+            audit[tuple(int(v) for v in pair.split(':'))] += count
+        sentiment_total += entry.get('sentiment_total', 0)
+        sentiment_agree += entry.get('sentiment_agree', 0)
+
+    def effect(counts: Counter, t: int) -> tuple:
+        total = sum(counts.values())
+        relevant = sum(c for (_, llm), c in counts.items() if llm >= LLM_RELEVANT)
+        escalated = sum(c for (lex, _), c in counts.items() if lex >= t)
+        missed = sum(c for (lex, llm), c in counts.items() if lex < t and llm >= LLM_RELEVANT)
+        return (escalated / total if total else None, missed / relevant if relevant else None)
+
+    total = sum(pairs.values())
+    return {
+        'compared': total,
+        'audit_compared': sum(audit.values()),
+        'exact': sum(c for (lex, llm), c in pairs.items() if lex == llm) / total if total else None,
+        'within_one': sum(c for (lex, llm), c in pairs.items() if abs(lex - llm) <= 1) / total if total else None,
+        'sentiment': sentiment_agree / sentiment_total if sentiment_total else None,
+        'thresholds': {t: effect(pairs, t) for t in range(2, 6)},
+        'audit_thresholds': {t: effect(audit, t) for t in range(2, 6)},
+    }
+
+
+def _pct(value) -> str:
+    return f"{value * 100:5.1f}%" if value is not None else "    -"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lexicon pre-classifier agreement with the LLM')
+    parser.add_argument('--days', type=int, default=30, help='Days of stats to include')
+    args = parser.parse_args()
+
+    report = agreement_report(local_store.load_json(STATS_FILE), args.days)
+    print(f"\n  Lexicon vs. LLM, last {args.days} days")
+    print(f"  Rows compared:         {report['compared']} ({report['audit_compared']} from the audit sample)")
+    print(f"  Relevance exact:       {_pct(report['exact'])}")
+    print(f"  Relevance within 1:    {_pct(report['within_one'])}")
+    print(f"  Sentiment agreement:   {_pct(report['sentiment'])}")
+    print(f"\n  Threshold   sent to LLM   LLM-relevant kept local   (audit sample)")
+    for t in range(2, 6):
+        sent, missed = report['thresholds'][t]
+        _, audit_missed = report['audit_thresholds'][t]
+        marker = '  <- current default' if t == LEXICON_THRESHOLD else ''
+        print(f"  {t:9d}   {_pct(sent):>11s}   {_pct(missed):>23s}   {_pct(audit_missed):>14s}{marker}")
+
+
+if __name__ == '__main__':
+    main()
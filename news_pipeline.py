@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Streaming stages for news_collector — persist while still fetching.
+
+The producers (RSS, Brave) run in the main thread as generators: fetch →
+dedup → match, yielding new company_news rows as they come in. The rows
+go into a BatchPipeline, which cuts them into batches of flush_rows (or
+whatever arrived within flush_seconds) and hands each batch over a
+bounded queue to one worker thread running the downstream stages
+(cluster → analyze → insert → alert):
+
+    fetch → dedup → match          main thread
+          │ extend(rows)
+          ▼
+    [open batch] ──Queue(max_pending_batches)──▶ worker: process(batch)
+
+If the worker falls behind, extend() blocks once max_pending_batches are
+waiting, so at most (max_pending_batches + 2) × flush_rows rows are held
+in memory however long the run takes. A crash late in the run only loses
+the batches not yet processed. A failing batch is reported and counted,
+it does not stop the run.
+
+    with BatchPipeline(process) as pipeline:
+        for rows in producer():
+            pipeline.extend(rows)
+    # leaving the block flushes the open batch and waits for the worker
+"""
+
+import queue
+import threading
+import time
+
+FLUSH_ROWS = 200
+FLUSH_SECONDS = 120
+MAX_PENDING_BATCHES = 2
+
+
+class BatchPipeline:
+    def __init__(self, process, flush_rows: int = FLUSH_ROWS, flush_seconds: float = FLUSH_SECONDS,
+                 max_pending_batches: int = MAX_PENDING_BATCHES):
+        """process(rows) runs in the worker thread, one batch at a time."""
+        self.process = process
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self._queue = queue.Queue(maxsize=max_pending_batches)
+        self._open = []
+        self._opened_at = time.monotonic()
+        self._closed = False
+        self.stats = {'rows': 0, 'batches': 0, 'failed_batches': 0, 'failed_rows': 0,
+                      'blocked_seconds': 0.0}
+        self._worker = threading.Thread(target=self._run, name='news-pipeline', daemon=True)
+        self._worker.start()
+
+    def extend(self, rows) -> None:
+        """Add rows (may be empty: still flushes an open batch that is due)."""
+        for row in rows:
+            self._open.append(row)
+            self.stats['rows'] += 1
+            if len(self._open) >= self.flush_rows:
+                self.flush()
+        if self._open and time.monotonic() - self._opened_at >= self.flush_seconds:
+            self.flush()
+
+    def flush(self) -> None:
+        """Hand the open batch to the worker (blocks while the queue is full)."""
+        if self._open:
+            batch, self._open = self._open, []
+            started = time.monotonic()
+            self._queue.put(batch)
+            self.stats['blocked_seconds'] += time.monotonic() - started
+        self._opened_at = time.monotonic()
+
+    def close(self) -> None:
+        """Flush the open batch and wait until the worker has processed everything."""
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        self._queue.put(None)
+        self._worker.join()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            try:
+                self.process(batch)
+                self.stats['batches'] += 1
+            except Exception as e:
+                self.stats['failed_batches'] += 1
+                self.stats['failed_rows'] += len(batch)
+                print(f"    Error processing batch of {len(batch)} rows: {type(e).__name__}: {e}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Also on errors/Ctrl-C in the producers: keep what was collected so far
+        self.close()
+        return False
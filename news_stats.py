@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Per-company news aggregates (company_news_stats), maintained by the collector.
+
+scoring_engine and alert_generator only need counts by sentiment and the
+date of the latest article per company. They read this table (one small
+row per company) instead of scanning company_news; thesis_checker uses it
+to skip companies without an article in the last 24h.
+
+Each row keeps per-day buckets of the last STATS_DAYS days, so rolling
+windows are computed at read time and are correct on any day, also for
+companies without new articles:
+
+    daily = {"2026-04-16": {"positive": 2, "neutral": 1, "unknown": 1, "max_relevance": 4}, ...}
+
+Rows with only provisional lexicon fields (sentiment_source = 'lexicon',
+news_lexicon.py) count as unknown until the LLM backfill refreshes them.
+
+A row's day is the UTC date of published_at, or of fetched_at for
+articles without one (most Brave results). rollup() turns a row into
+news_1d/7d/30d, positive_/negative_/neutral_{1,7,30}d and
+max_relevance_{1,7,30}d; last_published_at is the newest article ever.
+The readers' company_news fallbacks (stats_from_news,
+companies_with_news_in_company_news) use the same rule, so results do not
+depend on whether the migration is applied.
+
+news_collector adds every inserted batch (NewsStatsWriter.add) and
+recomputes the companies whose sentiment a backfill changed
+(NewsStatsWriter.refresh). `python3 news_collector.py --rebuild-news-stats`
+builds the table from company_news.
+
+Migration (once, both steps):
+
+  1. Create the table in Supabase:
+
+    CREATE TABLE IF NOT EXISTS company_news_stats (
+        company_id uuid PRIMARY KEY REFERENCES companies(id) ON DELETE CASCADE,
+        daily jsonb NOT NULL DEFAULT '{}'::jsonb,
+        last_published_at timestamptz,
+        updated_at timestamptz NOT NULL DEFAULT now()
+    );
+    CREATE INDEX IF NOT EXISTS company_news_stats_last_published_idx
+        ON company_news_stats (last_published_at);
+
+  2. Fill it (while no collector run is in progress):
+
+    python3 news_collector.py --rebuild-news-stats
+
+The table counts as ready once it holds a row, i.e. after the rebuild.
+Until then the writer does nothing and the readers fall back to querying
+company_news, so an empty new table never reads as "no news anywhere".
+"""
+
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+from news_lexicon import has_sentiment_source_column
+
+STATS_TABLE = 'company_news_stats'
+STATS_DAYS = 30
+WINDOWS = (1, 7, 30)
+SENTIMENTS = ('positive', 'negative', 'neutral')
+UPSERT_CHUNK = 200
+ID_CHUNK = 100
+
+_source_column = None  # company_news.sentiment_source exists; None = not checked yet
+
+
+def has_stats_table(client) -> bool:
+    try:
+        client.table(STATS_TABLE).select('company_id').limit(1).execute()
+        return True
+    except Exception:
+        return False
+
+
+def stats_ready(client) -> bool:
+    """Table exists and was filled by --rebuild-news-stats (it holds a row)."""
+    try:
+        return bool(client.table(STATS_TABLE).select('company_id').limit(1).execute().data)
+    except Exception:
+        return False
+
+
+def _parse_ts(value) -> datetime | None:
+    if not value:
+        return None
+    try:
+        ts = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def news_timestamp(row: dict) -> datetime | None:
+    """When an article counts: published_at, else fetched_at (never in the future of fetched_at)."""
+    published = _parse_ts(row.get('published_at'))
+    fetched = _parse_ts(row.get('fetched_at'))
+    if published and fetched and published > fetched:
+        return fetched
+    return published or fetched
+
+
+def _add_to_bucket(bucket: dict, row: dict) -> None:
+    # Provisional lexicon sentiment (news_lexicon.py) is no analysis: counted as unknown
+    sentiment = row.get('sentiment') if row.get('sentiment') in SENTIMENTS and not row.get('sentiment_source') \
+        else 'unknown'
+    bucket[sentiment] = bucket.get(sentiment, 0) + 1
+    relevance = row.get('relevance')
+    if relevance and relevance > bucket.get('max_relevance', 0):
+        bucket['max_relevance'] = relevance
+
+
+def _merge_bucket(bucket: dict, other: dict) -> None:
+    for key, value in other.items():
+        if key == 'max_relevance':
+            bucket[key] = max(bucket.get(key, 0), value)
+        else:
+            bucket[key] = bucket.get(key, 0) + value
+
+
+def _prune(daily: dict, today: date) -> dict:
+    cutoff = (today - timedelta(days=STATS_DAYS - 1)).isoformat()
+    return {day: bucket for day, bucket in daily.items() if day >= cutoff}
+
+
+def rollup(stats_row: dict | None, today: date = None) -> dict:
+    """Rolling counts of one company_news_stats row.
+
+    The N-day window is today (UTC) and the N-1 days before it.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    result = {'last_published_at': (stats_row or {}).get('last_published_at')}
+    daily = (stats_row or {}).get('daily') or {}
+    for days in WINDOWS:
+        cutoff = (today - timedelta(days=days - 1)).isoformat()
+        counts = Counter()
+        max_relevance = 0
+        for day, bucket in daily.items():
+            if cutoff <= day <= today.isoformat():
+                for key, value in bucket.items():
+                    if key == 'max_relevance':
+                        max_relevance = max(max_relevance, value)
+                    else:
+                        counts[key] += value
+        result[f"news_{days}d"] = sum(counts.values())
+        for sentiment in SENTIMENTS:
+            result[f"{sentiment}_{days}d"] = counts[sentiment]
+        result[f"max_relevance_{days}d"] = max_relevance or None
+    return result
+
+
+def load_news_stats(client, company_ids=None) -> dict:
+    """{company_id: company_news_stats row}, all rows or those of company_ids."""
+    fields = 'company_id, daily, last_published_at'
+    stats = {}
+    if company_ids is not None:
+        ids = list(company_ids)
+        for i in range(0, len(ids), ID_CHUNK):
+            response = client.table(STATS_TABLE).select(fields).in_('company_id', ids[i:i + ID_CHUNK]).execute()
+            for row in response.data or []:
+                stats[row['company_id']] = row
+        return stats
+
+    page_size = 1000
+    offset = 0
+    while True:
+        response = client.table(STATS_TABLE).select(fields) \
+            .order('company_id') \
+            .range(offset, offset + page_size - 1) \
+            .execute()
+        batch = response.data or []
+        for row in batch:
+            stats[row['company_id']] = row
+        if len(batch) < page_size:
+            break
+        offset += page_size
+    return stats
+
+
+def _window_start(today: date) -> str:
+    """fetched_at bound that covers every row of the STATS_DAYS window.
+
+    news_timestamp() is never later than fetched_at, so rows fetched
+    before the window's first day cannot count in it.
+    """
+    return datetime.combine(today - timedelta(days=STATS_DAYS - 1), datetime.min.time(),
+                            tzinfo=timezone.utc).isoformat()
+
+
+def _buckets_by_company(rows, today: date) -> tuple:
+    """({company_id: {day: bucket}}, {company_id: newest timestamp}) of company_news rows."""
+    cutoff = (today - timedelta(days=STATS_DAYS - 1)).isoformat()
+    daily = {}
+    newest = {}
+    for row in rows:
+        cid = row.get('company_id')
+        ts = news_timestamp(row)
+        if not cid or ts is None:
+            continue
+        if cid not in newest or ts > newest[cid]:
+            newest[cid] = ts
+        day = ts.date().isoformat()
+        if day >= cutoff:
+            _add_to_bucket(daily.setdefault(cid, {}).setdefault(day, {}), row)
+    return daily, newest
+
+
+class NewsStatsWriter:
+    """Keeps company_news_stats in step with inserted/updated company_news rows."""
+
+    def __init__(self, client):
+        self.client = client
+        self.has_table = has_stats_table(client)
+        # Before the rebuild, partial rows would make the readers trust an incomplete table
+        self.ready = self.has_table and stats_ready(client)
+        self.stats = {'companies_updated': 0, 'requests': 0, 'failed': 0}
+
+    def add(self, rows: list) -> None:
+        """Count newly inserted rows into their companies' stats."""
+        if not self.ready:
+            return
+        today = datetime.now(timezone.utc).date()
+        daily, newest = _buckets_by_company(rows, today)
+        if not newest:
+            return
+        existing = self._load(newest.keys())
+        if existing is None:
+            return
+
+        updates = []
+        for cid, ts in newest.items():
+            row = existing.get(cid) or {}
+            merged = dict(row.get('daily') or {})
+            for day, bucket in daily.get(cid, {}).items():
+                merged[day] = dict(merged.get(day) or {})
+                _merge_bucket(merged[day], bucket)
+            last = _parse_ts(row.get('last_published_at'))
+            updates.append(self._row(cid, _prune(merged, today), max(filter(None, (last, ts)))))
+        self._upsert(updates)
+
+    def refresh(self, company_ids) -> None:
+        """Recompute the day buckets of these companies from company_news (after sentiment updates)."""
+        if not self.ready:
+            return
+        ids = [cid for cid in set(company_ids) if cid]
+        if not ids:
+            return
+        today = datetime.now(timezone.utc).date()
+        cutoff = _window_start(today)
+        rows = []
+        try:
+            for i in range(0, len(ids), ID_CHUNK):
+                rows.extend(_scan_news(self.client, company_ids=ids[i:i + ID_CHUNK], fetched_since=cutoff))
+        except Exception as e:
+            print(f"  Warning: could not refresh news stats: {e}")
+            self.stats['failed'] += len(ids)
+            return
+        daily, newest = _buckets_by_company(rows, today)
+        existing = self._load(ids)
+        if existing is None:
+            return
+
+        updates = []
+        for cid in ids:
+            last = _parse_ts((existing.get(cid) or {}).get('last_published_at'))
+            candidates = [ts for ts in (last, newest.get(cid)) if ts]
+            updates.append(self._row(cid, daily.get(cid, {}), max(candidates) if candidates else None))
+        self._upsert(updates)
+
+    def _load(self, company_ids) -> dict | None:
+        try:
+            return load_news_stats(self.client, company_ids)
+        except Exception as e:
+            print(f"  Warning: could not load news stats: {e}")
+            self.stats['failed'] += len(list(company_ids))
+            return None
+
+    @staticmethod
+    def _row(company_id: str, daily: dict, last: datetime | None) -> dict:
+        return {
+            'company_id': company_id,
+            'daily': daily,
+            'last_published_at': last.isoformat() if last else None,
+            'updated_at': datetime.now(timezone.utc).isoformat(),
+        }
+
+    def _upsert(self, rows: list) -> None:
+        for i in range(0, len(rows), UPSERT_CHUNK):
+            chunk = rows[i:i + UPSERT_CHUNK]
+            self.stats['requests'] += 1
+            try:
+                self.client.table(STATS_TABLE).upsert(chunk, on_conflict='company_id').execute()
+                self.stats['companies_updated'] += len(chunk)
+            except Exception as e:
+                print(f"  Warning: could not write news stats for {len(chunk)} companies: {e}")
+                self.stats['failed'] += len(chunk)
+
+
+def _scan_news(client, company_ids: list = None, fetched_since: str = None):
+    """Yield the company_news fields the stats need, page by page."""
+    global _source_column
+    if _source_column is None:
+        _source_column = has_sentiment_source_column(client)
+    fields = 'company_id, sentiment, relevance, published_at, fetched_at'
+    if _source_column:
+        fields += ', sentiment_source'
+    page_size = 1000
+    offset = 0
+    while True:
+        query = client.table('company_news') \
+            .select(fields) \
+            .not_.is_('company_id', 'null')
+        if company_ids is not None:
+            query = query.in_('company_id', company_ids)
+        if fetched_since:
+            query = query.gte('fetched_at', fetched_since)
+        batch = query.order('id').range(offset, offset + page_size - 1).execute().data or []
+        yield from batch
+        if len(batch) < page_size:
+            break
+        offset += page_size
+
+
+def stats_from_news(client) -> dict:
+    """{company_id: company_news_stats row} counted directly from company_news.
+
+    Fallback for readers while the table is not ready: same day rule
+    (news_timestamp) and window as the table, so rollup() gives the same
+    counts either way. last_published_at only covers the window.
+    """
+    today = datetime.now(timezone.utc).date()
+    daily, newest = _buckets_by_company(_scan_news(client, fetched_since=_window_start(today)), today)
+    return {cid: NewsStatsWriter._row(cid, daily.get(cid, {}), ts) for cid, ts in newest.items()}
+
+
+def rebuild_news_stats(client) -> int:
+    """Build company_news_stats from all of company_news. Returns companies written."""
+    writer = NewsStatsWriter(client)
+    if not writer.has_table:
+        print(f"  {STATS_TABLE} missing — run the migration first (see news_stats.py)")
+        return 0
+    today = datetime.now(timezone.utc).date()
+    daily, newest = _buckets_by_company(_scan_news(client), today)
+    writer._upsert([writer._row(cid, daily.get(cid, {}), ts) for cid, ts in newest.items()])
+    return writer.stats['companies_updated']
+
+
+def companies_with_news_since(client, since: str, company_ids=None) -> set | None:
+    """Company ids whose newest article is at or after `since` (ISO timestamp).
+
+    Restricted to company_ids if given. None if company_news_stats is not
+    available or not rebuilt yet (callers then query company_news).
+    """
+    if not stats_ready(client):
+        return None
+    found = set()
+    try:
+        if company_ids is not None:
+            ids = list(company_ids)
+            for i in range(0, len(ids), ID_CHUNK):
+                response = client.table(STATS_TABLE) \
+                    .select('company_id') \
+                    .in_('company_id', ids[i:i + ID_CHUNK]) \
+                    .gte('last_published_at', since) \
+                    .execute()
+                found.update(r['company_id'] for r in response.data or [])
+            return found
+
+        page_size = 1000
+        offset = 0
+        while True:
+            response = client.table(STATS_TABLE) \
+                .select('company_id') \
+                .gte('last_published_at', since) \
+                .order('company_id') \
+                .range(offset, offset + page_size - 1) \
+                .execute()
+            batch = response.data or []
+            found.update(r['company_id'] for r in batch)
+            if len(batch) < page_size:
+                break
+            offset += page_size
+        return found
+    except Exception as e:
+        print(f"  Note: {STATS_TABLE} not available ({str(e)[:80]}), reading company_news")
+        return None
+
+
+def companies_with_news_in_company_news(client, since: str, company_ids) -> set:
+    """companies_with_news_since() counted from company_news (fallback), same timestamp rule."""
+    since_ts = _parse_ts(since)
+    found = set()
+    ids = list(company_ids)
+    for i in range(0, len(ids), ID_CHUNK):
+        for row in _scan_news(client, company_ids=ids[i:i + ID_CHUNK], fetched_since=since_ts.isoformat()):
+            ts = news_timestamp(row)
+            if ts and ts >= since_ts:
+                found.add(row['company_id'])
+    return found
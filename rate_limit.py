@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Rate limiting for scripts that call an external API from several worker
+threads: a token bucket (yfinance, Brave, ...) and an adaptive concurrency
+limit driven by the API's rate-limit headers (Anthropic).
+
+Usage:
+    limiter = RateLimiter(rate=3, burst=3)   # 3 calls/second
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        ...  # each worker calls limiter.acquire() before its request,
+             # limiter.backoff(steps, sent_at) on a 429 (pauses every worker)
+"""
+
+import threading
+import time
+
+
+class RateLimiter:
+    def __init__(self, rate: float, burst: float = 1):
+        """rate: tokens per second, burst: bucket size (max calls at once)."""
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.waited = 0.0  # total seconds callers spent waiting
+        self.paused_until = 0.0
+        self.backoff_streak = 0  # rate-limited answers in a row
+        self._backoff_started = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens: float = 1) -> None:
+        """Block until tokens are available, then take them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self._refill(now)
+                    if self.tokens >= tokens:
+                        self.tokens -= tokens
+                        return
+                    wait = (tokens - self.tokens) / self.rate
+                self.waited += wait
+            time.sleep(wait)
+
+    def backoff(self, steps: list, sent_at: float) -> float:
+        """A request sent at sent_at (monotonic) was rate limited: pause all callers.
+
+        The pause grows along steps with every 429 in a row. Answers to
+        requests sent before the current pause began belong to the same
+        episode and do not escalate it. Returns the seconds left to wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if sent_at >= self._backoff_started or not self.backoff_streak:
+                self.backoff_streak += 1
+                pause = steps[min(self.backoff_streak, len(steps)) - 1]
+                self._backoff_started = now
+                self.paused_until = max(self.paused_until, now + pause)
+                # Start from an empty bucket when the pause ends
+                self.tokens = 0
+                self.updated = self.paused_until
+            return max(0.0, self.paused_until - now)
+
+    def reset_backoff(self) -> None:
+        """A request went through: the next 429 starts at the first step again."""
+        with self._lock:
+            self.backoff_streak = 0
+
+
+class AdaptiveConcurrency:
+    """Concurrency limit that follows an API's rate-limit feedback.
+
+    Workers call acquire()/release() around each request. After a response,
+    the caller reports either spare quota (relax: limit + 1, up to
+    max_workers) or exhausted quota / 429 (throttle: halve the limit and
+    pause all workers until the quota resets).
+    """
+
+    def __init__(self, max_workers: int, min_workers: int = 1):
+        self.max_workers = max(max_workers, 1)
+        self.min_workers = max(min(min_workers, self.max_workers), 1)
+        self.limit = self.max_workers
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.throttled = 0  # times the limit was reduced
+        self.waited = 0.0   # total seconds callers spent waiting
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    timeout = self.paused_until - now
+                elif self.in_flight < self.limit:
+                    self.in_flight += 1
+                    return
+                else:
+                    timeout = None
+                self._cond.wait(timeout)
+                self.waited += time.monotonic() - now
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def throttle(self, pause: float = 0) -> None:
+        """Halve the limit and hold back new requests for pause seconds."""
+        with self._cond:
+            self.limit = max(self.min_workers, self.limit // 2)
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            self.throttled += 1
+            self._cond.notify_all()
+
+    def relax(self) -> None:
+        with self._cond:
+            if self.limit < self.max_workers:
+                self.limit += 1
+                self._cond.notify_all()
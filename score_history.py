@@ -3,10 +3,13 @@
 Score History — retention cleanup and trend analysis.
 
 Manages company_scores history:
-  - Deletes scores older than retention window (default 90 days)
+  - Deletes history older than retention window (default 90 days)
   - Calculates 7-day and 30-day score trends per company
   - Saves trend data as score_type='trend_7d' / 'trend_30d'
 
+Past scores come from company_score_history (see score_store.py). Until
+that migration is applied, old rows in company_scores itself are used.
+
 Designed to run after scoring_engine.py in the cron chain.
 
 Usage:
@@ -26,28 +29,37 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(os.path.join(SCRIPT_DIR, '.env'))
 
 import supabase_helper
+import score_store
 
 
 def cleanup_old_scores(client, retention_days: int, apply: bool) -> int:
-    """Delete scores older than retention window."""
+    """Delete scores older than retention window.
+
+    With company_score_history only the history is trimmed (by day);
+    company_scores holds the current scores and is never aged out.
+    """
     cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+    if score_store.has_history_table(client):
+        table, column, cutoff = score_store.HISTORY_TABLE, 'day', cutoff[:10]
+    else:
+        table, column = score_store.SCORES_TABLE, 'computed_at'
 
     print(f"\n  Retention cleanup (>{retention_days} days)...")
-    print(f"  Cutoff: {cutoff[:10]}")
+    print(f"  Cutoff: {cutoff[:10]} ({table})")
 
     try:
         # Count old scores
-        resp = client.table('company_scores') \
+        resp = client.table(table) \
             .select('id', count='exact') \
-            .lt('computed_at', cutoff) \
+            .lt(column, cutoff) \
             .execute()
         count = resp.count or 0
         print(f"  Scores to delete: {count}")
 
         if apply and count > 0:
-            client.table('company_scores') \
+            client.table(table) \
                 .delete() \
-                .lt('computed_at', cutoff) \
+                .lt(column, cutoff) \
                 .execute()
             print(f"  Deleted: {count} old scores")
         elif count > 0:
@@ -67,61 +79,27 @@ def calculate_trends(client, apply: bool) -> dict:
     date_7d = (today - timedelta(days=7)).isoformat()
     date_30d = (today - timedelta(days=30)).isoformat()
 
-    # Get current overall scores (most recent per company)
+    # Current overall scores, and each company's latest score before 7 / 30 days ago
     try:
-        current_resp = client.table('company_scores') \
-            .select('company_id, score_value, computed_at') \
-            .eq('score_type', 'overall') \
-            .order('computed_at', desc=True) \
-            .execute()
+        current_scores = score_store.load_current_scores(client, 'overall')
     except Exception as e:
         print(f"  Error loading current scores: {e}")
         return {}
 
-    # Deduplicate: keep latest per company
-    current_scores = {}
-    for row in current_resp.data:
-        cid = row['company_id']
-        if cid not in current_scores:
-            current_scores[cid] = float(row['score_value'])
-
     print(f"  Companies with current scores: {len(current_scores)}")
 
-    # Get scores from 7 days ago
-    try:
-        resp_7d = client.table('company_scores') \
-            .select('company_id, score_value, computed_at') \
-            .eq('score_type', 'overall') \
-            .lt('computed_at', date_7d) \
-            .order('computed_at', desc=True) \
-            .execute()
-    except Exception as e:
-        print(f"  Error loading 7d scores: {e}")
-        resp_7d = type('obj', (object,), {'data': []})()
-
-    scores_7d = {}
-    for row in resp_7d.data:
-        cid = row['company_id']
-        if cid not in scores_7d:
-            scores_7d[cid] = float(row['score_value'])
-
-    # Get scores from 30 days ago
-    try:
-        resp_30d = client.table('company_scores') \
-            .select('company_id, score_value, computed_at') \
-            .eq('score_type', 'overall') \
-            .lt('computed_at', date_30d) \
-            .order('computed_at', desc=True) \
-            .execute()
-    except Exception as e:
-        print(f"  Error loading 30d scores: {e}")
-        resp_30d = type('obj', (object,), {'data': []})()
-
-    scores_30d = {}
-    for row in resp_30d.data:
-        cid = row['company_id']
-        if cid not in scores_30d:
-            scores_30d[cid] = float(row['score_value'])
+    history = score_store.has_history_table(client)
+    past = {}
+    for period, before in (('7d', date_7d), ('30d', date_30d)):
+        try:
+            if history:
+                past[period] = score_store.load_scores_before(client, 'overall', before)
+            else:
+                past[period] = score_store.load_current_scores(client, 'overall', before=before)
+        except Exception as e:
+            print(f"  Error loading {period} scores: {e}")
+            past[period] = {}
+    scores_7d, scores_30d = past['7d'], past['30d']
 
     # Calculate trends
     trends = {'7d': {}, '30d': {}}
@@ -154,43 +132,23 @@ def calculate_trends(client, apply: bool) -> dict:
         for cid, t in movers_7d[:5]:
             print(f"    {t['delta']:+6.1f}  {cid[:8]}...")
 
-    # Write trend scores
+    # Write trend scores (replacing the previous ones only once the new ones are in)
     if apply:
-        # Delete old trend scores first
-        try:
-            client.table('company_scores').delete().in_('score_type', ['trend_7d', 'trend_30d']).execute()
-        except Exception:
-            pass
-
-        written = 0
         now = datetime.now().isoformat()
-        batch = []
+        rows = []
         for period, period_trends in trends.items():
             score_type = f'trend_{period}'
             for cid, trend in period_trends.items():
-                batch.append({
+                rows.append({
                     'company_id': cid,
                     'score_type': score_type,
                     'score_value': trend['delta'],
                     'details': {'direction': trend['direction'], 'period_days': 7 if period == '7d' else 30},
                     'computed_at': now,
                 })
-                if len(batch) >= 300:
-                    try:
-                        client.table('company_scores').insert(batch).execute()
-                        written += len(batch)
-                    except Exception:
-                        pass
-                    batch = []
-
-        if batch:
-            try:
-                client.table('company_scores').insert(batch).execute()
-                written += len(batch)
-            except Exception:
-                pass
-
-        print(f"\n  Written: {written} trend scores")
+        result = score_store.write_scores(client, rows, ['trend_7d', 'trend_30d'], now, replace_all=True)
+
+        print(f"\n  Written: {result['written']} trend scores ({result['removed']} old removed)")
     else:
         total = len(trends['7d']) + len(trends['30d'])
         print(f"\n  Would write {total} trend scores (dry-run)")
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Score Reweight — evaluate other weights / label thresholds on stored scores.
+
+Reads the component scores stored with every overall score in
+company_scores (one row per company) and recomputes overall scores and
+labels for any weight vector as array operations, without reloading
+companies, news or events. The current WEIGHTS and label thresholds are
+always evaluated first ("current"); with them the stored overall scores
+are reproduced exactly.
+
+Weight sets name only the components they change, the others keep their
+current weight. Weights are used as given (not normalized to 1).
+
+Usage:
+  python3 score_reweight.py                                  # current weights only
+  python3 score_reweight.py --weights news_sentiment=0.25,catalyst_proximity=0.05
+  python3 score_reweight.py --weights momentum:price_momentum=0.3,valuation_gap=0.15 \\
+                            --weights conviction:conviction_signal=0.35,news_sentiment=0.05
+  python3 score_reweight.py --thresholds 75,55,40,20         # other label bounds
+  python3 score_reweight.py --top 20                         # longer top list per set
+
+Evaluation only: nothing is written. Change WEIGHTS in scoring_engine.py
+and rerun the engine to adopt a set.
+"""
+
+import argparse
+import os
+import time
+from collections import Counter
+from dotenv import load_dotenv
+
+import numpy as np
+import pandas as pd
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(SCRIPT_DIR, '.env'))
+
+import supabase_helper
+from score_store import SCORES_TABLE
+from scoring_engine import LABEL_THRESHOLDS, LABELS, PAGE_SIZE, WEIGHTS, score_labels, weighted_overall
+
+ALL_LABELS = [*LABELS, 'Remove']
+
+
+def load_stored_components(client) -> pd.DataFrame:
+    """One row per company: company_id, stored overall and label, the five components."""
+    rows = []
+    offset = 0
+    while True:
+        response = client.table(SCORES_TABLE) \
+            .select('company_id, score_value, details') \
+            .eq('score_type', 'overall') \
+            .order('company_id') \
+            .range(offset, offset + PAGE_SIZE - 1) \
+            .execute()
+        batch = response.data or []
+        rows.extend(batch)
+        if len(batch) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+
+    columns = {'company_id': [], 'stored_overall': [], 'stored_label': []}
+    columns.update({name: [] for name in WEIGHTS})
+    seen = set()
+    for row in rows:
+        details = row.get('details') or {}
+        if row['company_id'] in seen or any(details.get(name) is None for name in WEIGHTS):
+            continue
+        seen.add(row['company_id'])
+        columns['company_id'].append(row['company_id'])
+        columns['stored_overall'].append(float(row['score_value']))
+        columns['stored_label'].append(details.get('score_label'))
+        for name in WEIGHTS:
+            columns[name].append(float(details[name]))
+    return pd.DataFrame(columns)
+
+
+def reweight(components: pd.DataFrame, weights: dict = None, thresholds=LABEL_THRESHOLDS) -> pd.DataFrame:
+    """Overall score and label per company for these weights (same arithmetic as scoring_engine)."""
+    weights = weights or WEIGHTS
+    overall = weighted_overall({name: components[name].to_numpy() for name in weights}, weights)
+    return pd.DataFrame({
+        'company_id': components['company_id'].to_numpy(),
+        'overall': overall,
+        'label': score_labels(overall, thresholds),
+    })
+
+
+def compare_weight_sets(components: pd.DataFrame, weight_sets: dict, thresholds=LABEL_THRESHOLDS,
+                        top: int = 10) -> dict:
+    """Reweight every set and summarize each against the first one.
+
+    Returns {name: {'scores', 'label_counts', 'mean', 'label_changes',
+    'rank_correlation', 'top_overlap', 'top_ids'}}.
+    """
+    results = {}
+    baseline = None
+    for name, weights in weight_sets.items():
+        scores = reweight(components, weights, thresholds)
+        overall = scores['overall'].to_numpy()
+        # Stable order, ties by company_id as loaded
+        order = np.argsort(-overall, kind='stable')
+        top_ids = scores['company_id'].to_numpy()[order[:top]].tolist()
+        summary = {
+            'scores': scores,
+            'label_counts': Counter(scores['label'].tolist()),
+            'mean': float(np.nanmean(overall)) if len(overall) else 0.0,
+            'top_ids': top_ids,
+        }
+        if baseline is None:
+            baseline = summary
+            summary.update({'label_changes': 0, 'rank_correlation': 1.0, 'top_overlap': len(top_ids)})
+        else:
+            base = baseline['scores']
+            summary['label_changes'] = int((scores['label'].to_numpy() != base['label'].to_numpy()).sum())
+            summary['rank_correlation'] = float(
+                pd.Series(overall).rank().corr(base['overall'].rank())) if len(overall) > 1 else 1.0
+            summary['top_overlap'] = len(set(top_ids) & set(baseline['top_ids']))
+        results[name] = summary
+    return results
+
+
+def parse_weight_set(text: str, index: int) -> tuple:
+    """'[name:]component=weight,...' → (name, full weight dict)."""
+    name, _, spec = text.rpartition(':')
+    weights = dict(WEIGHTS)
+    for part in filter(None, (p.strip() for p in spec.split(','))):
+        component, _, value = part.partition('=')
+        component = component.strip()
+        if component not in WEIGHTS:
+            raise argparse.ArgumentTypeError(f"unknown component '{component}' (one of {', '.join(WEIGHTS)})")
+        try:
+            weights[component] = float(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"weight of {component} is not a number: '{value}'")
+    return name.strip() or f"set{index}", weights
+
+
+def print_comparison(results: dict, weight_sets: dict, names: dict, top: int):
+    set_names = list(results)
+    width = max(12, *(len(n) for n in set_names))
+
+    print(f"\n  {'':20s}" + ''.join(f"{n:>{width}s}" for n in set_names))
+    for component in WEIGHTS:
+        print(f"  {component:20s}" + ''.join(f"{weight_sets[n][component]:>{width}.2f}" for n in set_names))
+    print(f"  {'(sum)':20s}" + ''.join(f"{sum(weight_sets[n].values()):>{width}.2f}" for n in set_names))
+
+    print()
+    for label in ALL_LABELS:
+        print(f"  {label:20s}" + ''.join(f"{results[n]['label_counts'].get(label, 0):>{width}d}" for n in set_names))
+    print(f"  {'mean score':20s}" + ''.join(f"{results[n]['mean']:>{width}.1f}" for n in set_names))
+    print(f"  {'labels changed':20s}" + ''.join(f"{results[n]['label_changes']:>{width}d}" for n in set_names))
+    print(f"  {'rank correlation':20s}" + ''.join(f"{results[n]['rank_correlation']:>{width}.3f}" for n in set_names))
+    print(f"  {f'top {top} overlap':20s}" + ''.join(f"{results[n]['top_overlap']:>{width}d}" for n in set_names))
+
+    for n in set_names:
+        scores = results[n]['scores'].set_index('company_id')
+        print(f"\n  Top {top} — {n}:")
+        for cid in results[n]['top_ids']:
+            row = scores.loc[cid]
+            print(f"    {row['overall']:5.1f} [{row['label']:11s}]  {names.get(cid, cid)[:50]}")
+
+
+def load_names(client, company_ids) -> dict:
+    names = {}
+    ids = list(company_ids)
+    for i in range(0, len(ids), 100):
+        try:
+            response = client.table('companies').select('id, name').in_('id', ids[i:i + 100]).execute()
+            names.update({r['id']: r.get('name') or r['id'] for r in response.data or []})
+        except Exception as e:
+            print(f"  Warning: Could not load company names: {e}")
+            break
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate score weights on stored component scores')
+    parser.add_argument('--weights', action='append', default=[],
+                        help="Weight set '[name:]component=weight,...' (repeatable)")
+    parser.add_argument('--thresholds', default=','.join(str(t) for t in LABEL_THRESHOLDS),
+                        help='Lower bounds of Strong Buy,Accumulate,Hold,Review, descending (default: %(default)s)')
+    parser.add_argument('--top', type=int, default=10, help='Companies listed per set')
+    args = parser.parse_args()
+
+    try:
+        weight_sets = {'current': dict(WEIGHTS)}
+        for i, text in enumerate(args.weights, 1):
+            name, weights = parse_weight_set(text, i)
+            if name in weight_sets:
+                # A second set with the same name would silently replace the first (or the baseline)
+                reason = 'reserved for the baseline' if name == 'current' else 'used twice'
+                raise argparse.ArgumentTypeError(f"weight set name '{name}' is {reason}")
+            weight_sets[name] = weights
+        thresholds = tuple(float(t) for t in args.thresholds.split(','))
+        if len(thresholds) != len(LABELS):
+            raise argparse.ArgumentTypeError(f"--thresholds needs {len(LABELS)} values")
+        if any(higher <= lower for higher, lower in zip(thresholds, thresholds[1:])):
+            # score_labels takes the first bound reached: ascending bounds make everything Strong Buy
+            raise argparse.ArgumentTypeError(
+                f"--thresholds must be strictly descending ({', '.join(LABELS)}), got {args.thresholds}")
+    except (argparse.ArgumentTypeError, ValueError) as e:
+        parser.error(str(e))
+
+    print("\n" + "=" * 70)
+    print("  SCORE REWEIGHT")
+    print(f"  Weight sets: {', '.join(weight_sets)}")
+    print(f"  Label thresholds: {', '.join(f'{t:g}' for t in thresholds)}")
+    print("=" * 70)
+
+    client = supabase_helper.get_client()
+
+    print("\n  Loading stored component scores...")
+    t0 = time.perf_counter()
+    components = load_stored_components(client)
+    print(f"  Loaded {len(components)} companies ({time.perf_counter() - t0:.1f}s)")
+    if components.empty:
+        print("  No stored scores — run scoring_engine.py --apply first")
+        return
+
+    t0 = time.perf_counter()
+    results = compare_weight_sets(components, weight_sets, thresholds, args.top)
+    elapsed = time.perf_counter() - t0
+    print(f"  Reweighted {len(weight_sets)} sets in {elapsed * 1000:.0f} ms")
+
+    # With the current weights the stored scores must come out again
+    current = results['current']['scores']
+    differ = int((current['overall'].to_numpy() != components['stored_overall'].to_numpy()).sum())
+    if differ:
+        print(f"  Note: {differ} stored overall scores differ from the current weights "
+              f"(scored with other weights, or rescore pending)")
+
+    top_ids = {cid for r in results.values() for cid in r['top_ids']}
+    print_comparison(results, weight_sets, load_names(client, top_ids), args.top)
+
+    print("\n  Done!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Current scores in company_scores, every written score in company_score_history.
+
+company_scores holds one row per (company_id, score_type) and is upserted
+in place, so readers never see it empty or half rewritten. Every insert or
+update of a non-trend score is copied into the append-only
+company_score_history by a trigger, so the history is fed by the same
+write and cannot drift from the current table. score_history.py reads past
+values from it (trends) and applies the retention window to it.
+
+Schema (run once in Supabase):
+
+    CREATE TABLE IF NOT EXISTS company_score_history (
+        id bigserial PRIMARY KEY,
+        company_id uuid NOT NULL REFERENCES companies(id) ON DELETE CASCADE,
+        score_type text NOT NULL,
+        score_value numeric,
+        details jsonb,
+        computed_at timestamptz NOT NULL,
+        day date GENERATED ALWAYS AS ((computed_at AT TIME ZONE 'UTC')::date) STORED
+    );
+    CREATE INDEX IF NOT EXISTS company_score_history_day_idx
+        ON company_score_history (day);
+    CREATE INDEX IF NOT EXISTS company_score_history_lookup_idx
+        ON company_score_history (score_type, company_id, computed_at DESC);
+
+    -- keep what company_scores has today, then one row per company and type
+    INSERT INTO company_score_history (company_id, score_type, score_value, details, computed_at)
+        SELECT company_id, score_type, score_value, details, computed_at
+        FROM company_scores WHERE score_type NOT IN ('trend_7d', 'trend_30d');
+    DELETE FROM company_scores a USING company_scores b
+        WHERE a.company_id = b.company_id AND a.score_type = b.score_type
+          AND (a.computed_at, a.id) < (b.computed_at, b.id);
+    CREATE UNIQUE INDEX IF NOT EXISTS company_scores_company_type_key
+        ON company_scores (company_id, score_type);
+
+    CREATE OR REPLACE FUNCTION record_company_score_history() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF NEW.score_type NOT IN ('trend_7d', 'trend_30d') THEN
+            INSERT INTO company_score_history (company_id, score_type, score_value, details, computed_at)
+            VALUES (NEW.company_id, NEW.score_type, NEW.score_value, NEW.details, NEW.computed_at);
+        END IF;
+        RETURN NEW;
+    END $$;
+    DROP TRIGGER IF EXISTS company_scores_history ON company_scores;
+    CREATE TRIGGER company_scores_history AFTER INSERT OR UPDATE ON company_scores
+        FOR EACH ROW EXECUTE FUNCTION record_company_score_history();
+
+    -- latest value per company before a point in time (trends)
+    CREATE OR REPLACE FUNCTION company_scores_before(p_score_type text, p_before timestamptz)
+    RETURNS TABLE (company_id uuid, score_value numeric, computed_at timestamptz)
+    LANGUAGE sql STABLE AS $$
+        SELECT DISTINCT ON (h.company_id) h.company_id, h.score_value, h.computed_at
+        FROM company_score_history h
+        WHERE h.score_type = p_score_type AND h.computed_at < p_before
+        ORDER BY h.company_id, h.computed_at DESC
+    $$;
+
+Until the migration is applied, write_scores inserts the new rows and
+only then deletes the older ones (also never leaving the table empty), and
+score_history.py falls back to reading company_scores.
+"""
+
+SCORES_TABLE = 'company_scores'
+HISTORY_TABLE = 'company_score_history'
+WRITE_CHUNK = 300
+ID_CHUNK = 100
+
+
+def has_history_table(client) -> bool:
+    try:
+        client.table(HISTORY_TABLE).select('id').limit(1).execute()
+        return True
+    except Exception:
+        return False
+
+
+def write_scores(client, rows: list, score_types: list, computed_at: str, replace_all: bool,
+                 progress_every: int = 0) -> dict:
+    """Write score rows (all of score_types, all with this computed_at) as the current scores.
+
+    replace_all: also remove rows of these types that were not rewritten
+    (companies no longer scored); otherwise only the written companies are
+    touched. Returns {'written', 'errors', 'removed', 'history'}.
+    """
+    history = has_history_table(client)
+    stats = {'written': 0, 'errors': 0, 'removed': 0, 'history': history}
+    written_ids = set()
+    for i in range(0, len(rows), WRITE_CHUNK):
+        chunk = rows[i:i + WRITE_CHUNK]
+        try:
+            if history:
+                client.table(SCORES_TABLE).upsert(chunk, on_conflict='company_id,score_type').execute()
+            else:
+                client.table(SCORES_TABLE).insert(chunk).execute()
+            stats['written'] += len(chunk)
+            written_ids.update(row['company_id'] for row in chunk)
+        except Exception as e:
+            if not stats['errors']:
+                print(f"    Batch error: {e}")
+            stats['errors'] += len(chunk)
+        if progress_every and (i // WRITE_CHUNK + 1) % progress_every == 0:
+            print(f"    ... {i + len(chunk)}/{len(rows)} rows")
+
+    if history and not replace_all:
+        return stats
+    if replace_all and stats['errors']:
+        # The older rows are the only scores of the companies whose write failed
+        print(f"  Warning: {stats['errors']} rows not written, keeping the older scores")
+        return stats
+
+    # Older rows go only after the new ones are in: the table is never empty
+    try:
+        if replace_all:
+            response = client.table(SCORES_TABLE).delete() \
+                .in_('score_type', list(score_types)) \
+                .lt('computed_at', computed_at) \
+                .execute()
+            stats['removed'] += len(response.data or [])
+        else:
+            ids = sorted(written_ids)
+            for i in range(0, len(ids), ID_CHUNK):
+                response = client.table(SCORES_TABLE).delete() \
+                    .in_('company_id', ids[i:i + ID_CHUNK]) \
+                    .in_('score_type', list(score_types)) \
+                    .lt('computed_at', computed_at) \
+                    .execute()
+                stats['removed'] += len(response.data or [])
+    except Exception as e:
+        print(f"  Warning: Could not remove older scores: {e}")
+    return stats
+
+
+def load_scores_before(client, score_type: str, before: str) -> dict:
+    """{company_id: score_value} of the latest history row before `before` (ISO timestamp)."""
+    scores = {}
+    page_size = 1000
+    offset = 0
+    try:
+        while True:
+            response = client.rpc('company_scores_before', {'p_score_type': score_type, 'p_before': before}) \
+                .range(offset, offset + page_size - 1) \
+                .execute()
+            batch = response.data or []
+            for row in batch:
+                scores[row['company_id']] = float(row['score_value'])
+            if len(batch) < page_size:
+                return scores
+            offset += page_size
+    except Exception as e:
+        if 'company_scores_before' not in str(e) and 'PGRST202' not in str(e):
+            raise
+        print(f"  Note: company_scores_before() not available, scanning {HISTORY_TABLE}")
+
+    # Without the function: newest first, keep the first row per company
+    scores = {}
+    offset = 0
+    while True:
+        response = client.table(HISTORY_TABLE) \
+            .select('company_id, score_value, computed_at') \
+            .eq('score_type', score_type) \
+            .lt('computed_at', before) \
+            .order('computed_at', desc=True) \
+            .order('id', desc=True) \
+            .range(offset, offset + page_size - 1) \
+            .execute()
+        batch = response.data or []
+        for row in batch:
+            scores.setdefault(row['company_id'], float(row['score_value']))
+        if len(batch) < page_size:
+            return scores
+        offset += page_size
+
+
+def load_current_scores(client, score_type: str, before: str = None) -> dict:
+    """{company_id: score_value} of company_scores, newest row per company (before `before` if given)."""
+    scores = {}
+    page_size = 1000
+    offset = 0
+    while True:
+        query = client.table(SCORES_TABLE) \
+            .select('company_id, score_value, computed_at') \
+            .eq('score_type', score_type)
+        if before:
+            query = query.lt('computed_at', before)
+        response = query \
+            .order('computed_at', desc=True) \
+            .order('id', desc=True) \
+            .range(offset, offset + page_size - 1) \
+            .execute()
+        batch = response.data or []
+        for row in batch:
+            scores.setdefault(row['company_id'], float(row['score_value']))
+        if len(batch) < page_size:
+            return scores
+        offset += page_size
@@ -16,23 +16,39 @@ Score Labels:
   20-39   Review
    0-19   Remove
 
+All companies are scored at once on a columnar frame (score_companies);
+the per-company score_* functions are the reference it reproduces
+exactly (bench_scoring.py).
+
 Usage:
   python3 scoring_engine.py                    # dry-run (preview only)
   python3 scoring_engine.py --apply            # write scores to Supabase
   python3 scoring_engine.py --apply --limit 50 # score first 50 companies
+  python3 scoring_engine.py --apply --incremental  # only companies whose inputs changed
+
+--incremental compares a fingerprint of each company's scoring inputs
+(price, 52W range, targets, conviction fields, news counts, upcoming
+events as days until) with the input_hash stored in its overall score,
+and only rescores and rewrites companies that differ, were never scored
+or were last scored more than SCORE_MAX_AGE_DAYS ago.
 """
 
 import argparse
 import os
 import sys
+import zlib
 from collections import Counter
 from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
 from dotenv import load_dotenv
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(os.path.join(SCRIPT_DIR, '.env'))
 
 import supabase_helper
+import score_store
+from news_stats import load_news_stats, rollup, stats_from_news, stats_ready
 
 # ── Score weights ──
 WEIGHTS = {
@@ -53,6 +69,9 @@ VIP_MAP = {
 }
 PRIO_BUY_MAP = {1: 100, 2: 80, 3: 60, 4: 40, 5: 20}
 
+EVENT_WINDOW_DAYS = 30   # events further out do not move catalyst_proximity
+PAGE_SIZE = 1000         # PostgREST max rows per response
+
 
 def get_score_label(score: float) -> str:
     """Map overall score to a human-readable label."""
@@ -214,12 +233,12 @@ def score_price_momentum(company: dict) -> float:
 
 def score_news_sentiment(company_id: str, news_cache: dict) -> float:
     """Score news sentiment from last 30 days (0-100). No news = 50."""
-    news_list = news_cache.get(company_id, [])
-    if not news_list:
+    counts = news_cache.get(company_id)
+    if not counts:
         return 50.0
 
-    pos = sum(1 for n in news_list if n.get('sentiment') == 'positive')
-    neg = sum(1 for n in news_list if n.get('sentiment') == 'negative')
+    pos = counts.get('positive', 0)
+    neg = counts.get('negative', 0)
     total = pos + neg
 
     if total == 0:
@@ -275,48 +294,413 @@ def score_catalyst_proximity(company_id: str, events_cache: dict) -> float:
 
 
 def load_news_cache(client) -> dict:
-    """Load recent news grouped by company_id."""
-    cutoff = (datetime.now() - timedelta(days=30)).isoformat()
-    cache = {}
+    """Sentiment counts of the last 30 days: {company_id: {'positive', 'negative', 'total'}}.
+
+    Read from the company_news_stats aggregate (news_stats.py); counted
+    from company_news, page by page and with the same day rule, until that
+    table is created and rebuilt.
+    Raises if company_news cannot be read completely.
+    """
     try:
-        resp = client.table('company_news') \
-            .select('company_id, sentiment') \
-            .gte('published_at', cutoff) \
-            .execute()
-        for row in resp.data:
-            cid = row['company_id']
-            cache.setdefault(cid, []).append(row)
+        if not stats_ready(client):
+            raise RuntimeError('missing or not rebuilt yet')
+        stats = load_news_stats(client)
     except Exception as e:
-        print(f"  Warning: Could not load news: {e}")
+        print(f"  Note: company_news_stats not available ({str(e)[:80]}), counting company_news")
+        stats = stats_from_news(client)
+
+    cache = {}
+    for cid, row in stats.items():
+        counts = rollup(row)
+        if counts['news_30d']:
+            cache[cid] = {
+                'positive': counts['positive_30d'],
+                'negative': counts['negative_30d'],
+                'total': counts['news_30d'],
+            }
     return cache
 
 
 def load_events_cache(client) -> dict:
-    """Load upcoming events grouped by company_id."""
-    today = datetime.now().date().isoformat()
+    """Events of the next EVENT_WINDOW_DAYS grouped by company_id, all pages.
+
+    Later events do not change any score (see score_catalyst_proximity),
+    so they are not loaded. Raises if company_events cannot be read
+    completely.
+    """
+    today = datetime.now().date()
     cache = {}
-    try:
+    offset = 0
+    while True:
         resp = client.table('company_events') \
-            .select('company_id, event_type, event_date') \
-            .gte('event_date', today) \
+            .select('id, company_id, event_type, event_date') \
+            .gte('event_date', today.isoformat()) \
+            .lte('event_date', (today + timedelta(days=EVENT_WINDOW_DAYS)).isoformat()) \
+            .order('id') \
+            .range(offset, offset + PAGE_SIZE - 1) \
             .execute()
-        for row in resp.data:
-            cid = row['company_id']
-            cache.setdefault(cid, []).append(row)
-    except Exception as e:
-        print(f"  Warning: Could not load events: {e}")
-    return cache
+        batch = resp.data or []
+        for row in batch:
+            cache.setdefault(row['company_id'], []).append(row)
+        if len(batch) < PAGE_SIZE:
+            return cache
+        offset += PAGE_SIZE
+
+
+# ── Vectorized scoring ──
+#
+# Same rules as the score_* functions above, computed column-wise for all
+# companies at once. The score_* functions stay the reference: every branch
+# below mirrors one of theirs, in the same order, with the same float
+# operations, and round1() reproduces Python's round(x, 1), so the results
+# are identical (bench_scoring.py checks this).
+
+FRAME_TEXT = ('thier_group', 'vip')
+FRAME_NUMBERS = (
+    'price', 'target', 'purchase', 'forward_pe', 'revenue_growth',
+    'high_52w', 'low_52w', 'change', 'prio_buy', 'news_positive', 'news_negative',
+)
+LABELS = ('Strong Buy', 'Accumulate', 'Hold', 'Review')
+LABEL_THRESHOLDS = (80, 60, 40, 20)
+
+FINGERPRINT_COLUMNS = (
+    *FRAME_TEXT, *FRAME_NUMBERS, *(f"has_{name}" for name in FRAME_NUMBERS), 'has_news', 'catalysts',
+)
+SCORING_VERSION = 1          # bump when a scoring rule changes: --incremental then rescores everything
+SCORE_MAX_AGE_DAYS = 7       # --incremental still rewrites scores older than this
+
+# Python >= 3.12 sums floats with Neumaier compensation, older versions naively
+_COMPENSATED_SUM = sys.version_info >= (3, 12)
+
+
+def _parse_number(value, strip_percent: bool = False) -> float | None:
+    """float() of an extra_data value as the score_* functions parse it; None if that raises."""
+    if type(value) is float or type(value) is int:
+        return float(value)
+    try:
+        text = str(value).replace(',', '.')
+        return float(text.replace('%', '') if strip_percent else text)
+    except (ValueError, TypeError):
+        return None
+
+
+def _event_days(event_date, today) -> int | None:
+    if not event_date:
+        return None
+    try:
+        ed = datetime.strptime(event_date, '%Y-%m-%d').date() if isinstance(event_date, str) else event_date
+    except (ValueError, TypeError):
+        return None
+    return (ed - today).days
+
+
+def _event_type_score(event_type) -> int:
+    event_type = (event_type or '').lower()
+    if event_type == 'ipo':
+        return 100
+    if event_type in ('earnings', 'earnings_report'):
+        return 80
+    return 60
+
+
+def _number_column(values: list) -> tuple:
+    """(float array with NaN for None, bool array of the non-None entries)."""
+    present = np.array([v is not None for v in values], dtype=bool)
+    return np.array(values, dtype=np.float64), present
+
+
+def build_score_frame(companies: list, news_cache: dict, events_cache: dict, today=None) -> tuple:
+    """Parse the scoring inputs once into columns.
+
+    Returns (frame, events): frame has one row per company (company_id,
+    name, the FRAME_TEXT/FRAME_NUMBERS columns, a `has_<name>` flag per
+    number that parsed, has_news, and catalysts: the upcoming events
+    within 30 days as "days:type_score" text); events holds the same
+    events as arrays (row = frame position, days until, type score).
+    """
+    today = today or datetime.now().date()
+    columns = {name: [] for name in ('company_id', 'name', *FRAME_TEXT, 'catalysts', *FRAME_NUMBERS)}
+    has_news = []
+    event_rows, event_days, event_types = [], [], []
+    days_by_date = {}
+    parse = _parse_number
+
+    for i, company in enumerate(companies):
+        extra = company.get('extra_data') or {}
+        cid = company['id']
+        columns['company_id'].append(cid)
+        columns['name'].append(company.get('name', '?'))
+        columns['price'].append(_get_price(company))
+
+        value = extra.get('Analyst_Target_Mean')
+        columns['target'].append(None if value is None else parse(value))
+        value = extra.get('Purchase_$')
+        columns['purchase'].append(None if value is None else parse(value))
+        fwd_pe = rev_growth = None
+        if extra.get('Forward_PE') is not None and extra.get('Revenue_Growth') is not None:
+            fwd_pe = parse(extra['Forward_PE'])
+            rev_growth = parse(extra['Revenue_Growth']) if fwd_pe is not None else None
+            if rev_growth is None:
+                fwd_pe = None
+        columns['forward_pe'].append(fwd_pe)
+        columns['revenue_growth'].append(rev_growth)
+
+        high = low = None
+        high_52w = extra.get('52W_High') or extra.get('52_Week_High')
+        low_52w = extra.get('52W_Low') or extra.get('52_Week_Low')
+        if high_52w and low_52w:
+            high = parse(high_52w)
+            low = parse(low_52w) if high is not None else None
+            if low is None:
+                high = None
+        columns['high_52w'].append(high)
+        columns['low_52w'].append(low)
+        value = extra.get('Change_%') or extra.get('Change_Percent')
+        columns['change'].append(parse(value, strip_percent=True) if value else None)
+
+        columns['thier_group'].append((company.get('thier_group') or extra.get('Thier_Group') or '').strip())
+        columns['vip'].append((company.get('vip') or extra.get('VIP') or '').strip())
+        pb = company.get('prio_buy')
+        if pb is None:
+            pb_raw = extra.get('Prio_Buy')
+            if pb_raw:
+                try:
+                    pb = int(float(str(pb_raw)))
+                except (ValueError, TypeError):
+                    pb = None
+        columns['prio_buy'].append(pb if isinstance(pb, (int, float)) else None)
+
+        counts = news_cache.get(cid)
+        has_news.append(bool(counts))
+        columns['news_positive'].append(counts.get('positive', 0) if counts else None)
+        columns['news_negative'].append(counts.get('negative', 0) if counts else None)
+
+        upcoming = []
+        for event in events_cache.get(cid, ()):
+            event_date = event.get('event_date')
+            key = (type(event_date), event_date)
+            if key not in days_by_date:
+                days_by_date[key] = _event_days(event_date, today)
+            days = days_by_date[key]
+            if days is not None and 0 <= days <= 30:
+                type_score = _event_type_score(event.get('event_type'))
+                event_rows.append(i)
+                event_days.append(days)
+                event_types.append(type_score)
+                upcoming.append(f"{days}:{type_score}")
+        columns['catalysts'].append(' '.join(sorted(upcoming)))
+
+    frame = pd.DataFrame({name: columns[name] for name in ('company_id', 'name', *FRAME_TEXT, 'catalysts')})
+    for name in FRAME_NUMBERS:
+        frame[name], frame[f"has_{name}"] = _number_column(columns[name])
+    frame['has_news'] = np.array(has_news, dtype=bool)
+    events = {
+        'row': np.array(event_rows, dtype=np.int64),
+        'days': np.array(event_days, dtype=np.float64),
+        'type_score': np.array(event_types, dtype=np.float64),
+    }
+    return frame, events
+
+
+def round1(values) -> np.ndarray:
+    """round(x, 1) for an array, identical to Python's correctly rounded result.
+
+    np.round scales by 10 first, which can only change the result for
+    values within a rounding error of a .x5 tie; those go through round().
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.round(values, 1)
+    with np.errstate(invalid='ignore'):
+        scaled = values * 10
+        near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_tie):
+        result[i] = round(float(values[i]), 1)
+    return result
+
+
+def _map_gap_pct(gap_pct: np.ndarray) -> np.ndarray:
+    return np.select(
+        [gap_pct <= -50, gap_pct <= 0, gap_pct <= 100, gap_pct <= 200],
+        [0.0, (gap_pct + 50) / 50 * 50, 50 + (gap_pct / 100) * 35, 85 + ((gap_pct - 100) / 100) * 15],
+        default=100.0,
+    )
+
+
+def _valuation_gap(f: pd.DataFrame) -> np.ndarray:
+    price = f['price'].to_numpy()
+    has_price = f['has_price'].to_numpy()
+    target = f['target'].to_numpy()
+    purchase = f['purchase'].to_numpy()
+    use_target = has_price & f['has_target'].to_numpy() & (target > 0)
+    use_purchase = has_price & ~use_target & f['has_purchase'].to_numpy() & (purchase > 0)
+    cheap_growth = f['has_forward_pe'].to_numpy() & (f['forward_pe'].to_numpy() < 15) \
+        & (f['revenue_growth'].to_numpy() > 0.2)
+    gap_pct = np.where(use_target, (target - price) / price * 100, (purchase - price) / price * 100)
+    return np.select(
+        [use_target | use_purchase, cheap_growth],
+        [round1(_map_gap_pct(gap_pct)), 75.0],
+        default=50.0,
+    )
+
+
+def _conviction_signal(f: pd.DataFrame) -> np.ndarray:
+    tg_score = f['thier_group'].map(THIER_GROUP_MAP).fillna(20).to_numpy(dtype=np.float64)
+    vip_score = f['vip'].map(VIP_MAP).fillna(25).to_numpy(dtype=np.float64)
+    pb = f['prio_buy'].to_numpy()
+    pb_score = np.full(len(f), 40.0)
+    for prio, score in PRIO_BUY_MAP.items():
+        pb_score[pb == prio] = score
+    return round1(tg_score * 0.4 + vip_score * 0.3 + pb_score * 0.3)
+
+
+def _price_momentum(f: pd.DataFrame) -> np.ndarray:
+    price = f['price'].to_numpy()
+    high = f['high_52w'].to_numpy()
+    low = f['low_52w'].to_numpy()
+    in_range = f['has_price'].to_numpy() & f['has_high_52w'].to_numpy() & (high > low) & (low > 0)
+    use_change = f['has_price'].to_numpy() & ~in_range & f['has_change'].to_numpy()
+    position = (price - low) / (high - low)
+    by_range = round1(np.clip(position * 100, 0, 100))
+    by_change = round1(np.clip((f['change'].to_numpy() + 20) / 40 * 100, 0, 100))
+    return np.select([in_range, use_change], [by_range, by_change], default=50.0)
+
+
+def _news_sentiment(f: pd.DataFrame) -> np.ndarray:
+    pos = f['news_positive'].to_numpy()
+    total = pos + f['news_negative'].to_numpy()
+    scored = f['has_news'].to_numpy() & (total != 0)
+    return np.where(scored, round1(pos / total * 100), 50.0)
+
+
+def _catalyst_proximity(n: int, events: dict) -> np.ndarray:
+    best = np.full(n, 30.0)
+    if len(events['row']):
+        score = 30 + (1.0 - (events['days'] / 30)) * (events['type_score'] - 30)
+        np.maximum.at(best, events['row'], score)
+    return round1(best)
+
+
+def weighted_overall(components: dict, weights: dict = None) -> np.ndarray:
+    """round(sum(components[k] * weights[k] for k in weights), 1) per row.
+
+    Adds the terms in the same order as Python's sum() and, like sum() on
+    Python >= 3.12, with Neumaier compensation.
+    """
+    weights = weights or WEIGHTS
+    terms = [np.asarray(components[k], dtype=np.float64) * weights[k] for k in weights]
+    total = terms[0].copy()
+    if not _COMPENSATED_SUM:
+        for term in terms[1:]:
+            total = total + term
+        return round1(total)
+    comp = np.zeros_like(total)
+    with np.errstate(invalid='ignore'):
+        for term in terms[1:]:
+            t = total + term
+            comp += np.where(np.abs(total) >= np.abs(term), (total - t) + term, (term - t) + total)
+            total = t
+        use = (comp != 0) & np.isfinite(comp)
+    total[use] += comp[use]
+    return round1(total)
+
+
+def score_labels(overall, thresholds=LABEL_THRESHOLDS) -> np.ndarray:
+    """get_score_label() for an array of overall scores (other lower bounds via thresholds)."""
+    overall = np.asarray(overall, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        return np.select([overall >= t for t in thresholds], LABELS, default='Remove')
+
+
+def score_frame(frame: pd.DataFrame, events: dict, weights: dict = None) -> pd.DataFrame:
+    """Add the five component columns, overall and label to a build_score_frame() frame."""
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        components = {
+            'valuation_gap': _valuation_gap(frame),
+            'conviction_signal': _conviction_signal(frame),
+            'price_momentum': _price_momentum(frame),
+            'news_sentiment': _news_sentiment(frame),
+            'catalyst_proximity': _catalyst_proximity(len(frame), events),
+        }
+    result = frame[['company_id', 'name']].copy()
+    for name, values in components.items():
+        result[name] = values
+    result['overall'] = weighted_overall(components, weights)
+    result['label'] = score_labels(result['overall'].to_numpy())
+    return result
+
+
+def subset_frame(frame: pd.DataFrame, events: dict, mask) -> tuple:
+    """The rows of a build_score_frame() result where mask is set, with their events."""
+    positions = np.flatnonzero(mask)
+    new_row = np.full(len(frame), -1, dtype=np.int64)
+    new_row[positions] = np.arange(len(positions))
+    rows = new_row[events['row']]
+    keep = rows >= 0
+    subset_events = {'row': rows[keep], 'days': events['days'][keep], 'type_score': events['type_score'][keep]}
+    return frame.iloc[positions].reset_index(drop=True), subset_events
+
+
+def input_fingerprints(frame: pd.DataFrame) -> np.ndarray:
+    """Hash of every scoring input per company, salted with SCORING_VERSION and WEIGHTS.
+
+    Upcoming events enter as days until the event, so a company with a
+    catalyst within 30 days changes fingerprint every day (its proximity
+    score decays) and one whose event enters the window changes on that day.
+    """
+    hashes = pd.util.hash_pandas_object(frame[list(FINGERPRINT_COLUMNS)], index=False).to_numpy()
+    salt = zlib.crc32(repr((SCORING_VERSION, sorted(WEIGHTS.items()))).encode())
+    return np.array([f"{salt:08x}{h:016x}" for h in hashes.tolist()], dtype=object)
+
+
+def load_input_fingerprints(client) -> dict:
+    """{company_id: (input_hash, computed_at)} of the stored overall scores."""
+    stored = {}
+    page_size = 1000
+    offset = 0
+    while True:
+        response = client.table('company_scores') \
+            .select('company_id, details, computed_at') \
+            .eq('score_type', 'overall') \
+            .order('id') \
+            .range(offset, offset + page_size - 1) \
+            .execute()
+        batch = response.data or []
+        for row in batch:
+            stored[row['company_id']] = ((row.get('details') or {}).get('input_hash'), row.get('computed_at'))
+        if len(batch) < page_size:
+            break
+        offset += page_size
+    return stored
+
+
+def changed_inputs(company_ids, fingerprints, stored: dict, max_age_days: int = SCORE_MAX_AGE_DAYS) -> np.ndarray:
+    """Mask of companies to rescore: fingerprint differs, never scored, or score older than max_age_days."""
+    cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+    changed = np.ones(len(fingerprints), dtype=bool)
+    for i, (cid, fingerprint) in enumerate(zip(company_ids, fingerprints)):
+        input_hash, computed_at = stored.get(cid, (None, None))
+        changed[i] = input_hash != fingerprint or not computed_at or str(computed_at) < cutoff
+    return changed
+
+
+def score_companies(companies: list, news_cache: dict, events_cache: dict, today=None) -> pd.DataFrame:
+    """Score all companies; one row per company with components, overall and label."""
+    frame, events = build_score_frame(companies, news_cache, events_cache, today)
+    return score_frame(frame, events)
 
 
 def main():
     parser = argparse.ArgumentParser(description='Calculate Blackfire Scores v2')
     parser.add_argument('--apply', action='store_true', help='Write scores to Supabase')
     parser.add_argument('--limit', type=int, default=0, help='Limit number of companies')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only rescore companies whose inputs changed since their last score')
     args = parser.parse_args()
 
     print("\n" + "=" * 70)
     print("  BLACKFIRE SCORING ENGINE v2")
-    print(f"  Mode: {'APPLY' if args.apply else 'DRY-RUN (preview only)'}")
+    print(f"  Mode: {'APPLY' if args.apply else 'DRY-RUN (preview only)'}"
+          f"{' (incremental)' if args.incremental else ''}")
     if args.limit:
         print(f"  Limit: {args.limit} companies")
     print("=" * 70)
@@ -333,54 +717,64 @@ def main():
 
     client = supabase_helper.get_client()
 
+    # Incomplete inputs would silently produce wrong scores: stop instead
     print("  Loading news cache (last 30 days)...")
-    news_cache = load_news_cache(client)
-    print(f"  News entries: {sum(len(v) for v in news_cache.values())}")
+    try:
+        news_cache = load_news_cache(client)
+    except Exception as e:
+        print(f"  Error: Could not load news: {e}")
+        sys.exit(1)
+    print(f"  News entries: {sum(v['total'] for v in news_cache.values())}")
 
-    print("  Loading events cache (upcoming)...")
-    events_cache = load_events_cache(client)
+    print(f"  Loading events cache (next {EVENT_WINDOW_DAYS} days)...")
+    try:
+        events_cache = load_events_cache(client)
+    except Exception as e:
+        print(f"  Error: Could not load events: {e}")
+        sys.exit(1)
     print(f"  Event entries: {sum(len(v) for v in events_cache.values())}")
 
-    # Calculate scores
-    results = []
-    score_dist = Counter()
-    label_dist = Counter()
-
-    for company in companies:
-        cid = company['id']
-
-        components = {
-            'valuation_gap': score_valuation_gap(company),
-            'conviction_signal': score_conviction_signal(company),
-            'price_momentum': score_price_momentum(company),
-            'news_sentiment': score_news_sentiment(cid, news_cache),
-            'catalyst_proximity': score_catalyst_proximity(cid, events_cache),
+    # Calculate scores (all companies at once, see score_frame)
+    frame, events = build_score_frame(companies, news_cache, events_cache)
+    fingerprints = input_fingerprints(frame)
+    if args.incremental:
+        try:
+            stored = load_input_fingerprints(client)
+        except Exception as e:
+            print(f"  Warning: Could not load stored scores ({e}), rescoring all companies")
+            stored = {}
+        changed = changed_inputs(frame['company_id'].tolist(), fingerprints, stored)
+        print(f"  Changed inputs: {int(changed.sum())} of {len(frame)} companies "
+              f"(max age {SCORE_MAX_AGE_DAYS} days)")
+        frame, events = subset_frame(frame, events, changed)
+        fingerprints = fingerprints[changed]
+
+    scores = score_frame(frame, events)
+    scores['input_hash'] = fingerprints
+    scores = scores.sort_values('overall', ascending=False, kind='stable')
+
+    overall = scores['overall'].to_numpy()
+    score_dist = Counter({
+        'good (>=70)': int((overall >= 70).sum()),
+        'medium (40-69)': int(((overall >= 40) & (overall < 70)).sum()),
+        'low (<40)': int((~(overall >= 40)).sum()),
+    })
+    score_dist = +score_dist
+    label_dist = Counter(scores['label'].tolist())
+
+    columns = {name: scores[name].tolist()
+               for name in ('company_id', 'name', 'overall', 'label', 'input_hash', *WEIGHTS)}
+    results = [
+        {
+            'company_id': columns['company_id'][i],
+            'name': columns['name'][i],
+            'overall': columns['overall'][i],
+            'label': columns['label'][i],
+            'input_hash': columns['input_hash'][i],
+            'components': {k: columns[k][i] for k in WEIGHTS},
         }
-
-        overall = sum(components[k] * WEIGHTS[k] for k in WEIGHTS)
-        overall = round(overall, 1)
-        label = get_score_label(overall)
-
-        # Bucket for distribution
-        if overall >= 70:
-            score_dist['good (>=70)'] += 1
-        elif overall >= 40:
-            score_dist['medium (40-69)'] += 1
-        else:
-            score_dist['low (<40)'] += 1
-
-        label_dist[label] += 1
-
-        results.append({
-            'company_id': cid,
-            'name': company.get('name', '?'),
-            'overall': overall,
-            'label': label,
-            'components': components,
-        })
-
-    # Sort by overall score descending
-    results.sort(key=lambda x: -x['overall'])
+        for i in range(len(scores))
+    ]
 
     # Report
     print(f"\n  Score distribution:")
@@ -400,28 +794,18 @@ def main():
     for r in results[-10:]:
         print(f"    {r['overall']:5.1f} [{r['label']:11s}]  {r['name'][:50]}")
 
-    # Apply
+    # Apply: upsert current scores (history is appended by the same write, see score_store)
     if args.apply:
-        print(f"\n  Clearing old scores...")
-        try:
-            client.table('company_scores').delete().neq('id', '00000000-0000-0000-0000-000000000000').execute()
-            print(f"  Old scores cleared")
-        except Exception as e:
-            print(f"  Warning: Could not clear old scores: {e}")
-
-        print(f"  Writing {len(results)} scores to company_scores...")
+        print(f"\n  Writing {len(results)} scores to company_scores...")
         now = datetime.now().isoformat()
-        success = 0
-        errors = 0
-
-        # Batch insert in chunks of 50
-        batch = []
-        for i, r in enumerate(results):
+        rows = []
+        for r in results:
             # Overall score with label in details
             details_with_label = dict(r['components'])
             details_with_label['score_label'] = r['label']
+            details_with_label['input_hash'] = r['input_hash']
 
-            batch.append({
+            rows.append({
                 'company_id': r['company_id'],
                 'score_type': 'overall',
                 'score_value': r['overall'],
@@ -431,7 +815,7 @@ def main():
 
             # Component scores
             for comp_name, comp_value in r['components'].items():
-                batch.append({
+                rows.append({
                     'company_id': r['company_id'],
                     'score_type': comp_name,
                     'score_value': comp_value,
@@ -439,21 +823,15 @@ def main():
                     'computed_at': now,
                 })
 
-            # Flush batch every 50 companies (300 rows)
-            if len(batch) >= 300 or i == len(results) - 1:
-                try:
-                    client.table('company_scores').insert(batch).execute()
-                    success += len(batch)
-                except Exception as e:
-                    errors += len(batch)
-                    if errors <= 5:
-                        print(f"    Batch error: {e}")
-                batch = []
-
-                if (i + 1) % 200 == 0:
-                    print(f"    ... {i + 1}/{len(results)} companies")
-
-        print(f"  Written: {success} rows ({errors} errors)")
+        # Companies not scored in this run lose their scores only on a complete full run
+        result = score_store.write_scores(client, rows, ['overall', *WEIGHTS], now,
+                                          replace_all=not (args.incremental or args.limit),
+                                          progress_every=4)
+        print(f"  Written: {result['written']} rows ({result['errors']} errors, "
+              f"{result['removed']} old rows removed)")
+        if not result['history']:
+            print(f"  Note: {score_store.HISTORY_TABLE} missing — scores are not kept as history "
+                  f"(run the migration in score_store.py)")
     else:
         print(f"\n  Run with --apply to write scores to Supabase")
 
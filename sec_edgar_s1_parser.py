@@ -40,6 +40,7 @@ load_dotenv(os.path.join(SCRIPT_DIR, '.env'))
 
 import requests
 import supabase_helper
+from identifier_xref import IdentifierXref, sec_ticker_map
 
 try:
     from anthropic import Anthropic
@@ -51,7 +52,6 @@ SEC_USER_AGENT = os.getenv('SEC_USER_AGENT', 'Blackfire Research (rseckler@gmail
 ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
 
 # SEC endpoints
-SEC_TICKERS_URL = 'https://www.sec.gov/files/company_tickers.json'
 SEC_SUBMISSIONS_URL = 'https://data.sec.gov/submissions/CIK{cik:010d}.json'
 SEC_FULL_TEXT_SEARCH = 'https://efts.sec.gov/LATEST/search-index?q={q}&ciks={cik:010d}&forms={forms}'
 SEC_ARCHIVE_URL = 'https://www.sec.gov/Archives/edgar/data/{cik}/{accession_nodash}/{doc}'
@@ -78,19 +78,13 @@ def sec_headers() -> dict:
     return {'User-Agent': SEC_USER_AGENT, 'Accept': 'application/json'}
 
 
-def load_ticker_to_cik() -> dict:
-    """Lädt die SEC Ticker → CIK Mapping-Datei (ca. 1 MB)."""
-    r = requests.get(SEC_TICKERS_URL, headers=sec_headers(), timeout=30)
-    r.raise_for_status()
-    data = r.json()
-    # Format: { "0": {"cik_str": 320193, "ticker": "AAPL", "title": "Apple Inc."}, ... }
-    mapping = {}
-    for entry in data.values():
-        mapping[entry['ticker'].upper()] = {
-            'cik': int(entry['cik_str']),
-            'title': entry['title'],
-        }
-    return mapping
+def load_ticker_to_cik(xref: IdentifierXref = None) -> dict:
+    """SEC Ticker → CIK Mapping (ca. 1 MB).
+
+    Wird im Identifier-Xref zwischengespeichert und höchstens einmal pro Tag
+    neu geladen.
+    """
+    return sec_ticker_map(xref or IdentifierXref(), sec_headers())
 
 
 def fetch_submissions(cik: int) -> dict | None:
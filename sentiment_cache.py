@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Sentiment cache for company_news — one model answer per article URL.
+
+news_collector analyzes each unique article once (all matched companies
+in one prompt) and stores the answer here under the normalized-URL hash
+(news_dedup.url_hash). When the same article is matched again — in a
+later run, by Brave after RSS, or during --backfill-sentiment — the
+cached answer is fanned out instead of asking the model again.
+
+Stored in .news_sentiment_cache.json as {url_hash: entry}:
+  {
+    "3f2c...": {
+      "sentiment": "positive", "catalyst_type": "funding", "relevance": 4,
+      "company_relevance": {"<company_id>": 5, "industry:Robotics": 2},
+      "analyzed_at": 1773481333.6
+    }
+  }
+"""
+
+import os
+from datetime import datetime
+
+import local_store
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_FILE = os.path.join(SCRIPT_DIR, '.news_sentiment_cache.json')
+
+CACHE_DAYS = 30  # articles older than this are not matched again in practice
+
+
+class SentimentCache:
+    def __init__(self, path: str = CACHE_FILE):
+        self.path = path
+        self.entries = local_store.load_json(path)
+        self._changed = {}
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, hashes) -> dict | None:
+        """First cached entry among the given URL hashes (members of one story)."""
+        for h in hashes:
+            entry = self.entries.get(h)
+            if entry:
+                self.stats['hits'] += 1
+                return entry
+        self.stats['misses'] += 1
+        return None
+
+    def record(self, hashes, fields: dict, company_relevance: dict) -> None:
+        entry = {
+            'sentiment': fields.get('sentiment'),
+            'catalyst_type': fields.get('catalyst_type'),
+            'relevance': fields.get('relevance'),
+            'company_relevance': company_relevance,
+            'analyzed_at': datetime.now().timestamp(),
+        }
+        for h in hashes:
+            if h:
+                self.entries[h] = entry
+                self._changed[h] = entry
+
+    def save(self) -> None:
+        """Merge this run's answers into the file (locked, atomic)."""
+        if not self._changed:
+            return
+        try:
+            with local_store.file_lock(self.path):
+                state = local_store.load_json(self.path)
+                state.update(self._changed)
+                cutoff = datetime.now().timestamp() - CACHE_DAYS * 86400
+                state = {h: e for h, e in state.items() if e.get('analyzed_at', 0) > cutoff}
+                local_store.save_json(self.path, state)
+            self.entries = state
+            self._changed = {}
+        except Exception as e:
+            print(f"  Warning: could not save sentiment cache: {e}")
@@ -2,30 +2,53 @@
 """
 Stock Price Updater v3 - Supabase Edition
 - Validates tickers before updating (4-tier: Symbol -> Symbol.DE -> ISIN -> WKN)
-- Persistent blacklist for invalid companies
+- Persistent blacklist for invalid companies (exponential retry backoff,
+  see ticker_blacklist.py)
 - Updates Supabase directly
+- Skips no-op writes: quotes are compared against a local cache of the
+  last written values (.price_cache.json)
+- Checkpoints progress (.checkpoint_stock_price_updater.json): a killed run
+  is resumed by the next run if it was last saved within one schedule interval
 """
 
 import os
 import sys
-import json
 import fcntl
 from datetime import datetime
 from dotenv import load_dotenv
 import time
 import yfinance as yf
 from isin_ticker_mapper import HybridISINMapper
+from identifier_xref import IdentifierXref
+from checkpoint import RunCheckpoint
+from ticker_blacklist import (
+    TickerBlacklist, REASON_NO_SYMBOL, REASON_YAHOO_404, REASON_OPENFIGI_MISS,
+)
 
 load_dotenv()
 
 import supabase_helper
+import local_store
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 LOCK_FILE = os.path.join(SCRIPT_DIR, '.stock_updater.lock')
+PRICE_CACHE_FILE = os.path.join(SCRIPT_DIR, '.price_cache.json')
+
+# No-op write detection: a quote field counts as changed only if it moved by
+# more than this fraction of the last written value (0.001 = 0.1%)
+PRICE_WRITE_TOLERANCE = float(os.getenv('PRICE_WRITE_TOLERANCE', '0.001'))
+# Even without changes, refresh price_update after this many hours
+PRICE_HEARTBEAT_HOURS = float(os.getenv('PRICE_HEARTBEAT_HOURS', '6'))
+
+# Cron interval; checkpoints not saved for longer than this are discarded instead of resumed
+CHECKPOINT_MAX_AGE_SECONDS = int(os.getenv('STOCK_UPDATE_INTERVAL_SECONDS', '3600'))
+
+# Quote columns that decide whether a write is needed (volume/market_cap ride along)
+MATERIAL_QUOTE_FIELDS = ['current_price', 'price_change_percent', 'day_high', 'day_low']
 
 
 class StockPriceUpdater:
-    def __init__(self):
+    def __init__(self, write_tolerance=PRICE_WRITE_TOLERANCE):
         # Stats
         self.stats = {
             'start_time': None,
@@ -33,64 +56,81 @@ class StockPriceUpdater:
             'stocks_processed': 0,
             'stocks_updated': 0,
             'stocks_skipped': 0,
+            'writes_skipped': 0,
+            'writes_minimized': 0,
             'api_calls': 0,
             'skipped_tickers': [],
             'success': False,
             'error_message': None
         }
 
-        # Persistent blacklist file for companies where ALL validation failed
-        self.blacklist_file = os.path.join(SCRIPT_DIR, 'invalid_companies.json')
-
-        # Company-level blacklist: companies where symbol + ISIN + WKN all failed
-        self.blacklisted_companies = self._load_blacklist()
+        # Company-level blacklist: companies where symbol + ISIN + WKN all failed,
+        # retried with exponential backoff (invalid_companies.json)
+        self.blacklist = TickerBlacklist()
+        self.last_failure_reason = None
 
         # In-memory caches for within-run dedup (not persisted)
         self.valid_tickers = set()
         self.invalid_tickers = set()
 
-        # ISIN mapper for intelligent lookup
-        self.isin_mapper = HybridISINMapper()
+        # ISIN mapper for intelligent lookup, remembers answers across runs
+        self.xref = IdentifierXref()
+        self.isin_mapper = HybridISINMapper(xref=self.xref)
 
-    def _load_blacklist(self):
-        """Load persistent blacklist of company IDs from JSON file"""
-        try:
-            with open(self.blacklist_file, 'r') as f:
-                data = json.load(f)
-                # Blacklist entries older than 30 days get retried
-                cutoff = datetime.now().timestamp() - (30 * 86400)
-                valid = {k for k, v in data.items() if v > cutoff}
-                if len(valid) < len(data):
-                    print(f"   {len(data) - len(valid)} blacklisted companies expired, will retry")
-                return valid
-        except (FileNotFoundError, json.JSONDecodeError):
-            return set()
+        # Last written quote per company, used to skip unchanged writes
+        self.write_tolerance = write_tolerance
+        self.price_cache = local_store.load_json(PRICE_CACHE_FILE)
 
     def _save_blacklist(self):
-        """Save blacklisted company IDs to persistent JSON file"""
+        """Merge this run's blacklist changes into invalid_companies.json"""
         try:
-            existing = {}
-            try:
-                with open(self.blacklist_file, 'r') as f:
-                    existing = json.load(f)
-            except (FileNotFoundError, json.JSONDecodeError):
-                pass
-
-            now = datetime.now().timestamp()
-            for company_id in self.blacklisted_companies:
-                if company_id not in existing:
-                    existing[company_id] = now
+            total = self.blacklist.save()
+            print(f"   Blacklist saved: {total} invalid companies")
+        except Exception as e:
+            print(f"   Failed to save blacklist: {e}")
 
-            # Prune expired entries
-            cutoff = datetime.now().timestamp() - (30 * 86400)
-            existing = {k: v for k, v in existing.items() if v > cutoff}
+    def _save_price_cache(self):
+        """Persist last written quotes for the next run"""
+        try:
+            local_store.save_json(PRICE_CACHE_FILE, self.price_cache)
+        except Exception as e:
+            print(f"   Failed to save price cache: {e}")
 
-            with open(self.blacklist_file, 'w') as f:
-                json.dump(existing, f, indent=2)
+    def _save_xref(self):
+        """Persist identifier mappings learned this run"""
+        try:
+            self.xref.save()
+        except Exception as e:
+            print(f"   Failed to save identifier xref: {e}")
 
-            print(f"   Blacklist saved: {len(existing)} invalid companies")
+    def _save_checkpoint(self):
+        """Persist run progress plus the caches it depends on"""
+        try:
+            self.checkpoint.save()
+        except Exception as e:
+            print(f"   Failed to save checkpoint: {e}")
+        self._save_price_cache()
+        try:
+            self.blacklist.save()
         except Exception as e:
             print(f"   Failed to save blacklist: {e}")
+        self._save_xref()
+
+    def _is_material_change(self, old, new):
+        """True if new differs from old by more than the write tolerance"""
+        if old is None or new is None:
+            return old != new
+        try:
+            # Relative for any price size; the floor only guards old == 0
+            return abs(float(new) - float(old)) > self.write_tolerance * max(abs(float(old)), 1e-9)
+        except (ValueError, TypeError):
+            return old != new
+
+    def _fundamentals_changed(self, old, new):
+        """Compare fundamentals dicts key by key with the same tolerance"""
+        if set(old) != set(new):
+            return True
+        return any(self._is_material_change(old[k], new[k]) for k in new)
 
     def is_market_hours(self):
         """Check if current time is within market hours (7-23 Uhr)"""
@@ -151,27 +191,42 @@ class StockPriceUpdater:
 
         return None
 
+    def wkn_candidate_isins(self, wkn):
+        """German ISINs a WKN may belong to"""
+        return [
+            f"DE000{wkn}",
+            f"DE0000{wkn[:-1]}{wkn[-1]}"
+        ]
+
     def find_ticker_from_isin_wkn(self, isin=None, wkn=None):
         """Try to find ticker using ISIN or WKN with Hybrid Mapper"""
+        self.openfigi_hit = False
+
+        candidates = []
         if isin:
-            ticker = self.isin_mapper.map_isin_openfigi(isin)
+            candidates = [isin]
+        elif wkn and len(wkn) == 6:
+            candidates = self.wkn_candidate_isins(wkn)
+
+        for test_isin in candidates:
+            ticker = self.isin_mapper.cached_ticker(test_isin)
+            if ticker:
+                self.openfigi_hit = True
+                return ticker
+            ticker = self.isin_mapper.map_isin_openfigi(test_isin)
+            self.openfigi_hit = self.openfigi_hit or bool(ticker)
             if ticker and self.isin_mapper.validate_ticker(ticker):
+                self.isin_mapper.remember_ticker(test_isin, ticker)
                 return ticker
 
-        if wkn and not isin and len(wkn) == 6:
-            possible_isins = [
-                f"DE000{wkn}",
-                f"DE0000{wkn[:-1]}{wkn[-1]}"
-            ]
-            for test_isin in possible_isins:
-                ticker = self.isin_mapper.map_isin_openfigi(test_isin)
-                if ticker and self.isin_mapper.validate_ticker(ticker):
-                    return ticker
-
         return None
 
     def validate_ticker(self, symbol=None, isin=None, wkn=None):
-        """Validate if ticker exists - tries multiple methods"""
+        """Validate if ticker exists - tries multiple methods.
+
+        On failure, self.last_failure_reason says why (blacklist reason).
+        """
+        self.last_failure_reason = REASON_NO_SYMBOL if not (symbol or isin or wkn) else REASON_YAHOO_404
         if symbol:
             if symbol in self.valid_tickers:
                 return symbol
@@ -208,6 +263,8 @@ class StockPriceUpdater:
             if result:
                 self.valid_tickers.add(result)
                 return result
+            if not self.openfigi_hit:
+                self.last_failure_reason = REASON_OPENFIGI_MISS
 
         if symbol:
             self.invalid_tickers.add(symbol)
@@ -343,38 +400,85 @@ class StockPriceUpdater:
         else:
             return 'Closed'
 
-    def update_stock(self, company_id, symbol, price_data):
-        """Update company with stock price data and fundamentals in Supabase"""
-        if not price_data:
-            return False
-
-        update_data = {
-            'price_update': datetime.now().isoformat(),
-            'market_status': self.get_market_status(),
-            'exchange': 'XETRA',
-            'currency': 'EUR',
-        }
+    def _quote_columns(self, price_data):
+        """Map fetched price data to companies columns"""
+        quote = {}
 
         if price_data.get('current_price'):
-            update_data['current_price'] = round(price_data['current_price'], 4)
+            quote['current_price'] = round(price_data['current_price'], 4)
 
         if price_data.get('change_percent') is not None:
-            update_data['price_change_percent'] = round(price_data['change_percent'], 4)
+            quote['price_change_percent'] = round(price_data['change_percent'], 4)
 
         if price_data.get('high'):
-            update_data['day_high'] = round(price_data['high'], 4)
+            quote['day_high'] = round(price_data['high'], 4)
 
         if price_data.get('low'):
-            update_data['day_low'] = round(price_data['low'], 4)
+            quote['day_low'] = round(price_data['low'], 4)
 
         if price_data.get('volume'):
-            update_data['volume'] = int(price_data['volume'])
+            quote['volume'] = int(price_data['volume'])
 
         if price_data.get('market_cap'):
-            update_data['market_cap'] = int(price_data['market_cap'])
+            quote['market_cap'] = int(price_data['market_cap'])
 
-        # Merge fundamentals into extra_data JSONB (WP-9.1)
+        return quote
+
+    def update_stock(self, company_id, symbol, price_data):
+        """Update company with stock price data and fundamentals in Supabase.
+
+        Compares the quote against the last written values in the local price
+        cache and skips the write (or writes only the changed columns) when
+        nothing material changed. Returns True if the row is up to date.
+        """
+        if not price_data:
+            return False
+
+        now = datetime.now()
+        market_status = self.get_market_status()
+        quote = self._quote_columns(price_data)
         fundamentals = price_data.get('fundamentals')
+        cached = self.price_cache.get(company_id)
+        write_quote = True
+
+        update_data = {
+            'price_update': now.isoformat(),
+        }
+
+        if cached:
+            price_changed = any(
+                self._is_material_change(cached.get(k), quote.get(k))
+                for k in MATERIAL_QUOTE_FIELDS
+            )
+            status_changed = market_status != cached.get('market_status')
+            fundamentals_changed = bool(fundamentals) and self._fundamentals_changed(
+                cached.get('fundamentals') or {}, fundamentals
+            )
+            heartbeat_due = now.timestamp() - cached.get('written_at', 0) > PRICE_HEARTBEAT_HOURS * 3600
+
+            if not (price_changed or status_changed or fundamentals_changed or heartbeat_due):
+                self.stats['writes_skipped'] += 1
+                return True
+
+            # Write only what changed
+            write_quote = price_changed
+            if write_quote:
+                update_data.update(quote)
+            if status_changed:
+                update_data['market_status'] = market_status
+            if not write_quote or (fundamentals and not fundamentals_changed):
+                self.stats['writes_minimized'] += 1
+            if not fundamentals_changed:
+                fundamentals = None
+        else:
+            update_data.update({
+                'market_status': market_status,
+                'exchange': 'XETRA',
+                'currency': 'EUR',
+            })
+            update_data.update(quote)
+
+        # Merge fundamentals into extra_data JSONB (WP-9.1)
         if fundamentals:
             # Read current extra_data to merge (don't overwrite other keys)
             try:
@@ -385,10 +489,33 @@ class StockPriceUpdater:
                 existing_extra = {}
 
             existing_extra.update(fundamentals)
-            existing_extra['Fundamentals_Update'] = datetime.now().isoformat()
+            existing_extra['Fundamentals_Update'] = now.isoformat()
             update_data['extra_data'] = existing_extra
 
-        return supabase_helper.update_company(company_id, update_data)
+        if not supabase_helper.update_company(company_id, update_data):
+            return False
+
+        entry = dict(cached or {})
+        if write_quote:
+            entry.update(quote)
+        entry['market_status'] = market_status
+        if fundamentals:
+            entry['fundamentals'] = fundamentals
+        entry['written_at'] = now.timestamp()
+        self.price_cache[company_id] = entry
+        return True
+
+    def _replay_pending_writes(self, pending_writes):
+        """Retry unconfirmed writes; successful ones are removed. Returns count written."""
+        written = 0
+        for company_id, pending in list(pending_writes.items()):
+            if self.update_stock(company_id, pending['symbol'], pending['price_data']):
+                written += 1
+                self.stats['stocks_updated'] += 1
+                pending_writes.pop(company_id, None)
+            if self.checkpoint.mark_done(company_id):
+                self._save_checkpoint()
+        return written
 
     def update_stock_prices(self):
         """Main function to update all stock prices"""
@@ -414,16 +541,40 @@ class StockPriceUpdater:
 
         self.stats['stocks_processed'] = len(stocks)
 
-        blacklisted = sum(1 for s in stocks if s['company_id'] in self.blacklisted_companies)
+        # Resume a killed run (same schedule interval) from its checkpoint
+        self.checkpoint = RunCheckpoint('stock_price_updater', CHECKPOINT_MAX_AGE_SECONDS)
+        resolved_tickers = self.checkpoint.data.setdefault('tickers', {})
+        pending_writes = self.checkpoint.data.setdefault('pending_writes', {})
+
         print(f"\n  Processing {len(stocks)} stocks...")
-        print(f"   {blacklisted} known-invalid companies will be skipped (blacklist)")
-        print(f"   {len(stocks) - blacklisted} stocks to validate")
+        print(f"   {len(self.blacklist)} companies on blacklist (skipped until their retry window ends)")
+        if self.checkpoint.resumed:
+            print(f"   Resuming checkpoint: {len(self.checkpoint.processed)} already processed, "
+                  f"{len(pending_writes)} pending writes")
+
+        # Companies without a usable symbol go straight to ISIN/WKN lookup:
+        # resolve their ISINs up front with batched OpenFIGI requests
+        figi_isins = []
+        for stock in stocks:
+            if stock.get('symbol') or self.checkpoint.is_done(stock['company_id']):
+                continue
+            if stock.get('isin'):
+                figi_isins.append(stock['isin'])
+            elif stock.get('wkn') and len(stock['wkn']) == 6:
+                figi_isins.extend(self.wkn_candidate_isins(stock['wkn']))
+        if figi_isins:
+            self.isin_mapper.prefetch_openfigi(figi_isins)
+            print(f"   OpenFIGI prefetch: {len(figi_isins)} ISINs in "
+                  f"{self.isin_mapper.openfigi_requests} requests")
 
         # Process each stock
         updated_count = 0
         skipped_count = 0
         api_calls_made = False
 
+        # Replay writes the interrupted run fetched but could not confirm
+        updated_count += self._replay_pending_writes(pending_writes)
+
         for i, stock in enumerate(stocks):
             symbol = stock.get('symbol')
             company_id = stock['company_id']
@@ -431,25 +582,40 @@ class StockPriceUpdater:
             isin = stock.get('isin')
             wkn = stock.get('wkn')
 
-            # Skip blacklisted companies immediately
-            if company_id in self.blacklisted_companies:
+            if self.checkpoint.is_done(company_id):
+                continue
+
+            # Skip blacklisted companies inside their retry window
+            # (entries are invalidated when symbol/ISIN/WKN changed)
+            identifiers = {'symbol': original or None, 'isin': isin, 'wkn': wkn}
+            if self.blacklist.is_blocked(company_id, identifiers):
                 skipped_count += 1
                 self.stats['skipped_tickers'].append(original or isin or wkn or 'Unknown')
+                if self.checkpoint.mark_done(company_id):
+                    self._save_checkpoint()
                 continue
 
             # Rate limiting: only sleep before actual API calls
             if api_calls_made:
                 time.sleep(1)
-
-            # Validate ticker (tries Symbol, then ISIN, then WKN)
             api_calls_made = True
-            valid_symbol = self.validate_ticker(symbol=symbol, isin=isin, wkn=wkn)
+
+            # Validate ticker (tries Symbol, then ISIN, then WKN),
+            # unless the interrupted run already resolved it
+            valid_symbol = resolved_tickers.get(company_id)
+            if not valid_symbol:
+                valid_symbol = self.validate_ticker(symbol=symbol, isin=isin, wkn=wkn)
             if not valid_symbol:
                 skipped_count += 1
                 self.stats['skipped_tickers'].append(original or isin or wkn or 'Unknown')
-                self.blacklisted_companies.add(company_id)
+                self.blacklist.record_failure(company_id, self.last_failure_reason, identifiers)
+                if self.checkpoint.mark_done(company_id):
+                    self._save_checkpoint()
                 continue
 
+            self.blacklist.record_success(company_id)
+            resolved_tickers[company_id] = valid_symbol
+
             # Fetch price
             price_data = self.fetch_stock_price(valid_symbol)
 
@@ -461,25 +627,46 @@ class StockPriceUpdater:
                     if updated_count % 10 == 0:
                         print(f"   {updated_count} stocks updated...")
                 else:
-                    skipped_count += 1
-                    self.stats['stocks_skipped'] += 1
+                    # Keep the quote so the write is retried at the end / on resume
+                    pending_writes[company_id] = {'symbol': valid_symbol, 'price_data': price_data}
             else:
                 skipped_count += 1
                 self.stats['stocks_skipped'] += 1
                 self.stats['skipped_tickers'].append(original)
 
+            if self.checkpoint.mark_done(company_id):
+                self._save_checkpoint()
+
+        # Retry writes that failed during the loop once more
+        if pending_writes:
+            print(f"   Retrying {len(pending_writes)} failed writes...")
+            updated_count += self._replay_pending_writes(pending_writes)
+            self.stats['stocks_skipped'] += len(pending_writes)
+            skipped_count += len(pending_writes)
+
         self.stats['success'] = True
         self.stats['end_time'] = datetime.now()
 
-        # Save blacklist for next run
+        # Save blacklist and last written quotes for next run
         self._save_blacklist()
+        self._save_price_cache()
+        self._save_xref()
+        self.checkpoint.clear()
 
         print("\n" + "="*70)
         print("  UPDATE COMPLETE!")
         print("="*70)
         print(f"   Processed: {self.stats['stocks_processed']}")
         print(f"   Updated: {self.stats['stocks_updated']}")
+        print(f"   Writes skipped (unchanged): {self.stats['writes_skipped']}")
+        print(f"   Writes minimized (changed columns only): {self.stats['writes_minimized']}")
         print(f"   Skipped: {skipped_count} (invalid tickers)")
+        bl = self.blacklist.stats
+        print(f"   Blacklist: {bl['blocked']} blocked, {bl['retrying']} retried, "
+              f"{bl['invalidated']} invalidated (identifiers changed), {bl['recovered']} recovered")
+        reasons = ', '.join(f"{k}={v}" for k, v in sorted(self.blacklist.reason_counts().items()))
+        if reasons:
+            print(f"   Blacklist reasons: {reasons}")
         print(f"   API Calls: {self.stats['api_calls']}")
 
         if self.stats['skipped_tickers'][:10]:
@@ -116,6 +116,38 @@ def insert_companies(data_list: list, max_retries: int = 3) -> bool:
                 return False
 
 
+def bulk_update_companies(rows: list, chunk_size: int = 500, max_retries: int = 3) -> set:
+    """Write many partial company rows in a few requests.
+
+    Every row must contain 'id', 'name' and the same set of columns
+    (PostgREST fills missing keys with NULL). Chunks are upserted on id;
+    a chunk that still fails after retries falls back to update_company()
+    per row. Returns the set of company IDs that could not be written.
+    """
+    client = get_client()
+    failed = set()
+
+    for i in range(0, len(rows), chunk_size):
+        chunk = rows[i:i + chunk_size]
+        for attempt in range(max_retries):
+            try:
+                client.table('companies').upsert(chunk, on_conflict='id').execute()
+                break
+            except Exception as e:
+                if attempt < max_retries - 1:
+                    wait = 2 ** (attempt + 1)
+                    print(f"   Retry bulk update in {wait}s... ({e})")
+                    time.sleep(wait)
+                else:
+                    print(f"   Bulk update failed, writing {len(chunk)} rows one by one: {e}")
+                    for row in chunk:
+                        data = {k: v for k, v in row.items() if k != 'id'}
+                        if not update_company(row['id'], data, max_retries=1):
+                            failed.add(row['id'])
+
+    return failed
+
+
 def log_sync_history(stats: dict) -> None:
     """Write a row to the sync_history table."""
     client = get_client()
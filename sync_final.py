@@ -9,11 +9,11 @@ import pandas as pd
 from io import BytesIO
 from dotenv import load_dotenv
 from datetime import datetime
-import re
 
 load_dotenv()
 
 import supabase_helper
+from company_names import normalize_company_name
 
 # Column Mapping (Excel column -> Supabase core field)
 COLUMN_MAPPING = {
@@ -45,23 +45,6 @@ PROTECTED_PROPERTIES = {
     'prio_buy',
 }
 
-# --- Fuzzy Name Matching ---
-_LEGAL_SUFFIXES = re.compile(
-    r',?\s*\b(inc\.?|incorporated|corp\.?|corporation|ltd\.?|limited|'
-    r'llc\.?|plc\.?|co\.?|company|group|holdings?|s\.?a\.?|ag|se|n\.?v\.?|'
-    r'gmbh|& co\.?\s*(kg|kgaa)?)\s*\.?\s*$',
-    re.IGNORECASE
-)
-
-def normalize_company_name(name: str) -> str:
-    """Normalize for fuzzy matching: lowercase, strip legal suffixes, collapse whitespace."""
-    n = name.lower().strip()
-    n = _LEGAL_SUFFIXES.sub('', n)
-    n = _LEGAL_SUFFIXES.sub('', n)  # zweimal fuer gestapelte Suffixe
-    n = re.sub(r'\s+', ' ', n).strip()
-    n = n.rstrip('., ')
-    return n
-
 
 class SyncWithLogging:
     def __init__(self):
@@ -27,6 +27,7 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(os.path.join(SCRIPT_DIR, '.env'))
 
 import supabase_helper
+from news_stats import companies_with_news_since
 
 ALERT_TYPES = [
     'thesis_entry_reached', 'thesis_exit_reached', 'thesis_stop_loss',
@@ -151,6 +152,11 @@ def load_recent_news(client, company_ids: list) -> dict:
     news_by_company = {}
     batch_size = 50
 
+    # Skip companies without an article in the last 24h (news aggregate)
+    active_ids = companies_with_news_since(client, cutoff, company_ids)
+    if active_ids is not None:
+        company_ids = [cid for cid in company_ids if cid in active_ids]
+
     for i in range(0, len(company_ids), batch_size):
         batch = company_ids[i:i + batch_size]
         try:
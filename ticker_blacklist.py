@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Ticker blacklist — companies where ticker validation failed.
+
+Stored in invalid_companies.json as {company_id: entry}:
+  {
+    "attempts": 3,                  # consecutive failed validations
+    "reason": "yahoo_404",          # last failure reason (REASON_* below)
+    "first_failed": 1773481333.6,
+    "last_failed": 1773740533.6,
+    "retry_after": 1774086133.6,    # skip until this timestamp
+    "identifiers": {"symbol": "ABC", "isin": null, "wkn": null}
+  }
+
+Each failure doubles the retry window (per reason base, capped at
+MAX_RETRY_DAYS). An entry is dropped immediately when the company's
+symbol/ISIN/WKN in Supabase no longer match the identifiers it failed with,
+and on the next successful validation.
+
+Legacy entries ({company_id: timestamp}) are read as one failed attempt
+with the old 30-day window.
+"""
+
+import os
+from datetime import datetime
+
+import local_store
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BLACKLIST_FILE = os.path.join(SCRIPT_DIR, 'invalid_companies.json')
+
+REASON_NO_SYMBOL = 'no_symbol'          # no usable symbol, ISIN or WKN
+REASON_YAHOO_404 = 'yahoo_404'          # ticker(s) found but Yahoo has no price
+REASON_OPENFIGI_MISS = 'openfigi_miss'  # ISIN/WKN did not map to any ticker
+REASON_UNKNOWN = 'unknown'              # migrated legacy entry
+
+# First retry window per reason (days), doubled on every further failure
+RETRY_BASE_DAYS = {
+    REASON_NO_SYMBOL: 7,
+    REASON_YAHOO_404: 1,
+    REASON_OPENFIGI_MISS: 3,
+    REASON_UNKNOWN: 30,
+}
+MAX_RETRY_DAYS = 90
+LEGACY_RETRY_DAYS = 30
+# Entries not retried this long after their window closed belong to
+# companies that no longer exist / have no identifiers, prune them
+PRUNE_AFTER_DAYS = 90
+
+
+def retry_window_days(reason: str, attempts: int) -> float:
+    """Exponential retry window: base * 2^(attempts-1), capped."""
+    base = RETRY_BASE_DAYS.get(reason, RETRY_BASE_DAYS[REASON_UNKNOWN])
+    return min(base * 2 ** max(attempts - 1, 0), MAX_RETRY_DAYS)
+
+
+def _normalize_entry(value) -> dict:
+    """Convert legacy {company_id: timestamp} values to full entries."""
+    if isinstance(value, dict):
+        return value
+    ts = float(value)
+    return {
+        'attempts': 1,
+        'reason': REASON_UNKNOWN,
+        'first_failed': ts,
+        'last_failed': ts,
+        'retry_after': ts + LEGACY_RETRY_DAYS * 86400,
+        'identifiers': None,
+    }
+
+
+def load_entries(path: str = BLACKLIST_FILE) -> dict:
+    """Load all blacklist entries (legacy format converted)."""
+    data = local_store.load_json(path)
+    entries = {}
+    for company_id, value in data.items():
+        try:
+            entries[company_id] = _normalize_entry(value)
+        except (ValueError, TypeError):
+            continue
+    return entries
+
+
+def load_blacklisted_ids(active_only: bool = False, path: str = BLACKLIST_FILE) -> set:
+    """Company IDs on the blacklist. active_only drops entries whose retry window passed."""
+    entries = load_entries(path)
+    if not active_only:
+        return set(entries)
+    now = datetime.now().timestamp()
+    return {cid for cid, e in entries.items() if e.get('retry_after', 0) > now}
+
+
+class TickerBlacklist:
+    """Per-company failure tracking with exponential retry backoff.
+
+    Changes are journaled in memory and merged into the file under a lock
+    on save(), so concurrent readers/writers never lose entries.
+    """
+
+    def __init__(self, path: str = BLACKLIST_FILE):
+        self.path = path
+        self.entries = load_entries(path)
+        self._changed = {}    # company_id -> entry written on save
+        self._removed = set()
+        self.stats = {'blocked': 0, 'retrying': 0, 'invalidated': 0, 'recovered': 0}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, company_id):
+        return company_id in self.entries
+
+    def is_blocked(self, company_id: str, identifiers: dict = None) -> bool:
+        """True if the company is inside its retry window.
+
+        Entries whose stored identifiers differ from the current ones are
+        invalidated so the company is retried right away.
+        """
+        entry = self.entries.get(company_id)
+        if not entry:
+            return False
+
+        stored = entry.get('identifiers')
+        if identifiers is not None and stored is not None and stored != identifiers:
+            self._remove(company_id)
+            self.stats['invalidated'] += 1
+            return False
+
+        if entry.get('retry_after', 0) > datetime.now().timestamp():
+            self.stats['blocked'] += 1
+            return True
+
+        self.stats['retrying'] += 1
+        return False
+
+    def record_failure(self, company_id: str, reason: str, identifiers: dict = None) -> dict:
+        """Register a failed validation and extend the retry window."""
+        now = datetime.now().timestamp()
+        previous = self.entries.get(company_id) or {}
+        attempts = previous.get('attempts', 0) + 1
+        entry = {
+            'attempts': attempts,
+            'reason': reason,
+            'first_failed': previous.get('first_failed', now),
+            'last_failed': now,
+            'retry_after': now + retry_window_days(reason, attempts) * 86400,
+            'identifiers': identifiers,
+        }
+        self.entries[company_id] = entry
+        self._changed[company_id] = entry
+        self._removed.discard(company_id)
+        return entry
+
+    def record_success(self, company_id: str) -> None:
+        """Drop a company from the blacklist after a successful validation."""
+        if company_id in self.entries:
+            self._remove(company_id)
+            self.stats['recovered'] += 1
+
+    def _remove(self, company_id: str) -> None:
+        self.entries.pop(company_id, None)
+        self._changed.pop(company_id, None)
+        self._removed.add(company_id)
+
+    def reason_counts(self) -> dict:
+        counts = {}
+        for entry in self.entries.values():
+            reason = entry.get('reason', REASON_UNKNOWN)
+            counts[reason] = counts.get(reason, 0) + 1
+        return counts
+
+    def save(self) -> int:
+        """Merge this run's changes into the file (locked, atomic). Returns entry count."""
+        with local_store.file_lock(self.path):
+            current = load_entries(self.path)
+            for company_id in self._removed:
+                current.pop(company_id, None)
+            current.update(self._changed)
+            cutoff = datetime.now().timestamp() - PRUNE_AFTER_DAYS * 86400
+            current = {k: v for k, v in current.items() if v.get('retry_after', 0) > cutoff}
+            local_store.save_json(self.path, current)
+
+        self.entries = current
+        self._changed = {}
+        self._removed = set()
+        return len(current)